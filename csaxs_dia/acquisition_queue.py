@@ -0,0 +1,203 @@
+from copy import deepcopy
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import time
+
+from csaxs_dia.validation_eiger9m import IntegrationStatus
+from csaxs_dia.waiting import StatusWaiter, get_expected_duration
+
+_logger = getLogger(__name__)
+
+CONFIG_SECTIONS = ("writer", "backend", "detector")
+
+# Maximum time (in seconds) to wait for an acquisition to complete, after its expected duration.
+DEFAULT_ACQUISITION_TIMEOUT = 24 * 3600
+# Maximum time (in seconds) for a started acquisition to be running or to have written frames.
+DEFAULT_START_TIMEOUT = 10
+
+# Status reported by _get_start_status once the acquisition is known to have started.
+ACQUISITION_STARTED = "acquisition_started"
+
+
+def merge_config(base_config, item):
+    """
+    Apply a queue item (full or partial config, with an optional "output_file" shortcut) on top of base_config.
+    """
+    config = deepcopy(base_config)
+
+    for section_name in CONFIG_SECTIONS:
+        config.setdefault(section_name, {})
+        if item.get(section_name):
+            config[section_name].update(item[section_name])
+
+    if "output_file" in item:
+        config["writer"]["output_file"] = item["output_file"]
+
+    return config
+
+
+class AcquisitionQueue(object):
+    """
+    Run an ordered list of acquisitions back-to-back on the server.
+
+    Each item is a full or partial config applied on top of the previous one. The next acquisition is started as soon
+    as the previous one is completed: it was seen RUNNING (or its writer wrote frames) and the integration status is
+    READY again. The manager only re-applies the backend and
+    detector parameters that changed between items.
+    """
+
+    def __init__(self, integration_manager, acquisition_timeout=DEFAULT_ACQUISITION_TIMEOUT,
+                 start_timeout=DEFAULT_START_TIMEOUT):
+        self.integration_manager = integration_manager
+        self.acquisition_timeout = acquisition_timeout
+        self.start_timeout = start_timeout
+
+        self._items = []
+        self._state = "idle"
+        self._lock = Lock()
+
+        self._cancel_event = Event()
+        self._current_stopped = False
+        self._thread = None
+
+        # The completion of each acquisition is expected after frames x period.
+        self._status_waiter = StatusWaiter(integration_manager.status_provider, timeout=acquisition_timeout)
+
+    def submit(self, items):
+        if not isinstance(items, list) or not items:
+            raise ValueError("Please provide a non empty list of acquisitions.")
+
+        with self._lock:
+            if self._state == "running":
+                raise ValueError("Acquisition queue already running. Cancel it first.")
+
+            base_config = self.integration_manager.get_acquisition_config()
+
+            self._items = []
+            for index, item in enumerate(items):
+                base_config = merge_config(base_config, item)
+                self._items.append({"index": index,
+                                    "config": base_config,
+                                    "output_file": base_config["writer"].get("output_file"),
+                                    "state": "pending",
+                                    "start_time": None,
+                                    "end_time": None,
+                                    "error": None})
+
+            self._state = "running"
+            self._cancel_event.clear()
+            self._current_stopped = False
+
+        _logger.info("Starting acquisition queue with %d items.", len(items))
+
+        self._thread = Thread(target=self._run_queue, name="acquisition_queue", daemon=True)
+        self._thread.start()
+
+        return self.get_status()
+
+    def cancel(self, stop_current=False):
+        """
+        Do not start any more acquisitions. If stop_current, the running acquisition is stopped as well.
+        """
+        _logger.info("Cancelling acquisition queue (stop_current=%s).", stop_current)
+        self._cancel_event.set()
+
+        if stop_current and self.is_running():
+            self._current_stopped = True
+            self.integration_manager.stop_acquisition()
+
+        return self.get_status()
+
+    def is_running(self):
+        return self._state == "running"
+
+    def get_status(self):
+        with self._lock:
+            items = [{key: value for key, value in item.items() if key != "config"} for item in self._items]
+            state = self._state
+
+        n_done = sum(1 for item in items if item["state"] == "done")
+
+        return {"state": state,
+                "n_items": len(items),
+                "n_done": n_done,
+                "items": items}
+
+    def _set_item_state(self, item, state, error=None):
+        with self._lock:
+            item["state"] = state
+            item["error"] = error
+
+            if state == "running":
+                item["start_time"] = time()
+            else:
+                item["end_time"] = time()
+
+    def _get_n_written_frames(self):
+        try:
+            writer_statistics = self.integration_manager.writer_client.get_statistics() or {}
+        except Exception as e:
+            _logger.debug("Cannot read the writer statistics: %s", e)
+            return 0
+
+        n_written_frames = writer_statistics.get("n_written_frames")
+        return n_written_frames if isinstance(n_written_frames, int) else 0
+
+    def _get_start_status(self):
+        status = self.integration_manager.get_acquisition_status()
+
+        # Very short acquisitions are READY again before RUNNING is seen - the writer statistics tell they ran.
+        if status == IntegrationStatus.RUNNING or self._get_n_written_frames() > 0:
+            return ACQUISITION_STARTED
+
+        return status
+
+    def _wait_for_completion(self, configuration, start_status):
+        # READY right after the start can still be the state before the writer and detector started.
+        if start_status != IntegrationStatus.RUNNING:
+            self._status_waiter.wait_for_status(self._get_start_status, ACQUISITION_STARTED,
+                                                allowed_status=(IntegrationStatus.READY,),
+                                                timeout=self.start_timeout)
+
+        self._status_waiter.wait_for_status(self.integration_manager.get_acquisition_status,
+                                            IntegrationStatus.READY,
+                                            expected_duration=get_expected_duration(configuration.get("detector")),
+                                            allowed_status=(IntegrationStatus.RUNNING, IntegrationStatus.ARMED))
+
+    def _run_queue(self):
+        final_state = "completed"
+
+        try:
+            for item in self._items:
+                if self._cancel_event.is_set():
+                    final_state = "cancelled"
+                    break
+
+                _logger.info("Starting queued acquisition %d (%s).", item["index"], item["output_file"])
+                self._set_item_state(item, "running")
+
+                try:
+                    start_status = self.integration_manager.start_acquisition(deepcopy(item["config"]))
+                    self._wait_for_completion(item["config"], start_status)
+                except Exception as e:
+                    _logger.error("Queued acquisition %d failed: %s", item["index"], e)
+                    self._set_item_state(item, "failed", str(e))
+                    final_state = "failed"
+                    break
+
+                if self._current_stopped:
+                    self._set_item_state(item, "stopped")
+                    final_state = "cancelled"
+                    break
+
+                self._set_item_state(item, "done")
+
+        finally:
+            with self._lock:
+                for item in self._items:
+                    if item["state"] == "pending":
+                        item["state"] = "cancelled" if final_state == "cancelled" else "skipped"
+
+                self._state = final_state
+
+            _logger.info("Acquisition queue %s.", final_state)
@@ -0,0 +1,102 @@
+import logging
+from copy import copy
+from logging import getLogger
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue, Full
+
+_logger = getLogger(__name__)
+
+AUDIT_LOGGER_NAME = "audit_trail"
+# Status reads - the most frequent audit records, sampled under load.
+STATUS_AUDIT_LOGGER_NAME = AUDIT_LOGGER_NAME + ".status"
+
+DEFAULT_AUDIT_QUEUE_SIZE = 10000
+# Above this queue fill level, only 1 in STATUS_SAMPLING_RATE status records is kept.
+STATUS_SAMPLING_THRESHOLD = 0.5
+STATUS_SAMPLING_RATE = 10
+
+
+class AuditQueueHandler(QueueHandler):
+    """
+    Put the audit records on a bounded queue, to be written by a QueueListener thread.
+
+    The records keep their message and arguments and are formatted by the listener, off the request thread. The
+    logged configs are flat dicts - shallow copies of them are enough to keep later changes from showing up. When the
+    queue is full, records are dropped and the number of dropped records is reported in the audit trail as soon as
+    there is room again. Status records are sampled once the queue is filling up.
+    """
+
+    def __init__(self, queue):
+        super(AuditQueueHandler, self).__init__(queue)
+
+        self.n_dropped = 0
+        self.n_sampled_out = 0
+        self._n_unreported_dropped = 0
+        self._n_status_records = 0
+
+    def _is_sampled_out(self, record):
+        if not record.name.startswith(STATUS_AUDIT_LOGGER_NAME) or not self.queue.maxsize:
+            return False
+
+        if self.queue.qsize() < self.queue.maxsize * STATUS_SAMPLING_THRESHOLD:
+            return False
+
+        self._n_status_records += 1
+        return self._n_status_records % STATUS_SAMPLING_RATE != 0
+
+    def prepare(self, record):
+        record = copy(record)
+
+        # Tracebacks reference live frames - format them now.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        if isinstance(record.args, dict):
+            record.args = copy(record.args)
+        elif record.args:
+            record.args = tuple(copy(arg) if isinstance(arg, (dict, list, set)) else arg for arg in record.args)
+
+        return record
+
+    def emit(self, record):
+        try:
+            if self._is_sampled_out(record):
+                self.n_sampled_out += 1
+                return
+
+            if self._n_unreported_dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": AUDIT_LOGGER_NAME, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": "%d audit records dropped.", "args": (self._n_unreported_dropped,)}))
+                self._n_unreported_dropped = 0
+
+            self.queue.put_nowait(self.prepare(record))
+
+        except Full:
+            self._drop()
+        except Exception:
+            self.handleError(record)
+
+    def _drop(self):
+        self.n_dropped += 1
+        self._n_unreported_dropped += 1
+
+
+def start_audit_logging(queue_size=DEFAULT_AUDIT_QUEUE_SIZE):
+    """
+    Move the audit trail handlers (by default the root logger handlers) to a background listener thread.
+    :return: The started QueueListener - stop it to flush the queued records.
+    """
+    audit_logger = getLogger(AUDIT_LOGGER_NAME)
+    handlers = audit_logger.handlers or getLogger().handlers
+
+    queue = Queue(queue_size)
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+
+    audit_logger.handlers = [AuditQueueHandler(queue)]
+    audit_logger.propagate = False
+
+    listener.start()
+
+    return listener
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from logging import getLogger
+from time import time
+
+_logger = getLogger(__name__)
+
+DEFAULT_CONFIG_STORE_FILE = "/var/lib/csaxs_dia/applied_config.json"
+
+STORED_SECTIONS = ("backend", "detector")
+
+
+def get_config_hash(configuration):
+    return hashlib.sha1(json.dumps(configuration, sort_keys=True).encode()).hexdigest()
+
+
+class ConfigStore(object):
+    """
+    Keep on disk the backend config and the detector parameters applied last.
+
+    Each section is saved with its hash, so a partially written or edited record is not trusted.
+    """
+
+    def __init__(self, filename=DEFAULT_CONFIG_STORE_FILE):
+        self.filename = filename
+
+    def save(self, backend_config, detector_parameters):
+        record = {"timestamp": time()}
+
+        for section_name, configuration in zip(STORED_SECTIONS, (backend_config, detector_parameters)):
+            record[section_name] = {"config": configuration,
+                                    "hash": get_config_hash(configuration)}
+
+        temporary_filename = self.filename + ".tmp"
+
+        try:
+            with open(temporary_filename, "w") as output_file:
+                json.dump(record, output_file, indent=2)
+
+            # Replace the old record atomically - a crash never leaves a half written file.
+            os.replace(temporary_filename, self.filename)
+        except Exception as e:
+            _logger.warning("Cannot save the applied config to '%s': %s", self.filename, e)
+
+    def load(self):
+        """
+        :return: Dictionary {"backend": config, "detector": parameters}, or None if no valid record is available.
+        """
+        try:
+            with open(self.filename) as input_file:
+                record = json.load(input_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            _logger.warning("Cannot read the applied config from '%s': %s", self.filename, e)
+            return None
+
+        configs = {}
+
+        for section_name in STORED_SECTIONS:
+            section = record.get(section_name) or {}
+            configuration = section.get("config")
+
+            if configuration is None or get_config_hash(configuration) != section.get("hash"):
+                _logger.warning("Applied config '%s' section in '%s' does not match its hash. Ignoring it.",
+                                section_name, self.filename)
+                return None
+
+            configs[section_name] = configuration
+
+        return configs
+
+    def clear(self):
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            _logger.warning("Cannot remove the applied config '%s': %s", self.filename, e)
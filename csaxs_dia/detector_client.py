@@ -1,23 +1,117 @@
-from detector_integration_api.client.detector_cli_client import DetectorClient
-from sls_detector import Eiger
+from logging import getLogger
+
+from csaxs_dia.detector_session import DetectorSession
+
+_logger = getLogger(__name__)
+
+# Mapping between the DIA detector config parameters and the Eiger object properties.
+DETECTOR_PARAMETERS_MAPPING = {"period": "period",
+                               "frames": "n_frames",
+                               "dr": "dynamic_range",
+                               "exptime": "exposure_time",
+                               "timing": "timing_mode",
+                               "cycles": "n_cycles"}
+
+# Eiger properties reported as detector metrics.
+DETECTOR_METRICS_PROPERTIES = ("frames_caught",)
 
 
 class EigerClientWrapper(object):
-    def __init__(self):
-        self.new_client = Eiger()
-        self.old_client = DetectorClient()
+    def __init__(self, session=None, old_client=None):
+        self.session = session if session is not None else DetectorSession()
+        # The CLI client is only needed for parameters the Eiger object does not expose.
+        self._old_client = old_client
+
+    @property
+    def old_client(self):
+        if self._old_client is None:
+            from detector_integration_api.client.detector_cli_client import DetectorClient
+            self._old_client = DetectorClient()
+
+        return self._old_client
+
+    @property
+    def new_client(self):
+        return self.session.connect()
 
     def start(self):
-        self.new_client.start_detector()
+        self.session.execute(lambda detector: detector.start_detector())
 
     def stop(self):
-        self.new_client.stop_detector()
+        self.session.execute(lambda detector: detector.stop_detector())
+
+    def get_property_name(self, parameter_name):
+        """
+        Return the Eiger property for the provided detector config parameter, or None if it has to be set via CLI.
+        """
+        if parameter_name in DETECTOR_PARAMETERS_MAPPING:
+            return DETECTOR_PARAMETERS_MAPPING[parameter_name]
+
+        # Parameters named as Eiger properties are passed through.
+        if isinstance(getattr(type(self.new_client), parameter_name, None), property):
+            return parameter_name
+
+        return None
 
     def set_config(self, configuration):
-        self.old_client.set_config(configuration)
+        native_configuration = {}
+        cli_configuration = {}
+
+        for parameter_name, value in configuration.items():
+            property_name = self.get_property_name(parameter_name)
+
+            if property_name is None:
+                cli_configuration[parameter_name] = value
+            else:
+                native_configuration[property_name] = value
+
+        def set_properties(detector):
+            for property_name, value in native_configuration.items():
+                _logger.debug("Setting detector property '%s' to '%s'.", property_name, value)
+                setattr(detector, property_name, value)
+
+        with self.session.serialized():
+            if native_configuration:
+                self.session.execute(set_properties, idempotent=True)
+
+            if cli_configuration:
+                _logger.debug("Setting detector parameters %s via CLI.", cli_configuration)
+                self.old_client.set_config(cli_configuration)
+
+    def get_config(self, parameter_names):
+        """
+        Read the current value of the provided detector config parameters.
+        Parameters only available via CLI are not read and missing from the result.
+        """
+        property_names = {}
+        for parameter_name in parameter_names:
+            property_name = self.get_property_name(parameter_name)
+            if property_name is not None:
+                property_names[parameter_name] = property_name
+
+        def read_properties(detector):
+            return {parameter_name: getattr(detector, property_name)
+                    for parameter_name, property_name in property_names.items()}
+
+        return self.session.execute(read_properties, idempotent=True)
 
     def get_status(self):
-        return self.new_client.status
+        return self.session.execute(lambda detector: detector.status, idempotent=True)
 
     def set_threshold(self, energy):
-        self.new_client.threshold = energy
+        self.session.execute(lambda detector: setattr(detector, "threshold", energy), idempotent=True)
+
+    def get_metrics(self):
+
+        def read_metrics(detector):
+            metrics = {}
+
+            for property_name in DETECTOR_METRICS_PROPERTIES:
+                try:
+                    metrics[property_name] = getattr(detector, property_name)
+                except Exception as e:
+                    _logger.debug("Cannot read detector property '%s': %s", property_name, e)
+
+            return metrics
+
+        return self.session.execute(read_metrics, idempotent=True)
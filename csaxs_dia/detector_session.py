@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from logging import getLogger
+from threading import RLock
+
+_logger = getLogger(__name__)
+
+# The detector library reports communication failures as RuntimeError - recognized by these words in the message.
+CONNECTION_ERROR_MARKERS = ("connect", "socket", "timeout", "timed out")
+
+
+def is_connection_error(error):
+    if isinstance(error, OSError):
+        return True
+
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and any(marker in message for marker in CONNECTION_ERROR_MARKERS)
+
+
+def create_eiger():
+    from sls_detector import Eiger
+    return Eiger()
+
+
+class DetectorSession(object):
+    """
+    Single connection to the detector control server, shared by every part of the DIA.
+
+    The connection is created on first use and commands are serialized. After a connection error, the next command
+    runs on a new connection. Idempotent commands (reading or setting parameters) are retried on it right away.
+    """
+
+    def __init__(self, detector_factory=create_eiger, reconnect_attempts=1):
+        self.detector_factory = detector_factory
+        self.reconnect_attempts = reconnect_attempts
+
+        self._detector = None
+        self._lock = RLock()
+
+    def connect(self):
+        with self._lock:
+            if self._detector is None:
+                _logger.info("Connecting to the detector.")
+                self._detector = self.detector_factory()
+
+            return self._detector
+
+    def disconnect(self):
+        with self._lock:
+            self._detector = None
+
+    def is_connected(self):
+        return self._detector is not None
+
+    @contextmanager
+    def serialized(self):
+        """
+        Hold the session for the duration of the block - no other detector command is executed in the meantime.
+        """
+        with self._lock:
+            yield
+
+    def execute(self, command, idempotent=False):
+        """
+        Execute the command with exclusive access to the detector.
+        :param command: Callable receiving the detector object.
+        :param idempotent: The command can safely be sent twice. Only these are retried after a connection error -
+                           a start that reached the detector before the connection broke must not be sent again.
+        :return: Value returned by the command.
+        """
+        with self._lock:
+            attempt = 0
+
+            while True:
+                detector = self.connect()
+
+                try:
+                    return command(detector)
+                except Exception as e:
+                    if not is_connection_error(e):
+                        raise
+
+                    self.disconnect()
+
+                    if not idempotent or attempt >= self.reconnect_attempts:
+                        raise
+
+                    attempt += 1
+                    _logger.warning("Detector command failed (%s). Reconnecting, attempt %d.", e, attempt)
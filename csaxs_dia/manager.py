@@ -1,13 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
+from functools import wraps
 from logging import getLogger
+from math import isclose
+from threading import Event, RLock, Thread
+from time import time
 
-from detector_integration_api.utils import check_for_target_status
 from csaxs_dia import validation_eiger9m
+from csaxs_dia.acquisition_queue import AcquisitionQueue
+from csaxs_dia.metrics import extract_sample
+from csaxs_dia.progress import ProgressTracker
+from csaxs_dia.timing import LatencyRecorder
 from csaxs_dia.validation_eiger9m import IntegrationStatus
+from csaxs_dia.waiting import StatusWaiter, get_expected_duration
 
 _logger = getLogger(__name__)
 _audit_logger = getLogger("audit_trail")
 
+# Time (in seconds) to wait for a status, once expected - about the one of the DIA check_for_target_status. The waits
+# hold the manager lock.
+STATUS_TIMEOUT = 1.0
+# Time (in seconds) for the writer to start receiving when arming: process start, file creation and stream connect.
+ARM_TIMEOUT = 10.0
+
+# Detector parameters the exposure time and period limits depend on - applied before the others.
+DETECTOR_PARAMETERS_FIRST = ("dr", "timing")
+
 
 def try_catch(func, error_message_prefix):
     def wrapped(*args, **kwargs):
@@ -15,68 +33,292 @@ def try_catch(func, error_message_prefix):
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            _audit_logger.error(error_message_prefix, e)
+            _audit_logger.error("%s %s", error_message_prefix, e)
 
     return wrapped
 
 
+def synchronized(method):
+    """
+    Serialize the calls to methods that change the state of the integration.
+    """
+    @wraps(method)
+    def wrapped(self, *args, **kwargs):
+        with self._manager_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapped
+
+
+def get_changed_parameters(applied_parameters, new_parameters):
+    """
+    Return the parameters from new_parameters that are not applied yet or were applied with a different value.
+    """
+    return {name: value for name, value in new_parameters.items()
+            if name not in applied_parameters or applied_parameters[name] != value}
+
+
+def get_detector_parameters_order(changed_parameters, applied_parameters):
+    """
+    Order in which the changed detector parameters have to be applied. The detector rejects an exposure time longer
+    than the period, so the period goes first when it gets longer and last when it gets shorter.
+    :return: List of parameter names.
+    """
+    first = [name for name in DETECTOR_PARAMETERS_FIRST if name in changed_parameters]
+    others = sorted(name for name in changed_parameters if name not in first and name not in ("exptime", "period"))
+
+    new_period = changed_parameters.get("period")
+    applied_period = applied_parameters.get("period")
+    period_shorter = isinstance(new_period, (int, float)) and isinstance(applied_period, (int, float)) and \
+        new_period < applied_period
+
+    times = [name for name in ("period", "exptime") if name in changed_parameters]
+    if period_shorter:
+        times.reverse()
+
+    return first + times + others
+
+
+def get_mismatched_parameters(applied_parameters, live_parameters):
+    """
+    Return the names of the applied parameters the detector reports with a different value (or does not report).
+    """
+    mismatched = []
+
+    for name, value in applied_parameters.items():
+        live_value = live_parameters.get(name)
+
+        if isinstance(value, float) and isinstance(live_value, (int, float)):
+            # The detector rounds the times to its clock.
+            if isclose(value, live_value, rel_tol=1e-6, abs_tol=1e-9):
+                continue
+        elif name in live_parameters and value == live_value:
+            continue
+
+        mismatched.append(name)
+
+    return mismatched
+
+
+def run_in_parallel(executor, tasks):
+    """
+    Run the provided tasks concurrently and wait for all of them to complete.
+    :param executor: Executor to run the tasks on.
+    :param tasks: Dictionary {task_name: callable}.
+    :return: Tuple (results, errors), both dictionaries indexed by task name.
+    """
+    futures = {name: executor.submit(task) for name, task in tasks.items()}
+
+    results = {}
+    errors = {}
+
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+
+    return results, errors
+
+
 class IntegrationManager(object):
-    def __init__(self, backend_client, writer_client, detector_client, status_provider):
+    def __init__(self, backend_client, writer_client, detector_client, status_provider, latency_recorder=None,
+                 packet_loss_monitor=None, max_data_rate=validation_eiger9m.DEFAULT_MAX_DATA_RATE, config_store=None):
         self.backend_client = backend_client
         self.writer_client = writer_client
         self.detector_client = detector_client
         self.status_provider = status_provider
 
+        # Optional live packet loss counters, reported with the detector metrics.
+        self.packet_loss_monitor = packet_loss_monitor
+
+        # Smoothed frame rate and ETA of the running acquisition.
+        self.progress = ProgressTracker()
+
+        # Highest data rate (bytes/second) accepted in the acquisition config.
+        self.max_data_rate = max_data_rate
+
+        # Optional on disk record of the applied backend and detector configs - see resume.
+        self.config_store = config_store
+        # (backend config, detector parameters) last saved to the config store.
+        self._saved_config_record = None
+
+        # Waits for the status changes, woken up by the status provider.
+        self.status_waiter = StatusWaiter(status_provider, timeout=STATUS_TIMEOUT)
+
+        # Durations of every step executed by the manager.
+        self.latency = latency_recorder if latency_recorder is not None else LatencyRecorder()
+
         self._last_set_backend_config = {}
         self._last_set_writer_config = {}
         self._last_set_detector_config = {}
 
+        # Per parameter shadow of the values the detector is known to have applied.
+        self._applied_detector_parameters = {}
+
         self.last_config_successful = False
 
+        # Config applied and writer started, waiting for the detector to be started.
+        self._armed = False
+        # Armed, but the writer is not known to be receiving yet.
+        self._arming = False
+
+        # Components verification at startup in progress.
+        self._starting = False
+
+        # Held by all the methods that change the state. Read only methods do not need it.
+        self._manager_lock = RLock()
+
+        # One worker per component - the components are configured and reset concurrently.
+        self._component_executor = ThreadPoolExecutor(max_workers=3)
+
+        self.acquisition_queue = AcquisitionQueue(self)
+
+    @synchronized
     def start_acquisition(self, parameters):
 
         _audit_logger.info("Starting acquisition.")
-        
+
+        with self.latency.span("start_acquisition.get_acquisition_status"):
+            status = self._get_acquisition_status()
+
+        if status == IntegrationStatus.ARMED:
+            if parameters:
+                _logger.info("Acquisition already armed. Ignoring provided configuration.")
+
+            return self.fire_acquisition()
+
         if not parameters:
             raise ValueError("Cannot start acquisition without providing the configuration")
-    
-        status = self.get_acquisition_status()
- 
+
         if status != IntegrationStatus.READY:
             raise ValueError("Cannot start acquisition in %s state." % status)
 
+        self.latency.start_trace()
+
+        try:
+            with self.latency.span("start_acquisition"):
+                _audit_logger.info("self.set_acquisition_config()")
+                with self.latency.span("start_acquisition.set_acquisition_config"):
+                    self._set_acquisition_config(parameters)
+
+                self._reset_acquisition_counters()
+
+                _audit_logger.info("writer_client.start()")
+                with self.latency.span("start_acquisition.writer_client.start"):
+                    self.writer_client.start()
+
+                _audit_logger.info("detector_client.start()")
+                with self.latency.span("start_acquisition.detector_client.start"):
+                    self.detector_client.start()
+
+                self.status_provider.invalidate()
+
+                _audit_logger.info("Acquisition started.")
+
+                # We need the status READY for very short acquisitions - they are READY after the expected duration.
+                with self.latency.span("start_acquisition.wait_for_status"):
+                    return self.status_waiter.wait_for_status(
+                        self._get_acquisition_status, (IntegrationStatus.RUNNING, IntegrationStatus.READY),
+                        expected_duration=get_expected_duration(self._last_set_detector_config))
+        finally:
+            self.latency.end_trace(self._last_set_writer_config.get("output_file"))
+
+    @synchronized
+    def arm_acquisition(self, parameters):
+        _audit_logger.info("Arming acquisition.")
+
+        if not parameters:
+            raise ValueError("Cannot arm acquisition without providing the configuration")
+
+        status = self._get_acquisition_status()
+
+        if status != IntegrationStatus.READY:
+            raise ValueError("Cannot arm acquisition in %s state." % status)
+
         _audit_logger.info("self.set_acquisition_config()")
-        self._set_acquisition_config(parameters)
+        with self.latency.span("arm_acquisition.set_acquisition_config"):
+            self._set_acquisition_config(parameters)
+
+        self._reset_acquisition_counters()
 
         _audit_logger.info("writer_client.start()")
-        self.writer_client.start()
+        with self.latency.span("arm_acquisition.writer_client.start"):
+            self.writer_client.start()
+
+        self._armed = True
+        self._arming = True
+        self.status_provider.invalidate()
+
+        try:
+            # The writer has to be receiving before the detector can be fired.
+            with self.latency.span("arm_acquisition.wait_for_status"):
+                status = self.status_waiter.wait_for_status(
+                    self._get_acquisition_status, IntegrationStatus.ARMED,
+                    allowed_status=(IntegrationStatus.ARMING, IntegrationStatus.ARMED), timeout=ARM_TIMEOUT)
+        except:
+            self._armed = False
+            raise
+        finally:
+            self._arming = False
+
+        _audit_logger.info("Acquisition armed.")
+
+        return status
+
+    @synchronized
+    def fire_acquisition(self):
+        _audit_logger.info("Firing acquisition.")
+
+        # Only the local flag is checked - the writer status was verified when arming.
+        if not self._armed:
+            raise ValueError("Cannot fire acquisition in %s state." % self._get_acquisition_status())
 
         _audit_logger.info("detector_client.start()")
-        self.detector_client.start()
+        with self.latency.span("fire_acquisition.detector_client.start"):
+            self.detector_client.start()
+
+        self._armed = False
+        self.status_provider.invalidate()
 
         _audit_logger.info("Acquisition started.")
 
-        # We need the status READY for very short acquisitions.
-        return check_for_target_status(self.get_acquisition_status,
-                                       (IntegrationStatus.RUNNING, IntegrationStatus.READY))
+        return IntegrationStatus.RUNNING
 
+    @synchronized
     def stop_acquisition(self):
         _audit_logger.info("Stopping acquisition.")
 
-        status = self.get_acquisition_status()
+        status = self._get_acquisition_status()
+
+        if status == IntegrationStatus.ARMED:
+
+            _audit_logger.info("writer_client.stop()")
+            with self.latency.span("stop_acquisition.writer_client.stop"):
+                try_catch(self.writer_client.stop, "Error while trying to stop the writer.")()
 
-        if status == IntegrationStatus.RUNNING:
+        elif status == IntegrationStatus.RUNNING:
 
             _audit_logger.info("detector_client.stop()")
-            try_catch(self.detector_client.stop, "Error while trying to stop the detector.")()
+            with self.latency.span("stop_acquisition.detector_client.stop"):
+                try_catch(self.detector_client.stop, "Error while trying to stop the detector.")()
 
             _audit_logger.info("writer_client.stop()")
-            try_catch(self.writer_client.stop, "Error while trying to stop the writer.")()
+            with self.latency.span("stop_acquisition.writer_client.stop"):
+                try_catch(self.writer_client.stop, "Error while trying to stop the writer.")()
 
         return self.reset()
 
     def get_acquisition_status(self):
-        status = validation_eiger9m.interpret_status(self.status_provider.get_quick_status_details())
+        # The components are not verified yet - see verify_in_background.
+        if self._starting:
+            return IntegrationStatus.STARTING
+
+        return self._get_acquisition_status()
+
+    def _get_acquisition_status(self):
+        status = validation_eiger9m.interpret_status(self.status_provider.get_quick_status_details(),
+                                                     armed=self._armed, arming=self._arming)
         return status
 
     def get_status_details(self):
@@ -91,18 +333,24 @@ class IntegrationManager(object):
                 "backend": copy(self._last_set_backend_config),
                 "detector": copy(self._last_set_detector_config)}
 
+    @synchronized
     def set_acquisition_config(self, new_config):
-        status = self.get_acquisition_status()
+        status = self._get_acquisition_status()
 
         if status != IntegrationStatus.READY:
             raise ValueError("Cannot set config in status %s. Please reset() first." % status)
 
-        self._set_acquisition_config(new_config)
+        with self.latency.span("set_acquisition_config"):
+            self._set_acquisition_config(new_config)
+
+        self.status_provider.invalidate()
 
-        return check_for_target_status(self.get_acquisition_status, IntegrationStatus.READY)
+        with self.latency.span("set_acquisition_config.wait_for_status"):
+            return self.status_waiter.wait_for_status(self._get_acquisition_status, IntegrationStatus.READY)
 
+    @synchronized
     def set_threshold(self, configuration):
-        status = self.get_acquisition_status()
+        status = self._get_acquisition_status()
 
         if status != IntegrationStatus.READY:
             raise ValueError("Cannot set threshold in status %s. Please reset() first." % status)
@@ -113,7 +361,8 @@ class IntegrationManager(object):
         energy = configuration["energy"]
         _logger.info("Setting threshold energy to %s.", energy)
 
-        self.detector_client.set_threshold(energy)
+        with self.latency.span("set_threshold.detector_client.set_threshold"):
+            self.detector_client.set_threshold(energy)
 
         return status
 
@@ -133,53 +382,117 @@ class IntegrationManager(object):
                            writer_config, backend_config, detector_config)
 
         # Before setting the new config, validate the provided values. All must be valid.
-        if self.writer_client.client_enabled:
-            validation_eiger9m.validate_writer_config(writer_config)
+        with self.latency.span("set_acquisition_config.validate"):
+            if self.writer_client.client_enabled:
+                validation_eiger9m.validate_writer_config(writer_config)
 
-        if self.backend_client.client_enabled:
-            validation_eiger9m.validate_backend_config(backend_config)
+            if self.backend_client.client_enabled:
+                validation_eiger9m.validate_backend_config(backend_config)
 
-        if self.detector_client.client_enabled:
-            validation_eiger9m.validate_detector_config(detector_config)
+            if self.detector_client.client_enabled:
+                validation_eiger9m.validate_detector_config(detector_config)
 
-        validation_eiger9m.validate_configs_dependencies(writer_config, backend_config, detector_config)
-
-        if not last_config_successful or \
-                (last_config_successful and self._last_set_backend_config != backend_config):
+            validation_eiger9m.validate_configs_dependencies(writer_config, backend_config, detector_config,
+                                                             max_data_rate=self.max_data_rate)
 
+        def apply_backend_config():
             _logger.info("Backend configuration changed. Restarting and applying config %s.", backend_config)
+            self._apply_backend_config(backend_config, "set_acquisition_config")
 
-            _audit_logger.info("backend_client.close()")
-            self.backend_client.reset()
+        def apply_writer_config():
+            _audit_logger.info("writer_client.set_parameters(writer_config)")
+            with self.latency.span("set_acquisition_config.writer_client.set_parameters"):
+                self.writer_client.set_parameters(writer_config)
+            self._last_set_writer_config = writer_config
 
-            _audit_logger.info("backend_client.set_config(backend_config)")
-            self.backend_client.set_config(backend_config)
+        def apply_detector_config():
+            if not self.detector_client.is_client_enabled():
+                # The detector state is unknown while the client is disabled.
+                self._applied_detector_parameters = {}
+                self._last_set_detector_config = detector_config
+                return
 
-            _audit_logger.info("backend_client.open()")
-            self.backend_client.open()
+            changed_parameters = get_changed_parameters(self._applied_detector_parameters, detector_config)
 
-            self._last_set_backend_config = backend_config
-        else:
-            _logger.info("Backend config did not change. Skipping.")
+            if not changed_parameters:
+                _logger.info("Detector config did not change. Skipping.")
+                self._last_set_detector_config = detector_config
+                return
 
-        _audit_logger.info("writer_client.set_parameters(writer_config)")
-        self.writer_client.set_parameters(writer_config)
-        self._last_set_writer_config = writer_config
+            _logger.info("Detector configuration changed. Applying parameters %s.", changed_parameters)
 
-        if not last_config_successful or \
-                (last_config_successful and self._last_set_detector_config != detector_config):
+            for name in get_detector_parameters_order(changed_parameters, self._applied_detector_parameters):
+                value = changed_parameters[name]
 
-            _logger.info("Detector configuration changed. Applying config %s.", detector_config)
+                # Until the detector confirms the new value, the parameter state is unknown.
+                self._applied_detector_parameters.pop(name, None)
 
-            _audit_logger.info("detector_client.set_config(detector_config)")
-            self.detector_client.set_config(detector_config)
+                _audit_logger.info("detector_client.set_config({%r: %r})", name, value)
+                with self.latency.span("set_acquisition_config.detector_client.set_config"):
+                    self.detector_client.set_config({name: value})
+
+                self._applied_detector_parameters[name] = value
 
             self._last_set_detector_config = detector_config
+
+        # The components do not depend on each other - configure them at the same time.
+        config_tasks = {"writer": apply_writer_config}
+
+        if not last_config_successful or \
+                (last_config_successful and self._last_set_backend_config != backend_config):
+            config_tasks["backend"] = apply_backend_config
         else:
-            _logger.info("Detector config did not change. Skipping.")
+            _logger.info("Backend config did not change. Skipping.")
+
+        # Only the detector parameters that changed are sent - see apply_detector_config.
+        config_tasks["detector"] = apply_detector_config
+
+        _, errors = run_in_parallel(self._component_executor, config_tasks)
+
+        if errors:
+            error_messages = ["%s: %s" % (name, errors[name]) for name in sorted(errors)]
+            _audit_logger.error("Error while setting acquisition configuration: %s", error_messages)
+
+            # What the components have applied is not known anymore.
+            self._clear_config_store()
+
+            raise ValueError("Error while setting acquisition configuration:\n%s" % "\n".join(error_messages))
 
         self.last_config_successful = True
 
+        # Unchanged configs (scans, queues) do not touch the disk.
+        self._save_config_store()
+
+    def _apply_backend_config(self, backend_config, step_name):
+        _audit_logger.info("backend_client.close()")
+        with self.latency.span(step_name + ".backend_client.reset"):
+            self.backend_client.reset()
+
+        _audit_logger.info("backend_client.set_config(backend_config)")
+        with self.latency.span(step_name + ".backend_client.set_config"):
+            self.backend_client.set_config(backend_config)
+
+        _audit_logger.info("backend_client.open()")
+        with self.latency.span(step_name + ".backend_client.open"):
+            self.backend_client.open()
+
+        self._last_set_backend_config = backend_config
+
+    def _save_config_store(self):
+        """
+        Save the applied backend config and detector parameters, if they changed since they were last saved.
+        """
+        if self.config_store is None:
+            return
+
+        record = (copy(self._last_set_backend_config), copy(self._applied_detector_parameters))
+        if record == self._saved_config_record:
+            return
+
+        self.config_store.save(*record)
+        self._saved_config_record = record
+
+    @synchronized
     def update_acquisition_config(self, config_updates):
         current_config = self.get_acquisition_config()
 
@@ -195,6 +508,7 @@ class IntegrationManager(object):
 
         return self.set_acquisition_config(current_config)
 
+    @synchronized
     def set_clients_enabled(self, client_status):
 
         if "backend" in client_status:
@@ -214,36 +528,160 @@ class IntegrationManager(object):
                 "writer": self.writer_client.is_client_enabled(),
                 "detector": self.detector_client.is_client_enabled()}
 
+    @synchronized
     def reset(self):
         _audit_logger.info("Resetting integration api.")
 
         self.last_config_successful = False
+        self._armed = False
         self._last_set_backend_config = {}
         self._last_set_writer_config = {}
         self._last_set_detector_config = {}
+        self._applied_detector_parameters = {}
+        self._clear_config_store()
+
+        _audit_logger.info("detector_client.stop(), backend_client.reset(), writer_client.reset()")
+        run_in_parallel(self._component_executor, {
+            "detector": self.latency.timed("reset.detector_client.stop", try_catch(
+                self.detector_client.stop, "Error while trying to reset the detector.")),
+            "backend": self.latency.timed("reset.backend_client.reset", try_catch(
+                self.backend_client.reset, "Error while trying to reset the backend.")),
+            "writer": self.latency.timed("reset.writer_client.reset", try_catch(
+                self.writer_client.reset, "Error while trying to reset the writer."))})
+
+        self.status_provider.invalidate()
+
+        with self.latency.span("reset.wait_for_status"):
+            return self.status_waiter.wait_for_status(self._get_acquisition_status, IntegrationStatus.READY)
+
+    @synchronized
+    def resume(self):
+        """
+        Take over the backend config and detector parameters from the config store. The backend config is applied
+        again, the detector parameters are taken over only if the detector still has them. Falls back to reset if there
+        is no record or the DAQ is not ready.
+        """
+        _audit_logger.info("Resuming integration api.")
+
+        record = self.config_store.load() if self.config_store is not None else None
+        if record is None:
+            _logger.info("No applied config record available. Resetting.")
+            return self.reset()
+
+        self.status_provider.invalidate()
+        status = self._get_acquisition_status()
+        if status != IntegrationStatus.READY:
+            _logger.info("Cannot resume in %s state. Resetting.", status)
+            return self.reset()
 
-        _audit_logger.info("detector_client.stop()")
-        try_catch(self.detector_client.stop, "Error while trying to reset the detector.")()
+        backend_config = record["backend"]
+        detector_parameters = record["detector"]
 
-        _audit_logger.info("backend_client.reset()")
-        try_catch(self.backend_client.reset, "Error while trying to reset the backend.")()
+        def apply_backend_config():
+            if not self.backend_client.is_client_enabled():
+                return False
 
-        _audit_logger.info("writer_client.reset()")
-        try_catch(self.writer_client.reset, "Error while trying to reset the writer.")()
+            # The backend might have been restarted or reconfigured while the DIA was down - its live config is not
+            # known, so the stored one is applied again.
+            self._apply_backend_config(backend_config, "resume")
+            return True
 
-        return check_for_target_status(self.get_acquisition_status, IntegrationStatus.READY)
+        def read_detector_parameters():
+            if not self.detector_client.is_client_enabled():
+                return {}
 
-    def kill(self):
-        _audit_logger.info("Killing acquisition.")
+            return self.detector_client.get_config(list(detector_parameters)) or {}
+
+        results, errors = run_in_parallel(self._component_executor, {
+            "backend": apply_backend_config,
+            "detector": self.latency.timed("resume.detector_client.get_config", read_detector_parameters)})
+
+        for name in sorted(errors):
+            _logger.warning("Cannot verify the %s config: %s", name, errors[name])
+
+        if results.get("backend"):
+            _logger.info("Stored backend config applied again.")
+            self.last_config_successful = True
+        else:
+            _logger.info("Backend config not applied. It will be applied with the next acquisition.")
+            self._last_set_backend_config = {}
+            self.last_config_successful = False
+
+        # Only the parameters the detector confirms are considered applied.
+        mismatched_parameters = get_mismatched_parameters(detector_parameters, results.get("detector", {}))
+        if mismatched_parameters:
+            _logger.info("Detector parameters %s will be applied with the next acquisition.", mismatched_parameters)
+
+        self._applied_detector_parameters = {name: value for name, value in detector_parameters.items()
+                                             if name not in mismatched_parameters}
+        self._last_set_detector_config = dict(self._applied_detector_parameters)
+        self._last_set_writer_config = {}
+        self._armed = False
+        # The config store already has the record - it is rewritten only once the config changes.
+        self._saved_config_record = (copy(backend_config), copy(detector_parameters))
+
+        _audit_logger.info("Resumed with backend config %s and detector parameters %s.",
+                           self._last_set_backend_config, self._applied_detector_parameters)
+
+        return status
+
+    def verify_in_background(self, on_complete=None):
+        """
+        Resume (or reset) in a background thread. The acquisition status is STARTING until it completes, and the
+        methods that change the state wait for it.
+        :param on_complete: Called without arguments once the verification completed (successfully or not).
+        """
+        # Set before the thread starts, so no request sees the status of the unverified components.
+        with self._manager_lock:
+            self._starting = True
+
+        lock_acquired = Event()
+
+        def verify():
+            try:
+                # Held for the whole verification - the methods that change the state wait for it.
+                with self._manager_lock:
+                    lock_acquired.set()
+
+                    try:
+                        with self.latency.span("startup.resume"):
+                            self.resume()
+                    finally:
+                        self._starting = False
+            except Exception as e:
+                _logger.error("Components verification at startup failed: %s", e)
+            finally:
+                self.status_provider.invalidate()
+
+                if on_complete is not None:
+                    on_complete()
+
+        thread = Thread(target=verify, name="startup_verification", daemon=True)
+        thread.start()
+
+        # No state change can come in between - the verification runs first.
+        lock_acquired.wait()
 
-        _audit_logger.info("detector_client.stop()")
-        try_catch(self.detector_client.stop, "Error while trying to kill the detector.")()
+        return thread
 
-        _audit_logger.info("backend_client.reset()")
-        try_catch(self.backend_client.reset, "Error while trying to kill the backend.")()
+    def _clear_config_store(self):
+        self._saved_config_record = None
 
-        _audit_logger.info("writer_client.kill()")
-        try_catch(self.writer_client.kill, "Error while trying to kill the writer.")()
+        if self.config_store is not None:
+            self.config_store.clear()
+
+    @synchronized
+    def kill(self):
+        _audit_logger.info("Killing acquisition.")
+
+        _audit_logger.info("detector_client.stop(), backend_client.reset(), writer_client.kill()")
+        run_in_parallel(self._component_executor, {
+            "detector": self.latency.timed("kill.detector_client.stop", try_catch(
+                self.detector_client.stop, "Error while trying to kill the detector.")),
+            "backend": self.latency.timed("kill.backend_client.reset", try_catch(
+                self.backend_client.reset, "Error while trying to kill the backend.")),
+            "writer": self.latency.timed("kill.writer_client.kill", try_catch(
+                self.writer_client.kill, "Error while trying to kill the writer."))})
 
         return self.reset()
 
@@ -259,9 +697,59 @@ class IntegrationManager(object):
 
     def get_metrics(self):
         # Always return a copy - we do not want this to be updated.
+        detector_metrics = try_catch(self.detector_client.get_metrics, "Error while reading the detector metrics.")()
+
+        detector_metrics = dict(detector_metrics or {})
+        if self.packet_loss_monitor is not None:
+            detector_metrics.update(self.packet_loss_monitor.get_metrics())
+
         return {"writer": self.writer_client.get_statistics(),
                 "backend": self.backend_client.get_metrics(),
-                "detector": {}}
+                "detector": detector_metrics}
+
+    def _reset_acquisition_counters(self):
+        self.progress.reset()
+
+        if self.packet_loss_monitor is not None:
+            self.packet_loss_monitor.reset()
+
+    def get_progress(self):
+        """
+        Progress of the current acquisition: percent complete, frames the writer is behind the backend and ETA.
+        """
+        sample = extract_sample(self.get_metrics())
+
+        progress = self.progress.get_progress(time(),
+                                              self._last_set_writer_config.get("n_frames"),
+                                              sample["writer_frames"],
+                                              sample["backend_frames"])
+        progress["status"] = str(self.get_acquisition_status())
+
+        return progress
+
+    def submit_acquisition_queue(self, items):
+        return self.acquisition_queue.submit(items)
+
+    def get_acquisition_queue_status(self):
+        return self.acquisition_queue.get_status()
+
+    def cancel_acquisition_queue(self, stop_current=False):
+        return self.acquisition_queue.cancel(stop_current)
+
+    def validate_configurations(self, configurations):
+        if not isinstance(configurations, list):
+            raise ValueError("Please provide a list of configurations to validate.")
+
+        # Sections of disabled clients are not validated, same as when setting the config.
+        return validation_eiger9m.validate_configurations(
+            configurations,
+            validate_writer=self.writer_client.is_client_enabled(),
+            validate_backend=self.backend_client.is_client_enabled(),
+            validate_detector=self.detector_client.is_client_enabled(),
+            max_data_rate=self.max_data_rate)
+
+    def get_latency_statistics(self):
+        return self.latency.get_statistics()
 
     def test_daq(self, test_configuration):
         return "No daq test implemented yet."
@@ -0,0 +1,261 @@
+from array import array
+from logging import getLogger
+from math import isnan
+from threading import Event, Lock, Thread
+from time import time
+
+from csaxs_dia.validation_eiger9m import get_frame_size
+
+_logger = getLogger(__name__)
+
+DEFAULT_SAMPLING_INTERVAL = 1.0
+# One hour of history at the default sampling interval.
+DEFAULT_HISTORY_SIZE = 3600
+
+# Sampled fields: {field name: (metrics section, key in the section)}. All of them are counters.
+# The keys are the ones reported by the writer statistics, the backend metrics and the detector client metrics.
+SAMPLED_FIELDS = {"writer_frames": ("writer", "n_written_frames"),
+                  "writer_received_frames": ("writer", "n_received_frames"),
+                  "backend_frames": ("backend", "n_received_frames"),
+                  "detector_frames": ("detector", "frames_caught"),
+                  "detector_lost_packets": ("detector", "lost_packets")}
+
+# Derived rates: {rate name: sampled field}.
+RATE_FIELDS = {"writer_frame_rate": "writer_frames",
+               "backend_frame_rate": "backend_frames",
+               "detector_frame_rate": "detector_frames",
+               "detector_packet_loss_rate": "detector_lost_packets"}
+
+# Size (in bytes) of one frame with the active detector config, sampled with the counters - the bytes per second are
+# derived from the writer frame rate.
+FRAME_SIZE_FIELD = "frame_size"
+
+PROMETHEUS_METRICS_HELP = {"writer_frames": "Frames written by the writer.",
+                           "writer_received_frames": "Frames received by the writer.",
+                           "backend_frames": "Frames received by the backend.",
+                           "detector_frames": "Frames reported by the detector.",
+                           "detector_lost_packets": "Packets lost in the current acquisition (packet loss monitor).",
+                           "writer_frame_rate": "Frames per second written by the writer.",
+                           "backend_frame_rate": "Frames per second received by the backend.",
+                           "detector_frame_rate": "Frames per second reported by the detector.",
+                           "detector_packet_loss_rate": "Packets per second lost (packet loss monitor).",
+                           "bytes_per_second": "Bytes per second written by the writer.",
+                           "backend_writer_lag": "Frames received by the backend but not yet written by the writer."}
+
+# Missing keys already logged - reported once, not at every sample.
+_logged_missing_keys = set()
+
+
+def extract_sample(metrics):
+    """
+    Extract the sampled fields from the output of IntegrationManager.get_metrics().
+    Fields not reported are NaN. A key missing from a section the component does report is logged.
+    """
+    sample = {}
+
+    for field_name, (section_name, key) in SAMPLED_FIELDS.items():
+        section = metrics.get(section_name) or {}
+        value = float("nan")
+
+        if key in section:
+            try:
+                value = float(section[key])
+            except (TypeError, ValueError):
+                _logger.debug("Metric '%s' of the %s is not a number: %s", key, section_name, section[key])
+
+        elif section and (section_name, key) not in _logged_missing_keys:
+            _logged_missing_keys.add((section_name, key))
+            _logger.warning("The %s metrics do not report '%s' - '%s' is not sampled. Reported keys: %s",
+                            section_name, key, field_name, sorted(section))
+
+        sample[field_name] = value
+
+    return sample
+
+
+class RingBuffer(object):
+    """
+    Fixed size history of samples, stored in one array per field.
+    """
+
+    def __init__(self, capacity, field_names):
+        self.capacity = capacity
+        self.field_names = tuple(field_names)
+
+        self._timestamps = array("d", [0.0] * capacity)
+        self._fields = {name: array("d", [float("nan")] * capacity) for name in self.field_names}
+
+        self._next_index = 0
+        self._n_samples = 0
+
+    def __len__(self):
+        return self._n_samples
+
+    def append(self, timestamp, sample):
+        index = self._next_index
+
+        self._timestamps[index] = timestamp
+        for name in self.field_names:
+            self._fields[name][index] = sample.get(name, float("nan"))
+
+        self._next_index = (index + 1) % self.capacity
+        self._n_samples = min(self._n_samples + 1, self.capacity)
+
+    def _get_indexes(self, n_samples):
+        n_samples = self._n_samples if n_samples is None else min(n_samples, self._n_samples)
+        first_index = (self._next_index - n_samples) % self.capacity
+
+        return [(first_index + offset) % self.capacity for offset in range(n_samples)]
+
+    def get_samples(self, n_samples=None):
+        """
+        Return the last n_samples (all if None), oldest first, as {"timestamp": [...], field_name: [...]}.
+        """
+        indexes = self._get_indexes(n_samples)
+
+        samples = {"timestamp": [self._timestamps[index] for index in indexes]}
+        for name in self.field_names:
+            field = self._fields[name]
+            samples[name] = [field[index] for index in indexes]
+
+        return samples
+
+
+def get_rate(timestamps, values):
+    """
+    Rate of change between the last two samples. NaN if not available or if the counter was reset.
+    """
+    if len(timestamps) < 2:
+        return float("nan")
+
+    time_delta = timestamps[-1] - timestamps[-2]
+    value_delta = values[-1] - values[-2]
+
+    if time_delta <= 0 or value_delta < 0:
+        return float("nan")
+
+    return value_delta / time_delta
+
+
+def get_sample_frame_size(detector_config):
+    """
+    :return: Frame size (in bytes) for the detector config, NaN if the dynamic range is not known.
+    """
+    dynamic_range = (detector_config or {}).get("dr")
+
+    if not isinstance(dynamic_range, int) or isinstance(dynamic_range, bool):
+        return float("nan")
+
+    return float(get_frame_size(dynamic_range))
+
+
+def add_derived_fields(samples):
+    """
+    Add the rates, the bytes per second and the backend to writer lag to the provided samples (as returned by
+    RingBuffer.get_samples).
+    """
+    timestamps = samples["timestamp"]
+
+    for rate_name, field_name in RATE_FIELDS.items():
+        values = samples[field_name]
+        samples[rate_name] = [get_rate(timestamps[max(0, index - 1):index + 1], values[max(0, index - 1):index + 1])
+                              for index in range(len(timestamps))]
+
+    samples["bytes_per_second"] = [frame_rate * frame_size for frame_rate, frame_size
+                                   in zip(samples["writer_frame_rate"], samples[FRAME_SIZE_FIELD])]
+
+    samples["backend_writer_lag"] = [backend_frames - writer_frames for backend_frames, writer_frames
+                                     in zip(samples["backend_frames"], samples["writer_frames"])]
+
+    return samples
+
+
+def nan_to_none(values):
+    return [None if isnan(value) else value for value in values]
+
+
+class MetricsSampler(object):
+    """
+    Periodically sample the integration metrics into a ring buffer.
+    """
+
+    def __init__(self, integration_manager, interval=DEFAULT_SAMPLING_INTERVAL, history_size=DEFAULT_HISTORY_SIZE):
+        self.integration_manager = integration_manager
+        self.interval = interval
+
+        self._history = RingBuffer(history_size, list(SAMPLED_FIELDS) + [FRAME_SIZE_FIELD])
+        self._history_lock = Lock()
+
+        self._stop_event = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._sample_metrics, name="metrics_sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self):
+        sample = extract_sample(self.integration_manager.get_metrics())
+        sample[FRAME_SIZE_FIELD] = get_sample_frame_size(self.integration_manager.get_acquisition_config()["detector"])
+
+        with self._history_lock:
+            self._history.append(time(), sample)
+
+    def _sample_metrics(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                _logger.warning("Error while sampling the metrics: %s", e)
+
+    def get_history(self, n_samples=None):
+        with self._history_lock:
+            samples = self._history.get_samples(n_samples)
+
+        samples = add_derived_fields(samples)
+
+        return {name: nan_to_none(values) for name, values in samples.items()}
+
+    def get_latest(self):
+        """
+        Return the last sampled values and rates.
+        """
+        with self._history_lock:
+            samples = self._history.get_samples(2)
+
+        samples = add_derived_fields(samples)
+
+        return {name: values[-1] if values else float("nan") for name, values in samples.items()}
+
+    def get_prometheus_metrics(self):
+        """
+        Return the latest metrics in the Prometheus text exposition format.
+        """
+        latest = self.get_latest()
+        status = self.integration_manager.get_acquisition_status()
+
+        lines = ["# HELP dia_status Current integration status.",
+                 "# TYPE dia_status gauge",
+                 'dia_status{status="%s"} 1' % status.name.lower()]
+
+        for name in sorted(PROMETHEUS_METRICS_HELP):
+            value = latest.get(name, float("nan"))
+
+            # The sampled fields are counters (reset with each acquisition), the derived values are gauges.
+            if name in SAMPLED_FIELDS:
+                metric_name, metric_type = "dia_%s_total" % name, "counter"
+            else:
+                metric_name, metric_type = "dia_%s" % name, "gauge"
+
+            lines.append("# HELP %s %s" % (metric_name, PROMETHEUS_METRICS_HELP[name]))
+            lines.append("# TYPE %s %s" % (metric_name, metric_type))
+            lines.append("%s %s" % (metric_name, "NaN" if isnan(value) else repr(value)))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,188 @@
+"""
+Packet loss analysis of the written Eiger 9M files.
+
+Every file contains missing_packets_N datasets (N = 1, 2): one 64 bit mask per frame and half module, where each set
+bit is a lost packet. This tool reads the masks in bulk, counts the lost packets per half module and their packet
+positions with NumPy bit operations, spreads the files over a process pool and writes a single JSON summary.
+
+    csaxs_dia_packet_loss /gpfs/perf/X12SA/Data10/gac-x12saop/tmp/ --output /tmp/packet_loss.json
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+
+import h5py
+import numpy
+
+_logger = getLogger(__name__)
+
+MISSING_PACKETS_DATASET_PREFIX = "missing_packets_"
+PACKETS_PER_MASK = 64
+# Number of frames processed at once - limits the memory used to unpack the bits.
+FRAMES_PER_CHUNK = 1024
+
+
+def get_packet_bits(masks):
+    """
+    Unpack 64 bit masks into their bits.
+    :param masks: Array of masks with shape (n_frames, n_half_modules).
+    :return: uint8 array of shape (n_frames, n_half_modules, 64), bit i of each mask at index i.
+    """
+    masks = numpy.ascontiguousarray(masks, dtype="<u8")
+    mask_bytes = masks.view(numpy.uint8).reshape(masks.shape + (8,))
+
+    return numpy.unpackbits(mask_bytes, axis=-1, bitorder="little")
+
+
+def analyze_masks(masks):
+    """
+    :param masks: Array of masks with shape (n_frames, n_half_modules) or (n_half_modules,) for a single frame.
+    :return: Dictionary with per half module lost packets, frames with losses and lost packets per packet position.
+    """
+    masks = numpy.atleast_2d(masks)
+    n_frames, n_half_modules = masks.shape
+
+    packet_histogram = numpy.zeros((n_half_modules, PACKETS_PER_MASK), dtype=numpy.int64)
+    frames_with_loss = numpy.zeros(n_half_modules, dtype=numpy.int64)
+
+    for chunk_start in range(0, n_frames, FRAMES_PER_CHUNK):
+        chunk = masks[chunk_start:chunk_start + FRAMES_PER_CHUNK]
+
+        frames_with_loss += numpy.count_nonzero(chunk, axis=0)
+
+        # Frames without losses do not need to be unpacked.
+        lossy_chunk = chunk[numpy.any(chunk != 0, axis=1)]
+        if lossy_chunk.size:
+            packet_histogram += get_packet_bits(lossy_chunk).sum(axis=0, dtype=numpy.int64)
+
+    return {"n_frames": n_frames,
+            "frames_with_loss": frames_with_loss,
+            "lost_packets": packet_histogram.sum(axis=1),
+            "packet_histogram": packet_histogram}
+
+
+def analyze_file(filename):
+    """
+    Analyze all the missing packets datasets in the file.
+    :return: Dictionary {dataset name: analyze_masks result}.
+    """
+    results = {}
+
+    with h5py.File(filename, "r") as input_file:
+        datasets = []
+
+        def collect_datasets(name, item):
+            if isinstance(item, h5py.Dataset) and os.path.basename(name).startswith(MISSING_PACKETS_DATASET_PREFIX):
+                datasets.append(name)
+
+        input_file.visititems(collect_datasets)
+
+        for name in sorted(datasets):
+            results[os.path.basename(name)] = analyze_masks(input_file[name][()])
+
+    return results
+
+
+def _analyze_file_safe(filename):
+    try:
+        return filename, analyze_file(filename), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def merge_results(total, results):
+    for dataset_name, result in results.items():
+        if dataset_name not in total:
+            total[dataset_name] = {key: numpy.copy(value) if isinstance(value, numpy.ndarray) else value
+                                   for key, value in result.items()}
+            continue
+
+        for key, value in result.items():
+            total[dataset_name][key] = total[dataset_name][key] + value
+
+
+def to_summary(results):
+    """
+    Convert the analysis results into JSON serializable values.
+    """
+    summary = {}
+
+    for dataset_name, result in results.items():
+        lost_packets = result["lost_packets"]
+
+        summary[dataset_name] = {
+            "n_frames": int(result["n_frames"]),
+            "total_lost_packets": int(lost_packets.sum()),
+            "half_modules_with_loss": numpy.flatnonzero(lost_packets).tolist(),
+            "frames_with_loss": result["frames_with_loss"].tolist(),
+            "lost_packets": lost_packets.tolist(),
+            "packet_histogram": result["packet_histogram"].tolist()}
+
+    return summary
+
+
+def get_h5_files(paths):
+    filenames = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".h5"))
+        else:
+            filenames.append(path)
+
+    return filenames
+
+
+def analyze_files(filenames, n_processes=None):
+    """
+    Analyze the files on a process pool.
+    :return: Tuple (summary of all files, {filename: total lost packets}, {filename: error}).
+    """
+    total = {}
+    per_file = {}
+    errors = {}
+
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        for filename, results, error in executor.map(_analyze_file_safe, filenames):
+            if error is not None:
+                _logger.warning("Cannot analyze file '%s': %s", filename, error)
+                errors[filename] = error
+                continue
+
+            per_file[filename] = sum(int(result["lost_packets"].sum()) for result in results.values())
+            merge_results(total, results)
+
+    return to_summary(total), per_file, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packet loss analysis of Eiger 9M files.")
+    parser.add_argument("paths", nargs="+", help="H5 files or folders containing H5 files.")
+    parser.add_argument("-o", "--output", default="packet_loss_summary.json", help="Summary output file.")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="Number of processes to use. Defaults to the number of CPUs.")
+
+    arguments = parser.parse_args()
+
+    filenames = get_h5_files(arguments.paths)
+    print("Analyzing %d files." % len(filenames))
+
+    summary, per_file, errors = analyze_files(filenames, arguments.processes)
+
+    with open(arguments.output, "w") as output_file:
+        json.dump({"files": per_file,
+                   "errors": errors,
+                   "missing_packets": summary}, output_file)
+
+    for dataset_name, dataset_summary in sorted(summary.items()):
+        print("%s: %d lost packets in %d frames, half modules with losses: %s" %
+              (dataset_name, dataset_summary["total_lost_packets"], dataset_summary["n_frames"],
+               dataset_summary["half_modules_with_loss"]))
+
+    print("Summary written to %s." % arguments.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+from logging import getLogger
+from threading import Lock
+
+from csaxs_dia.stream import StreamReceiver
+
+_logger = getLogger(__name__)
+
+# Frame header fields with the 64 bit masks of lost packets (one mask per half module).
+MISSING_PACKETS_FIELDS = ("missing_packets_1", "missing_packets_2")
+FRAME_NUMBER_FIELDS = ("frame", "frame_index", "pulse_id")
+
+
+def count_bits(value):
+    return bin(value).count("1")
+
+
+def get_masks(header, field_name):
+    masks = header.get(field_name)
+
+    if masks is None:
+        return []
+
+    if not isinstance(masks, list):
+        masks = [masks]
+
+    return [int(mask) for mask in masks]
+
+
+class PacketLossMonitor(StreamReceiver):
+    """
+    Keep running per half module packet loss counters from the backend output stream.
+
+    Only the JSON header of each message is decoded; the image data is never copied. The counters are reset at the
+    start of every acquisition.
+    """
+
+    def __init__(self, stream_url, socket_type="sub"):
+        super(PacketLossMonitor, self).__init__(stream_url, socket_type, name="packet_loss_monitor")
+
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._n_frames = 0
+            self._n_lossy_frames = 0
+            self._n_skipped_frames = 0
+            self._last_frame_number = None
+            self._lost_packets = []
+            self._lossy_frames = []
+
+    def process_message(self, frames):
+        header = json.loads(frames[0].bytes.decode())
+
+        masks = [get_masks(header, field_name) for field_name in MISSING_PACKETS_FIELDS]
+        n_half_modules = max(len(field_masks) for field_masks in masks)
+
+        lost_packets = [0] * n_half_modules
+        for field_masks in masks:
+            for index, mask in enumerate(field_masks):
+                if mask:
+                    lost_packets[index] += count_bits(mask)
+
+        frame_number = next((header[name] for name in FRAME_NUMBER_FIELDS if name in header), None)
+
+        with self._lock:
+            if len(self._lost_packets) < n_half_modules:
+                padding = [0] * (n_half_modules - len(self._lost_packets))
+                self._lost_packets.extend(padding)
+                self._lossy_frames.extend(padding)
+
+            self._n_frames += 1
+
+            if any(lost_packets):
+                self._n_lossy_frames += 1
+
+                for index, n_lost_packets in enumerate(lost_packets):
+                    if n_lost_packets:
+                        self._lost_packets[index] += n_lost_packets
+                        self._lossy_frames[index] += 1
+
+            # Gaps in the frame numbers are frames that did not reach the monitor (not necessarily lost).
+            if frame_number is not None:
+                if self._last_frame_number is not None and frame_number > self._last_frame_number + 1:
+                    self._n_skipped_frames += frame_number - self._last_frame_number - 1
+                self._last_frame_number = frame_number
+
+    def get_metrics(self):
+        with self._lock:
+            return {"monitored_frames": self._n_frames,
+                    "frames_with_lost_packets": self._n_lossy_frames,
+                    "unmonitored_frames": self._n_skipped_frames,
+                    "lost_packets": sum(self._lost_packets),
+                    "lost_packets_per_half_module": list(self._lost_packets),
+                    "frames_with_lost_packets_per_half_module": list(self._lossy_frames),
+                    "half_modules_with_lost_packets": [index for index, value in enumerate(self._lost_packets)
+                                                       if value]}
@@ -0,0 +1,196 @@
+import json
+from io import BytesIO
+from logging import getLogger
+from threading import Lock
+
+import numpy
+
+from csaxs_dia.stream import StreamReceiver
+
+_logger = getLogger(__name__)
+
+PREVIEW_FORMATS = {"npy": "application/octet-stream",
+                   "npz": "application/octet-stream",
+                   "png": "image/png"}
+PROJECTIONS = ("x", "y")
+# Number of computed previews kept for the current frame.
+MAX_CACHED_PREVIEWS = 16
+
+
+def parse_roi(roi):
+    """
+    :param roi: "x_start,y_start,x_end,y_end" (pixels, end excluded).
+    :return: Tuple of 4 ints.
+    """
+    try:
+        values = tuple(int(value) for value in roi.split(","))
+    except ValueError:
+        values = ()
+
+    if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3] or min(values) < 0:
+        raise ValueError("Preview roi must be 'x_start,y_start,x_end,y_end', but '%s' was given." % roi)
+
+    return values
+
+
+def get_preview(image, binning=1, roi=None, projection=None):
+    """
+    Crop, bin and project an image.
+    :param image: 2D array.
+    :param binning: Number of pixels summed in each direction.
+    :param roi: Tuple (x_start, y_start, x_end, y_end) or None for the full image.
+    :param projection: "x" (sum of the columns), "y" (sum of the rows) or None.
+    """
+    if binning < 1:
+        raise ValueError("Preview binning must be a positive integer, but %s was given." % binning)
+
+    if projection not in PROJECTIONS + (None,):
+        raise ValueError("Preview projection must be one of %s, but '%s' was given." % (PROJECTIONS, projection))
+
+    if roi is not None:
+        x_start, y_start, x_end, y_end = roi
+
+        if x_start >= image.shape[1] or y_start >= image.shape[0]:
+            raise ValueError("Preview roi %s is outside the image of shape %s." % (roi, image.shape))
+
+        image = image[y_start:y_end, x_start:x_end]
+
+    if binning > 1:
+        height = image.shape[0] // binning * binning
+        width = image.shape[1] // binning * binning
+
+        if height == 0 or width == 0:
+            raise ValueError("Preview binning %d is larger than the image of shape %s." % (binning, image.shape))
+
+        image = image[:height, :width].reshape(height // binning, binning, width // binning, binning)
+        image = image.sum(axis=(1, 3), dtype=numpy.float64 if image.dtype.kind == "f" else numpy.int64)
+
+    if projection == "x":
+        image = image.sum(axis=0, dtype=numpy.float64)
+    elif projection == "y":
+        image = image.sum(axis=1, dtype=numpy.float64)
+
+    return image
+
+
+def encode_preview(preview, preview_format):
+    if preview_format not in PREVIEW_FORMATS:
+        raise ValueError("Preview format must be one of %s, but '%s' was given." %
+                         (sorted(PREVIEW_FORMATS), preview_format))
+
+    output = BytesIO()
+
+    if preview_format == "npy":
+        numpy.save(output, preview)
+
+    elif preview_format == "npz":
+        numpy.savez_compressed(output, preview=preview)
+
+    else:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ValueError("Preview format 'png' is not available - Pillow is not installed.")
+
+        if preview.ndim != 2:
+            raise ValueError("Preview format 'png' is not available for projections.")
+
+        minimum, maximum = float(preview.min()), float(preview.max())
+        scale = 255.0 / (maximum - minimum) if maximum > minimum else 0
+        image = ((preview - minimum) * scale).astype(numpy.uint8)
+
+        Image.fromarray(image).save(output, format="png")
+
+    return output.getvalue()
+
+
+class PreviewBuffer(StreamReceiver):
+    """
+    Keep the latest frame of the preview stream and compute previews of it on demand.
+
+    Received messages are only referenced (no copy). The image is copied into a preallocated buffer when a preview is
+    requested, and the computed previews are cached until the next frame arrives.
+    """
+
+    def __init__(self, stream_url, socket_type="sub"):
+        super(PreviewBuffer, self).__init__(stream_url, socket_type, name="preview_buffer")
+
+        # The receiving thread only takes the message lock, so it is not blocked while previews are computed.
+        self._message_lock = Lock()
+        self._latest_message = None
+        self._n_frames = 0
+
+        self._preview_lock = Lock()
+
+        self._buffer = None
+        self._buffer_frame = None
+        self._frame_metadata = None
+
+        self._cache = {}
+
+    def process_message(self, frames):
+        if len(frames) < 2:
+            return
+
+        with self._message_lock:
+            self._latest_message = frames
+            self._n_frames += 1
+
+    def _update_buffer(self):
+        """
+        Copy the latest frame into the buffer, if it changed. Must be called with the preview lock held.
+        """
+        with self._message_lock:
+            message = self._latest_message
+            n_frames = self._n_frames
+
+        if message is None:
+            raise ValueError("No preview frame received yet from '%s'." % self.stream_url)
+
+        if self._buffer_frame == n_frames:
+            return
+
+        header_frame, data_frame = message[:2]
+        header = json.loads(header_frame.bytes.decode())
+
+        shape = tuple(header["shape"])
+        dtype = numpy.dtype(header.get("type", "uint16"))
+
+        if self._buffer is None or self._buffer.shape != shape or self._buffer.dtype != dtype:
+            _logger.info("Allocating preview buffer of shape %s and type %s.", shape, dtype)
+            self._buffer = numpy.empty(shape, dtype=dtype)
+
+        numpy.copyto(self._buffer, numpy.frombuffer(data_frame.buffer, dtype=dtype).reshape(shape))
+
+        self._buffer_frame = n_frames
+        self._frame_metadata = {key: value for key, value in header.items() if not key.startswith("missing_packets")}
+        self._cache = {}
+
+    def get_preview(self, binning=1, roi=None, projection=None, preview_format="npy"):
+        """
+        :return: Tuple (encoded preview, frame metadata).
+        """
+        cache_key = (binning, roi, projection, preview_format)
+
+        with self._preview_lock:
+            self._update_buffer()
+
+            if cache_key not in self._cache:
+                if len(self._cache) >= MAX_CACHED_PREVIEWS:
+                    self._cache = {}
+
+                preview = get_preview(self._buffer, binning, roi, projection)
+                self._cache[cache_key] = encode_preview(preview, preview_format)
+
+            return self._cache[cache_key], self._frame_metadata
+
+    def get_status(self):
+        with self._message_lock:
+            n_frames = self._n_frames
+
+        with self._preview_lock:
+            shape = None if self._buffer is None else list(self._buffer.shape)
+
+        return {"stream_url": self.stream_url,
+                "n_received_frames": n_frames,
+                "shape": shape}
@@ -0,0 +1,105 @@
+from math import exp, isnan
+from threading import Lock
+
+# Time constant (in seconds) of the frame rate smoothing.
+DEFAULT_RATE_TIME_CONSTANT = 5.0
+
+
+class RateEstimator(object):
+    """
+    Exponentially weighted moving average of the rate of change of a counter.
+
+    The weight of each new measurement depends on the time since the previous one, so the smoothing does not depend
+    on how often the estimator is updated.
+    """
+
+    def __init__(self, time_constant=DEFAULT_RATE_TIME_CONSTANT):
+        self.time_constant = time_constant
+        self.reset()
+
+    def reset(self):
+        self.rate = None
+        self._last_timestamp = None
+        self._last_value = None
+
+    def update(self, timestamp, value):
+        if value is None or isnan(value):
+            return self.rate
+
+        if self._last_timestamp is not None:
+            time_delta = timestamp - self._last_timestamp
+            value_delta = value - self._last_value
+
+            # The counter was reset - start over.
+            if value_delta < 0:
+                self.reset()
+
+            elif time_delta > 0:
+                measured_rate = value_delta / time_delta
+
+                if self.rate is None:
+                    self.rate = measured_rate
+                else:
+                    weight = 1 - exp(-time_delta / self.time_constant)
+                    self.rate += weight * (measured_rate - self.rate)
+
+            else:
+                return self.rate
+
+        self._last_timestamp = timestamp
+        self._last_value = value
+
+        return self.rate
+
+
+def _none_if_nan(value):
+    return None if value is None or isnan(value) else value
+
+
+class ProgressTracker(object):
+    """
+    Progress of the running acquisition from the frames written by the writer and received by the backend.
+    """
+
+    def __init__(self, time_constant=DEFAULT_RATE_TIME_CONSTANT):
+        self._rate_estimator = RateEstimator(time_constant)
+        self._lock = Lock()
+
+    def reset(self):
+        with self._lock:
+            self._rate_estimator.reset()
+
+    def get_progress(self, timestamp, n_frames, written_frames, received_frames):
+        """
+        :param n_frames: Frames the writer has to write, None if not known.
+        :param written_frames: Frames written so far (NaN if not reported).
+        :param received_frames: Frames received by the backend so far (NaN if not reported).
+        """
+        written_frames = _none_if_nan(written_frames)
+        received_frames = _none_if_nan(received_frames)
+
+        with self._lock:
+            frame_rate = self._rate_estimator.update(timestamp, written_frames)
+
+        progress = {"n_frames": n_frames,
+                    "written_frames": written_frames,
+                    "received_frames": received_frames,
+                    "frames_behind": None,
+                    "percent_complete": None,
+                    "frame_rate": frame_rate,
+                    "eta": None}
+
+        if written_frames is not None and received_frames is not None:
+            progress["frames_behind"] = max(received_frames - written_frames, 0)
+
+        if n_frames and written_frames is not None:
+            progress["percent_complete"] = min(written_frames / n_frames * 100, 100.0)
+
+            remaining_frames = max(n_frames - written_frames, 0)
+
+            if remaining_frames == 0:
+                progress["eta"] = 0.0
+            elif frame_rate:
+                progress["eta"] = remaining_frames / frame_rate
+
+        return progress
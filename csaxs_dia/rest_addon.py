@@ -1,7 +1,14 @@
-from bottle import request
+import json
+from queue import Empty
 
+from bottle import request, response
 
-def add_rest_interface(app, integration_manager):
+# Interval (in seconds) for sending keepalive comments on idle status streams.
+STATUS_STREAM_KEEPALIVE_INTERVAL = 15
+
+
+def add_rest_interface(app, integration_manager, status_broadcaster=None, metrics_sampler=None, preview_buffer=None,
+                       startup_timer=None):
 
     @app.post("/api/v1/threshold")
     def set_threshold():
@@ -11,3 +18,127 @@ def add_rest_interface(app, integration_manager):
 
         return {"state": "ok",
                 "status": str(status)}
+
+    @app.post("/api/v1/queue")
+    def submit_acquisition_queue():
+        return {"state": "ok",
+                "queue": integration_manager.submit_acquisition_queue(request.json)}
+
+    @app.get("/api/v1/queue")
+    def get_acquisition_queue_status():
+        return {"state": "ok",
+                "queue": integration_manager.get_acquisition_queue_status()}
+
+    @app.delete("/api/v1/queue")
+    def cancel_acquisition_queue():
+        stop_current = request.query.get("stop_current", "false").lower() == "true"
+
+        return {"state": "ok",
+                "queue": integration_manager.cancel_acquisition_queue(stop_current)}
+
+    @app.post("/api/v1/validate")
+    def validate_configurations():
+        results = integration_manager.validate_configurations(request.json)
+
+        return {"state": "ok",
+                "valid": all(result["valid"] for result in results),
+                "results": results}
+
+    @app.get("/api/v1/progress")
+    def get_progress():
+        return {"state": "ok",
+                "progress": integration_manager.get_progress()}
+
+    @app.get("/api/v1/latency")
+    def get_latency():
+        return {"state": "ok",
+                "latency": integration_manager.get_latency_statistics()}
+
+    @app.post("/api/v1/arm")
+    def arm():
+        status = integration_manager.arm_acquisition(request.json)
+
+        return {"state": "ok",
+                "status": str(status)}
+
+    @app.post("/api/v1/fire")
+    def fire():
+        status = integration_manager.fire_acquisition()
+
+        return {"state": "ok",
+                "status": str(status)}
+
+    if startup_timer is not None:
+
+        @app.get("/api/v1/startup")
+        def get_startup_report():
+            return {"state": "ok",
+                    "startup": startup_timer.get_report()}
+
+    if status_broadcaster is not None:
+
+        @app.get("/api/v1/status/stream")
+        def get_status_stream():
+            response.content_type = "text/event-stream"
+            response.set_header("Cache-Control", "no-cache")
+
+            events = status_broadcaster.subscribe()
+
+            def generate_events():
+                try:
+                    while True:
+                        try:
+                            event_name, data = events.get(timeout=STATUS_STREAM_KEEPALIVE_INTERVAL)
+                        except Empty:
+                            yield ": keepalive\n\n"
+                            continue
+
+                        yield "event: %s\ndata: %s\n\n" % (event_name, json.dumps(data, default=str))
+                finally:
+                    status_broadcaster.unsubscribe(events)
+
+            return generate_events()
+
+    if metrics_sampler is not None:
+
+        @app.get("/api/v1/metrics/history")
+        def get_metrics_history():
+            n_samples = request.query.get("n_samples")
+
+            return {"state": "ok",
+                    "history": metrics_sampler.get_history(int(n_samples) if n_samples else None)}
+
+        @app.get("/metrics")
+        def get_prometheus_metrics():
+            response.content_type = "text/plain; version=0.0.4"
+
+            return metrics_sampler.get_prometheus_metrics()
+
+    if preview_buffer is not None:
+        from csaxs_dia.preview import PREVIEW_FORMATS, parse_roi
+
+        @app.get("/api/v1/preview")
+        def get_preview():
+            roi = request.query.get("roi")
+            preview_format = request.query.get("format", "npy")
+
+            try:
+                binning = int(request.query.get("binning", 1))
+            except ValueError:
+                raise ValueError("Preview binning must be a positive integer, but '%s' was given." %
+                                 request.query.get("binning"))
+
+            data, metadata = preview_buffer.get_preview(binning=binning,
+                                                        roi=parse_roi(roi) if roi else None,
+                                                        projection=request.query.get("projection") or None,
+                                                        preview_format=preview_format)
+
+            response.content_type = PREVIEW_FORMATS[preview_format]
+            response.set_header("X-Preview-Metadata", json.dumps(metadata, default=str))
+
+            return data
+
+        @app.get("/api/v1/preview/status")
+        def get_preview_status():
+            return {"state": "ok",
+                    "preview": preview_buffer.get_status()}
@@ -1,24 +1,115 @@
+from time import monotonic
+
+# The module imports below run before the port is bound - they load the DIA package (config for the command line
+# defaults, utils through the validation and the status modules). Their duration is reported as "module_imports".
+_MODULE_IMPORTS_START_TIME = monotonic()
+
 import argparse
 import logging
 
 import bottle
 
 from detector_integration_api import config
-from detector_integration_api.client.backend_rest_client import BackendClient
-from detector_integration_api.client.cpp_writer_client import CppWriterClient
-from detector_integration_api.rest_api.rest_server import register_rest_interface
-from detector_integration_api.utils import ClientDisableWrapper
 
-from csaxs_dia import manager, rest_addon
+from csaxs_dia.audit import start_audit_logging, DEFAULT_AUDIT_QUEUE_SIZE
 
+from csaxs_dia.config_store import ConfigStore
 from csaxs_dia.detector_client import EigerClientWrapper
-from csaxs_dia.status_provider import StatusProvider
+from csaxs_dia.detector_session import DetectorSession
+from csaxs_dia.metrics import MetricsSampler, DEFAULT_SAMPLING_INTERVAL, DEFAULT_HISTORY_SIZE
+from csaxs_dia.packet_monitor import PacketLossMonitor
+from csaxs_dia.preview import PreviewBuffer
+from csaxs_dia.status_stream import StatusBroadcaster
+from csaxs_dia.stream import SOCKET_TYPES
+from csaxs_dia.timing import LatencyRecorder, StartupTimer
+from csaxs_dia.validation_eiger9m import DEFAULT_MAX_DATA_RATE
+from csaxs_dia.writer_group import WriterGroup, RemoteWriterClient, get_writer_shards_errors, is_remote_shard
+from csaxs_dia.writer_pool import WriterPool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT, DEFAULT_PORT_COUNT
+from csaxs_dia.status_provider import StatusProvider, DEFAULT_STATUS_POLL_INTERVAL, DEFAULT_MAX_STATUS_AGE
+
+_MODULE_IMPORTS_END_TIME = monotonic()
 
 _logger = logging.getLogger(__name__)
 
+DEFAULT_SERVER = "threaded"
+# Besides "threaded", any bottle server adapter can be used (non default ones need their package installed).
+SERVER_CHOICES = ["threaded", "wsgiref", "waitress", "paste", "cheroot"]
+# Servers handling one request at a time - an open status stream would block all the other requests.
+SINGLE_THREADED_SERVERS = ["wsgiref"]
+
+
+def bind_threaded_server(host, port, quiet=False):
+    """
+    Bind the socket of the threaded wsgiref server. Until the server is started with an app, the connections wait in
+    the listen queue.
+    """
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    class RequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            if not quiet:
+                return WSGIRequestHandler.log_request(self, *args, **kwargs)
+
+    return make_server(host, int(port), None, ThreadingWSGIServer, RequestHandler)
+
+
+class ThreadedWSGIRefServer(bottle.ServerAdapter):
+    """
+    wsgiref server handling each request in its own thread. Serves on the socket bound with bind_threaded_server if
+    provided (bound_server option).
+    """
+
+    def run(self, app):
+        server = self.options.get("bound_server")
+        if server is None:
+            server = bind_threaded_server(self.host, self.port, self.quiet)
+
+        server.set_app(app)
+        server.serve_forever()
+
 
 def start_integration_server(host, port, backend_api_url, backend_stream_url, writer_port,
-                             writer_executable, writer_log_folder):
+                             writer_executable, writer_log_folder,
+                             status_poll_interval=DEFAULT_STATUS_POLL_INTERVAL,
+                             status_max_age=DEFAULT_MAX_STATUS_AGE,
+                             writer_pool_size=DEFAULT_POOL_SIZE,
+                             writer_idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                             server=DEFAULT_SERVER,
+                             metrics_interval=DEFAULT_SAMPLING_INTERVAL,
+                             metrics_history_size=DEFAULT_HISTORY_SIZE,
+                             timing_trace_folder=None,
+                             packet_monitor_stream_url=None,
+                             packet_monitor_socket_type="sub",
+                             preview_stream_url=None,
+                             max_data_rate=DEFAULT_MAX_DATA_RATE,
+                             config_store_file=None,
+                             writer_shards=None,
+                             startup_timer=None):
+
+    startup_timer = startup_timer if startup_timer is not None else StartupTimer()
+
+    if writer_shards:
+        shards_errors = get_writer_shards_errors(writer_shards)
+        if shards_errors:
+            raise ValueError("Invalid writer shards: %s" % " ".join(shards_errors))
+
+    # The port is bound before anything else - clients connecting during the startup wait instead of being refused.
+    bound_server = None
+    if server == "threaded":
+        bound_server = bind_threaded_server(host, port)
+        startup_timer.mark("port_bound")
+
+    # The DIA clients, the REST interface and the manager are only needed from here - imported after the bind.
+    with startup_timer.phase("imports"):
+        from csaxs_dia import manager, rest_addon
+        from detector_integration_api.client.backend_rest_client import BackendClient
+        from detector_integration_api.client.cpp_writer_client import CppWriterClient
+        from detector_integration_api.rest_api.rest_server import register_rest_interface
+        from detector_integration_api.utils import ClientDisableWrapper
 
     _logger.info("DIA rest API endpoint: http://%s:%s" % (host, port))
 
@@ -27,42 +118,169 @@ def start_integration_server(host, port, backend_api_url, backend_stream_url, wr
 
     _logger.info("Using writer executable '%s' and writing writer logs to '%s'.", writer_executable, writer_log_folder)
 
-    backend_client = BackendClient(backend_api_url)
-    writer_client = CppWriterClient(stream_url=backend_stream_url,
-                                    writer_executable=writer_executable,
-                                    writer_port=writer_port,
-                                    log_folder=writer_log_folder)
-    detector_client = EigerClientWrapper()
+    with startup_timer.phase("create_components"):
+        backend_client = BackendClient(backend_api_url)
+
+        def create_writer_client(stream_url, client_writer_port):
+            if writer_pool_size > 0:
+                return WriterPool(stream_url=stream_url,
+                                  writer_executable=writer_executable,
+                                  writer_port=client_writer_port,
+                                  log_folder=writer_log_folder,
+                                  pool_size=writer_pool_size,
+                                  idle_timeout=writer_idle_timeout)
+            else:
+                return CppWriterClient(stream_url=stream_url,
+                                       writer_executable=writer_executable,
+                                       writer_port=client_writer_port,
+                                       log_folder=writer_log_folder)
+
+        if writer_pool_size > 0:
+            _logger.info("Keeping %d idle standby writers per user (idle timeout %s seconds). "
+                         "The writer executable must support the standby mode.",
+                         writer_pool_size, writer_idle_timeout)
+
+        if writer_shards:
+            _logger.info("Writing with a group of %d writers: %s", len(writer_shards), writer_shards)
+            # The DIA cannot configure the backend outputs - a wrong fan-out shows up as part files with the wrong
+            # number of frames, for which no master file is written.
+            _logger.info("The backend must send frame i to output stream i %% %d, in the order of the shards.",
+                         len(writer_shards))
+
+            shard_clients = []
+            for index, shard in enumerate(writer_shards):
+                if is_remote_shard(shard):
+                    shard_clients.append(RemoteWriterClient(shard))
+                else:
+                    # Each local writer (or writer pool) gets its own port range.
+                    shard_clients.append(create_writer_client(shard, writer_port + index * DEFAULT_PORT_COUNT))
+
+            writer_client = WriterGroup(shard_clients)
+        else:
+            writer_client = create_writer_client(backend_stream_url, writer_port)
+
+        # Writer pools and groups run threads (and idle processes) of their own.
+        closable_writer_client = writer_client if isinstance(writer_client, (WriterPool, WriterGroup)) else None
 
-    backend_client = ClientDisableWrapper(backend_client)
-    writer_client = ClientDisableWrapper(writer_client)
-    detector_client = ClientDisableWrapper(detector_client)
+        # All detector access goes through this one session. It connects on first use.
+        detector_session = DetectorSession()
+        detector_client = EigerClientWrapper(session=detector_session)
 
-    status_provider = StatusProvider(backend_client, writer_client, detector_client)
+        backend_client = ClientDisableWrapper(backend_client)
+        writer_client = ClientDisableWrapper(writer_client)
+        detector_client = ClientDisableWrapper(detector_client)
 
-    integration_manager = manager.IntegrationManager(writer_client=writer_client,
-                                                     backend_client=backend_client,
-                                                     detector_client=detector_client,
-                                                     status_provider=status_provider)
+        status_provider = StatusProvider(backend_client, writer_client, detector_client,
+                                         poll_interval=status_poll_interval,
+                                         max_status_age=status_max_age)
 
-    app = bottle.Bottle()
-    register_rest_interface(app=app, integration_manager=integration_manager)
-    rest_addon.add_rest_interface(app=app, integration_manager=integration_manager)
+        packet_loss_monitor = None
+        if packet_monitor_stream_url:
+            _logger.info("Monitoring packet loss on stream '%s' (%s).",
+                         packet_monitor_stream_url, packet_monitor_socket_type)
 
-    _logger.info("Resetting DAQ before to verify components.")
-    integration_manager.reset()
+            if packet_monitor_socket_type == "pull" and packet_monitor_stream_url == backend_stream_url:
+                _logger.warning("The packet loss monitor pulls from the writer stream - "
+                                "it takes frames away from the writer.")
+
+            packet_loss_monitor = PacketLossMonitor(packet_monitor_stream_url, packet_monitor_socket_type)
+
+        integration_manager = manager.IntegrationManager(
+            writer_client=writer_client,
+            backend_client=backend_client,
+            detector_client=detector_client,
+            status_provider=status_provider,
+            latency_recorder=LatencyRecorder(trace_folder=timing_trace_folder),
+            packet_loss_monitor=packet_loss_monitor,
+            max_data_rate=max_data_rate,
+            config_store=ConfigStore(config_store_file) if config_store_file else None)
+
+        preview_buffer = None
+        if preview_stream_url:
+            _logger.info("Keeping the latest preview frame from stream '%s'.", preview_stream_url)
+            preview_buffer = PreviewBuffer(preview_stream_url)
+
+        status_broadcaster = None
+        if server in SINGLE_THREADED_SERVERS:
+            _logger.warning("The '%s' REST server handles one request at a time. The status stream is disabled.",
+                            server)
+        else:
+            status_broadcaster = StatusBroadcaster(integration_manager)
+
+        metrics_sampler = MetricsSampler(integration_manager, interval=metrics_interval,
+                                         history_size=metrics_history_size)
+
+    with startup_timer.phase("create_rest_app"):
+        app = bottle.Bottle()
+        register_rest_interface(app=app, integration_manager=integration_manager)
+        rest_addon.add_rest_interface(app=app, integration_manager=integration_manager,
+                                      status_broadcaster=status_broadcaster,
+                                      metrics_sampler=metrics_sampler,
+                                      preview_buffer=preview_buffer,
+                                      startup_timer=startup_timer)
+
+    # The components are verified while the REST server starts - the status is STARTING until it completes.
+    # Without a config store record, this is a reset.
+    _logger.info("Resuming DAQ to verify components.")
+    startup_timer.mark("verification_started")
+    integration_manager.verify_in_background(on_complete=lambda: startup_timer.mark("components_verified"))
+
+    with startup_timer.phase("start_background_services"):
+        status_provider.start_polling()
+
+        if status_broadcaster is not None:
+            status_broadcaster.start()
+
+        metrics_sampler.start()
+
+        if packet_loss_monitor is not None:
+            packet_loss_monitor.start()
+
+        if preview_buffer is not None:
+            preview_buffer.start()
 
     try:
-        bottle.run(app=app, host=host, port=port)
+        _logger.info("Using '%s' REST server.", server)
+
+        if bound_server is not None:
+            startup_timer.mark("server_started")
+            bottle.run(app=app, server=ThreadedWSGIRefServer(host=host, port=port, bound_server=bound_server))
+        else:
+            # Other bottle server adapters bind the port themselves, only once started.
+            startup_timer.mark("server_started")
+            bottle.run(app=app, host=host, port=port, server=server)
     finally:
-        pass
+        if preview_buffer is not None:
+            preview_buffer.stop()
+
+        if packet_loss_monitor is not None:
+            packet_loss_monitor.stop()
+
+        metrics_sampler.stop()
+
+        if status_broadcaster is not None:
+            status_broadcaster.stop()
+
+        status_provider.stop_polling()
+
+        if closable_writer_client is not None:
+            closable_writer_client.close()
+
+        if bound_server is not None:
+            bound_server.server_close()
 
 
 def main():
+    startup_timer = StartupTimer(start_time=_MODULE_IMPORTS_START_TIME)
+    startup_timer.add_phase("module_imports", _MODULE_IMPORTS_START_TIME, _MODULE_IMPORTS_END_TIME)
+
     parser = argparse.ArgumentParser(description='Rest API for beamline software')
     parser.add_argument('-i', '--interface', default=config.DEFAULT_SERVER_INTERFACE,
                         help="Hostname interface to bind to")
     parser.add_argument('-p', '--port', default=config.DEFAULT_SERVER_PORT, help="Server port")
+    parser.add_argument("--server", default=DEFAULT_SERVER, choices=SERVER_CHOICES,
+                        help="REST server to use. All but 'wsgiref' serve requests concurrently - the status "
+                             "stream is not available with 'wsgiref'.")
     parser.add_argument("--log_level", default=config.DEFAULT_LOGGING_LEVEL,
                         choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG'],
                         help="Log level to use.")
@@ -76,18 +294,74 @@ def main():
                         help="Executable to start the writer.")
     parser.add_argument("--writer_log_folder", type=str, default="/var/log/h5_zmq_writer",
                         help="Log directory for writer logs.")
+    parser.add_argument("--writer_pool_size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Number of idle standby writers to keep per user. Needs a writer with standby mode "
+                             "(see README). 0 (default) starts a writer for each acquisition.")
+    parser.add_argument("--writer_idle_timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="Time (in seconds) after which an unused standby writer is stopped.")
+    parser.add_argument("--writer_shards", nargs="+", default=None,
+                        help="Write with a group of writers, one for each backend output stream (frame i goes to "
+                             "stream i %% N). Each shard is a stream address (writer started on this host) or the "
+                             "http:// url of a standby writer on another node. Disabled by default.")
+    parser.add_argument("--metrics_interval", type=float, default=DEFAULT_SAMPLING_INTERVAL,
+                        help="Interval (in seconds) for sampling the metrics history.")
+    parser.add_argument("--metrics_history_size", type=int, default=DEFAULT_HISTORY_SIZE,
+                        help="Number of metrics samples kept in the history.")
+    parser.add_argument("--timing_trace_folder", type=str, default=None,
+                        help="If set, the duration of each step of every acquisition start is dumped to this folder.")
+    parser.add_argument("--packet_monitor_stream", type=str, default=None,
+                        help="Stream to monitor the lost packets on (backend output or preview stream). "
+                             "Disabled by default.")
+    parser.add_argument("--packet_monitor_socket", default="sub", choices=SOCKET_TYPES,
+                        help="Socket type of the packet monitor stream. Do not use 'pull' on the writer stream: "
+                             "it takes frames away from the writer.")
+    parser.add_argument("--config_store_file", type=str, default=None,
+                        help="File to keep the applied backend and detector config in. On restart, the detector config is "
+                             "not applied again if the detector still has it. Disabled by default.")
+    parser.add_argument("--max_data_rate", type=float, default=DEFAULT_MAX_DATA_RATE,
+                        help="Highest sustainable data rate (bytes/second). Configs above it are rejected, "
+                             "configs above 90%% of it are logged as warnings.")
+    parser.add_argument("--preview_stream", type=str, default=None,
+                        help="Preview stream (PUB) of the backend, for /api/v1/preview. Disabled by default.")
+    parser.add_argument("--audit_queue_size", type=int, default=DEFAULT_AUDIT_QUEUE_SIZE,
+                        help="Audit trail records buffered for the background writer. Records are dropped when full.")
+    parser.add_argument("--status_poll_interval", type=float, default=DEFAULT_STATUS_POLL_INTERVAL,
+                        help="Interval (in seconds) for polling the writer status in the background. 0 to disable.")
+    parser.add_argument("--status_max_age", type=float, default=DEFAULT_MAX_STATUS_AGE,
+                        help="Maximum age (in seconds) of the cached status before it is read again synchronously.")
 
     arguments = parser.parse_args()
 
     # Setup the logging level.
     logging.basicConfig(level=arguments.log_level, format='[%(levelname)s] %(message)s')
 
-    start_integration_server(arguments.interface, arguments.port,
-                             backend_api_url=arguments.backend_url,
-                             backend_stream_url=arguments.backend_stream,
-                             writer_port=arguments.writer_port,
-                             writer_executable=arguments.writer_executable,
-                             writer_log_folder=arguments.writer_log_folder)
+    # The audit trail is written by a background thread, off the acquisition path.
+    audit_listener = start_audit_logging(arguments.audit_queue_size)
+
+    try:
+        start_integration_server(arguments.interface, arguments.port,
+                                 backend_api_url=arguments.backend_url,
+                                 backend_stream_url=arguments.backend_stream,
+                                 writer_port=arguments.writer_port,
+                                 writer_executable=arguments.writer_executable,
+                                 writer_log_folder=arguments.writer_log_folder,
+                                 status_poll_interval=arguments.status_poll_interval,
+                                 status_max_age=arguments.status_max_age,
+                                 writer_pool_size=arguments.writer_pool_size,
+                                 writer_idle_timeout=arguments.writer_idle_timeout,
+                                 server=arguments.server,
+                                 metrics_interval=arguments.metrics_interval,
+                                 metrics_history_size=arguments.metrics_history_size,
+                                 timing_trace_folder=arguments.timing_trace_folder,
+                                 packet_monitor_stream_url=arguments.packet_monitor_stream,
+                                 packet_monitor_socket_type=arguments.packet_monitor_socket,
+                                 preview_stream_url=arguments.preview_stream,
+                                 max_data_rate=arguments.max_data_rate,
+                                 config_store_file=arguments.config_store_file,
+                                 writer_shards=arguments.writer_shards,
+                                 startup_timer=startup_timer)
+    finally:
+        audit_listener.stop()
 
 
 if __name__ == "__main__":
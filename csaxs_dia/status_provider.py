@@ -1,70 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from copy import copy
 from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic
 
 from detector_integration_api.utils import ClientDisableWrapper
 from csaxs_dia.validation_eiger9m import IntegrationStatus
-from csaxs_dia.detector_client import EigerClientWrapper
 
-_audit_logger = getLogger("audit_trail")
+# Status reads are frequent - they are sampled in the audit trail under load.
+_status_audit_logger = getLogger("audit_trail.status")
 _logger = getLogger(__name__)
 
+# Interval (in seconds) at which the background poller refreshes the quick status.
+DEFAULT_STATUS_POLL_INTERVAL = 0.1
+# Maximum age (in seconds) of a cached quick status before a synchronous refresh is forced.
+DEFAULT_MAX_STATUS_AGE = 0.5
+
+COMPONENT_NAMES = ("writer", "backend", "detector")
+# Time (in seconds) each component has to report its status for the complete status details.
+DEFAULT_COMPONENT_STATUS_TIMEOUTS = {"writer": 1.0,
+                                     "backend": 2.0,
+                                     "detector": 1.0}
+
 
 class StatusProvider(object):
-    def __init__(self, backend_client, writer_client, detector_client):
+    def __init__(self, backend_client, writer_client, detector_client,
+                 poll_interval=DEFAULT_STATUS_POLL_INTERVAL, max_status_age=DEFAULT_MAX_STATUS_AGE,
+                 component_status_timeouts=None):
         self.backend_client = backend_client
         self.writer_client = writer_client
         self.detector_client = detector_client
 
-        self.eiger = EigerClientWrapper()
-
-    def get_quick_status_details(self):
-
-        _logger.info("Getting quick status details.")
+        self.poll_interval = poll_interval
+        self.max_status_age = max_status_age
+
+        # Tuple (timestamp, status details) of the last quick status read from the components.
+        self._quick_status = None
+        # Last status details reported to the listeners.
+        self._last_status_details = None
+        # Incremented on every invalidation, so reads started before it are not cached.
+        self._quick_status_generation = 0
+        self._quick_status_lock = Lock()
+        # Only one thread at a time should query the components for the quick status.
+        self._refresh_lock = Lock()
+
+        self._poller_thread = None
+        self._poller_stop_event = Event()
+
+        # Callbacks invoked every time the quick status changes.
+        self._status_listeners = []
+
+        self.component_status_timeouts = dict(DEFAULT_COMPONENT_STATUS_TIMEOUTS)
+        if component_status_timeouts:
+            self.component_status_timeouts.update(component_status_timeouts)
+
+        # Each component can have at most one status request in flight.
+        self._status_executor = ThreadPoolExecutor(max_workers=len(COMPONENT_NAMES))
+        self._pending_status_requests = {}
+        self._pending_status_lock = Lock()
+
+    def start_polling(self):
+        if not self.poll_interval:
+            _logger.info("Status polling interval not set. Background status polling disabled.")
+            return
+
+        if self._poller_thread is not None and self._poller_thread.is_alive():
+            return
+
+        _logger.info("Starting background status polling every %s seconds.", self.poll_interval)
+
+        self._poller_stop_event.clear()
+        self._poller_thread = Thread(target=self._poll_status, name="status_poller", daemon=True)
+        self._poller_thread.start()
+
+    def stop_polling(self):
+        self._poller_stop_event.set()
+
+        if self._poller_thread is not None:
+            self._poller_thread.join()
+            self._poller_thread = None
+
+    def _poll_status(self):
+        while not self._poller_stop_event.wait(self.poll_interval):
+            try:
+                with self._refresh_lock:
+                    self._read_quick_status(audit=False)
+            except Exception as e:
+                _logger.warning("Error while polling the component status: %s", e)
+
+    def add_status_listener(self, callback):
+        """
+        Register a callback, called with the new status details every time the quick status changes.
+        """
+        self._status_listeners.append(callback)
+
+    def remove_status_listener(self, callback):
+        self._status_listeners.remove(callback)
+
+    def _notify_status_listeners(self, status_details):
+        for callback in list(self._status_listeners):
+            try:
+                callback(copy(status_details))
+            except Exception as e:
+                _logger.warning("Error in status listener %s: %s", callback, e)
+
+    def invalidate(self):
+        """
+        Drop the cached quick status. Call this after changing the state of a component, so the next status read
+        reflects the change.
+        """
+        with self._quick_status_lock:
+            self._quick_status = None
+            self._quick_status_generation += 1
+            # The next read is reported to the listeners even if the component status did not change.
+            self._last_status_details = None
+
+    def _get_cached_quick_status(self):
+        with self._quick_status_lock:
+            quick_status = self._quick_status
+
+        if quick_status is None:
+            return None
+
+        timestamp, status_details = quick_status
+        if monotonic() - timestamp > self.max_status_age:
+            return None
+
+        return status_details
+
+    def _read_quick_status(self, audit=True):
+        timestamp = monotonic()
+
+        with self._quick_status_lock:
+            generation = self._quick_status_generation
+
+        # Background polls are not part of the audit trail - they would flood it.
+        if audit:
+            _status_audit_logger.info("writer_client.get_status()")
 
-        _audit_logger.info("writer_client.get_status()")
         try:
             writer_status = self.writer_client.get_status() \
                 if self.writer_client.is_client_enabled() else ClientDisableWrapper.STATUS_DISABLED
         except:
             writer_status = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
 
-        backend_status = None
-        detector_status = None
+        status_details = {"writer": writer_status,
+                          "backend": None,
+                          "detector": None}
+
+        status_changed = False
+
+        with self._quick_status_lock:
+            if generation == self._quick_status_generation:
+                status_changed = self._last_status_details != status_details
+                self._last_status_details = status_details
+                self._quick_status = (timestamp, status_details)
+
+        if status_changed:
+            self._notify_status_listeners(status_details)
+
+        return status_details
+
+    def get_quick_status_details(self):
+
+        _logger.info("Getting quick status details.")
+
+        status_details = self._get_cached_quick_status()
+
+        if status_details is None:
+            with self._refresh_lock:
+                # Another thread might have refreshed the status while we were waiting.
+                status_details = self._get_cached_quick_status()
+
+                if status_details is None:
+                    status_details = self._read_quick_status()
 
         _logger.debug("Detailed status requested:\nWriter: %s\nBackend: %s\nDetector: %s",
-                      writer_status, backend_status, detector_status)
+                      status_details["writer"], status_details["backend"], status_details["detector"])
 
-        return {"writer": writer_status,
-                "backend": backend_status,
-                "detector": detector_status}
+        return copy(status_details)
 
-    def get_complete_status_details(self):
+    def _get_component_status(self, component_name):
+        client = getattr(self, component_name + "_client")
 
-        _logger.info("Getting complete status details.")
+        _status_audit_logger.info("%s_client.get_status()", component_name)
+        start_time = monotonic()
 
-        _audit_logger.info("writer_client.get_status()")
         try:
-            writer_status = self.writer_client.get_status() \
-                if self.writer_client.is_client_enabled() else ClientDisableWrapper.STATUS_DISABLED
+            status = client.get_status() if client.is_client_enabled() else ClientDisableWrapper.STATUS_DISABLED
         except:
-            writer_status = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
+            status = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
 
-        _audit_logger.info("backend_client.get_status()")
-        try:
-            backend_status = self.backend_client.get_status() \
-                if self.backend_client.is_client_enabled() else ClientDisableWrapper.STATUS_DISABLED
-        except:
-            backend_status = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
+        return status, monotonic() - start_time
 
-        _audit_logger.info("detector_client.get_status()")
-        try:
-            detector_status = self.detector_client.get_status() \
-                if self.detector_client.is_client_enabled() else ClientDisableWrapper.STATUS_DISABLED
-        except:
-            detector_status = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
+    def get_complete_status_details(self):
+
+        _logger.info("Getting complete status details.")
+
+        futures = {}
+        with self._pending_status_lock:
+            for component_name in COMPONENT_NAMES:
+                # Do not pile up requests on a component that did not answer the previous one yet.
+                future = self._pending_status_requests.get(component_name)
+                if future is None or future.done():
+                    future = self._status_executor.submit(self._get_component_status, component_name)
+                    self._pending_status_requests[component_name] = future
+
+                futures[component_name] = future
+
+        request_start_time = monotonic()
+        status_details = {}
+        latency = {}
+
+        for component_name in COMPONENT_NAMES:
+            timeout = self.component_status_timeouts[component_name]
+            remaining_time = max(0, timeout - (monotonic() - request_start_time))
+
+            try:
+                status_details[component_name], latency[component_name] = \
+                    futures[component_name].result(timeout=remaining_time)
+            except TimeoutError:
+                _logger.warning("Component '%s' did not report its status in %s seconds.", component_name, timeout)
+                status_details[component_name] = IntegrationStatus.COMPONENT_NOT_RESPONDING.value
+                latency[component_name] = None
 
         _logger.debug("Detailed status requested:\nWriter: %s\nBackend: %s\nDetector: %s",
-                      writer_status, backend_status, detector_status)
+                      status_details["writer"], status_details["backend"], status_details["detector"])
+
+        status_details["latency"] = latency
 
-        return {"writer": writer_status,
-                "backend": backend_status,
-                "detector": detector_status}
+        return status_details
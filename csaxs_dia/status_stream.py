@@ -0,0 +1,130 @@
+from logging import getLogger
+from queue import Queue, Full, Empty
+from threading import Event, Lock, Thread
+from time import monotonic, time
+
+_logger = getLogger(__name__)
+
+# Interval (in seconds) at which the acquisition status is checked if no change was reported.
+DEFAULT_STATUS_CHECK_INTERVAL = 0.5
+# Interval (in seconds) at which the metrics are pushed to subscribers.
+DEFAULT_METRICS_INTERVAL = 1.0
+# Maximum number of events buffered per subscriber. The oldest events are dropped for slow subscribers.
+DEFAULT_SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class StatusBroadcaster(object):
+    """
+    Push IntegrationStatus transitions and periodic metrics to any number of subscribers.
+
+    Each subscriber receives (event_name, data) tuples on its own queue.
+    """
+
+    def __init__(self, integration_manager, status_check_interval=DEFAULT_STATUS_CHECK_INTERVAL,
+                 metrics_interval=DEFAULT_METRICS_INTERVAL, queue_size=DEFAULT_SUBSCRIBER_QUEUE_SIZE):
+        self.integration_manager = integration_manager
+        self.status_check_interval = status_check_interval
+        self.metrics_interval = metrics_interval
+        self.queue_size = queue_size
+
+        self._subscribers = []
+        self._subscribers_lock = Lock()
+
+        self._last_status = None
+        self._wakeup_event = Event()
+        self._stop_event = Event()
+        self._thread = None
+
+    def start(self):
+        self.integration_manager.status_provider.add_status_listener(self.notify)
+
+        self._stop_event.clear()
+        self._thread = Thread(target=self._broadcast, name="status_broadcaster", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.integration_manager.status_provider.remove_status_listener(self.notify)
+
+        self._stop_event.set()
+        self._wakeup_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def notify(self, status_details=None):
+        """
+        Wake up the broadcaster - called by the status provider when a component status changes.
+        """
+        self._wakeup_event.set()
+
+    def subscribe(self):
+        events = Queue(maxsize=self.queue_size)
+
+        # New subscribers start with the current status.
+        if self._last_status is not None:
+            events.put(("status", self._get_status_data(self._last_status)))
+
+        with self._subscribers_lock:
+            self._subscribers.append(events)
+
+        return events
+
+    def unsubscribe(self, events):
+        with self._subscribers_lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def get_n_subscribers(self):
+        with self._subscribers_lock:
+            return len(self._subscribers)
+
+    def publish(self, event_name, data):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+
+        for events in subscribers:
+            while True:
+                try:
+                    events.put_nowait((event_name, data))
+                    break
+                except Full:
+                    # Slow subscriber - drop its oldest event.
+                    try:
+                        events.get_nowait()
+                    except Empty:
+                        pass
+
+    @staticmethod
+    def _get_status_data(status):
+        return {"status": str(status),
+                "timestamp": time()}
+
+    def _broadcast(self):
+        last_metrics_time = monotonic()
+
+        while not self._stop_event.is_set():
+            self._wakeup_event.wait(self.status_check_interval)
+            self._wakeup_event.clear()
+
+            if self._stop_event.is_set():
+                break
+
+            try:
+                status = self.integration_manager.get_acquisition_status()
+
+                if status != self._last_status:
+                    _logger.debug("Broadcasting status change %s -> %s.", self._last_status, status)
+                    self._last_status = status
+                    self.publish("status", self._get_status_data(status))
+
+                if monotonic() - last_metrics_time >= self.metrics_interval:
+                    last_metrics_time = monotonic()
+
+                    # Metrics need calls to the components - only get them if somebody is listening.
+                    if self.get_n_subscribers():
+                        self.publish("metrics", {"metrics": self.integration_manager.get_metrics(),
+                                                 "timestamp": time()})
+
+            except Exception as e:
+                _logger.warning("Error while broadcasting the status: %s", e)
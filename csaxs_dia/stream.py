@@ -0,0 +1,92 @@
+from logging import getLogger
+from threading import Event, Thread
+
+_logger = getLogger(__name__)
+
+# Time (in milliseconds) to wait for a message before checking if the receiver was stopped.
+RECEIVE_TIMEOUT = 200
+
+SOCKET_TYPES = ("sub", "pull")
+
+
+class StreamReceiver(object):
+    """
+    Receive the multipart messages of a ZMQ stream in a background thread.
+
+    Messages are received without copying (zmq.Frame objects) and handed to process_message, so subclasses only pay
+    for the parts they actually read. Beware: on a PUSH stream every connected receiver takes frames away from the
+    other receivers (the writer), so a PULL receiver should only be connected to a dedicated stream.
+    """
+
+    def __init__(self, stream_url, socket_type="sub", name="stream_receiver"):
+        if socket_type not in SOCKET_TYPES:
+            raise ValueError("Stream socket type must be one of %s, but '%s' was given." % (SOCKET_TYPES, socket_type))
+
+        self.stream_url = stream_url
+        self.socket_type = socket_type
+        self.name = name
+
+        self._stop_event = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._receive, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def process_message(self, frames):
+        """
+        Process one multipart message.
+        :param frames: List of zmq.Frame - use frame.buffer for zero-copy access to the data.
+        """
+        raise NotImplementedError()
+
+    def _create_socket(self, context):
+        import zmq
+
+        if self.socket_type == "sub":
+            socket = context.socket(zmq.SUB)
+            socket.setsockopt(zmq.SUBSCRIBE, b"")
+        else:
+            socket = context.socket(zmq.PULL)
+
+        socket.setsockopt(zmq.RCVTIMEO, RECEIVE_TIMEOUT)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.stream_url)
+
+        return socket
+
+    def _receive(self):
+        import zmq
+
+        _logger.info("Receiving stream '%s' (%s).", self.stream_url, self.socket_type)
+
+        context = zmq.Context()
+        socket = self._create_socket(context)
+
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    frames = socket.recv_multipart(copy=False)
+                except zmq.Again:
+                    continue
+
+                try:
+                    self.process_message(frames)
+                except Exception as e:
+                    _logger.warning("Cannot process message from stream '%s': %s", self.stream_url, e)
+        finally:
+            socket.close()
+            context.term()
+
+        _logger.info("Stopped receiving stream '%s'.", self.stream_url)
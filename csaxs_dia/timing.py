@@ -0,0 +1,179 @@
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging import getLogger
+from math import ceil
+from threading import Lock
+from time import monotonic
+
+_logger = getLogger(__name__)
+
+# Number of latest durations kept for each step.
+DEFAULT_MAX_SAMPLES = 1000
+
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+def get_percentile(sorted_values, percentile):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+
+    rank = max(int(ceil(percentile / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def get_latency_statistics(durations):
+    """
+    Count, mean, max and the reported percentiles of the provided durations.
+    """
+    durations = sorted(durations)
+
+    if not durations:
+        return {"count": 0}
+
+    statistics = {"count": len(durations),
+                  "mean": sum(durations) / len(durations),
+                  "max": durations[-1]}
+
+    for percentile in REPORTED_PERCENTILES:
+        statistics["p%d" % percentile] = get_percentile(durations, percentile)
+
+    return statistics
+
+
+class LatencyRecorder(object):
+    """
+    Keep the latest durations of named steps and report their latency distribution.
+
+    Steps are recorded with the span context manager. While a trace is active, every recorded step is also added to
+    it, so the steps of a single acquisition can be dumped together.
+    """
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES, trace_folder=None):
+        self.max_samples = max_samples
+        self.trace_folder = trace_folder
+
+        self._samples = {}
+        self._lock = Lock()
+
+        self._trace = None
+        self._trace_start_time = None
+
+    def record(self, name, duration, start_time=None):
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.max_samples)
+            self._samples[name].append(duration)
+
+            if self._trace is not None:
+                offset = None if start_time is None else start_time - self._trace_start_time
+                self._trace.append({"name": name, "start": offset, "duration": duration})
+
+    @contextmanager
+    def span(self, name):
+        start_time = monotonic()
+
+        try:
+            yield
+        finally:
+            self.record(name, monotonic() - start_time, start_time)
+
+    def timed(self, name, func):
+        """
+        Wrap func so each call is recorded as the named step.
+        """
+        def wrapped(*args, **kwargs):
+            with self.span(name):
+                return func(*args, **kwargs)
+
+        return wrapped
+
+    def get_statistics(self):
+        with self._lock:
+            samples = {name: list(durations) for name, durations in self._samples.items()}
+
+        return {name: get_latency_statistics(durations) for name, durations in samples.items()}
+
+    def clear(self):
+        with self._lock:
+            self._samples = {}
+
+    def start_trace(self):
+        with self._lock:
+            self._trace = []
+            self._trace_start_time = monotonic()
+
+    def end_trace(self, label=None):
+        """
+        Stop the current trace and dump it to the trace folder, if one is set.
+        :return: List of the steps recorded during the trace.
+        """
+        with self._lock:
+            trace = self._trace
+            self._trace = None
+
+        if trace is None:
+            return None
+
+        if self.trace_folder:
+            filename = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            if label:
+                filename += "_" + os.path.basename(str(label))
+
+            try:
+                with open(os.path.join(self.trace_folder, filename + ".json"), "w") as output_file:
+                    json.dump({"label": label, "steps": trace}, output_file, indent=2)
+            except Exception as e:
+                _logger.warning("Cannot dump the acquisition timing trace: %s", e)
+
+        return trace
+
+
+class StartupTimer(object):
+    """
+    Record the duration of the server startup phases and when the startup milestones are reached.
+
+    All times are in seconds since the timer was created (or since start_time, a monotonic() time, if given).
+    """
+
+    def __init__(self, start_time=None):
+        self._start_time = start_time if start_time is not None else monotonic()
+        self._phases = []
+        self._milestones = {}
+        self._lock = Lock()
+
+    def elapsed(self):
+        return monotonic() - self._start_time
+
+    @contextmanager
+    def phase(self, name):
+        start_time = monotonic()
+
+        try:
+            yield
+        finally:
+            self.add_phase(name, start_time, monotonic())
+
+    def add_phase(self, name, start_time, end_time):
+        """
+        Record a phase timed outside of the timer (start_time and end_time are monotonic() times).
+        """
+        with self._lock:
+            self._phases.append({"name": name,
+                                 "start": start_time - self._start_time,
+                                 "duration": end_time - start_time})
+
+    def mark(self, name):
+        with self._lock:
+            self._milestones[name] = self.elapsed()
+
+    def get_report(self):
+        with self._lock:
+            return {"elapsed": self.elapsed(),
+                    "phases": [dict(phase) for phase in self._phases],
+                    "milestones": dict(self._milestones)}
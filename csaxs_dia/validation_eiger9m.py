@@ -7,7 +7,10 @@ _logger = getLogger(__name__)
 
 
 class IntegrationStatus(Enum):
+    STARTING = "starting",
     READY = "ready",
+    ARMING = "arming",
+    ARMED = "armed",
     RUNNING = "running",
     ERROR = "error",
     COMPONENT_NOT_RESPONDING = "component_not_responding"
@@ -21,106 +24,319 @@ MANDATORY_DETECTOR_CONFIG_PARAMETERS = ["period", "frames", "dr", "exptime", "ti
 
 CSAXS_FORMAT_INPUT_PARAMETERS = {}
 
-
-def validate_writer_config(configuration):
+# Eiger 9M geometry: 18 modules of 1024x512 pixels.
+DETECTOR_N_MODULES = 18
+DETECTOR_MODULE_PIXELS = 1024 * 512
+# Highest data rate (bytes/second) the backend and writer sustain without losing frames - 25 Hz at 32 bit.
+DEFAULT_MAX_DATA_RATE = DETECTOR_N_MODULES * DETECTOR_MODULE_PIXELS * 4 * 25
+# Fraction of the maximum data rate above which a warning is logged.
+DATA_RATE_WARNING_THRESHOLD = 0.9
+
+
+# Schema compiled once at import - the validators below only do lookups.
+_WRITER_PARAMETERS = tuple(MANDATORY_WRITER_CONFIG_PARAMETERS) + tuple(CSAXS_FORMAT_INPUT_PARAMETERS.keys())
+_WRITER_PARAMETERS_SET = frozenset(_WRITER_PARAMETERS)
+_WRITER_PARAMETERS_TYPES = tuple(CSAXS_FORMAT_INPUT_PARAMETERS.items())
+_BACKEND_PARAMETERS = tuple(MANDATORY_BACKEND_CONFIG_PARAMETERS)
+_DETECTOR_PARAMETERS = tuple(MANDATORY_DETECTOR_CONFIG_PARAMETERS)
+_USER_ID_MIN, _USER_ID_MAX = E_ACCOUNT_USER_ID_RANGE
+_TRIGGERED_TIMINGS = frozenset(("trigger", "gating"))
+
+
+def get_writer_config_errors(configuration):
+    """
+    Return the list of problems with the writer configuration. The configuration is not modified.
+    """
     if not configuration:
-        raise ValueError("Writer configuration cannot be empty.")
-
-    writer_cfg_params = MANDATORY_WRITER_CONFIG_PARAMETERS + list(CSAXS_FORMAT_INPUT_PARAMETERS.keys())
+        return ["Writer configuration cannot be empty."]
 
-    # Check if all mandatory parameters are present.
-    if not all(x in configuration for x in writer_cfg_params):
-        missing_parameters = [x for x in writer_cfg_params if x not in configuration]
-        raise ValueError("Writer configuration missing mandatory parameters: %s" % missing_parameters)
+    errors = []
 
-    unexpected_parameters = [x for x in configuration.keys() if x not in writer_cfg_params]
-    if unexpected_parameters:
-        _logger.warning("Received unexpected parameters for writer: %s" % unexpected_parameters)
+    missing_parameters = [x for x in _WRITER_PARAMETERS if x not in configuration]
+    if missing_parameters:
+        errors.append("Writer configuration missing mandatory parameters: %s" % missing_parameters)
 
-    # Check if all format parameters are of correct type.
+    # Check if all format parameters are of correct type. An int is accepted where a float is required.
     wrong_parameter_types = ""
-    for parameter_name, parameter_type in CSAXS_FORMAT_INPUT_PARAMETERS.items():
-        if not isinstance(configuration[parameter_name], parameter_type):
+    for parameter_name, parameter_type in _WRITER_PARAMETERS_TYPES:
+        if parameter_name not in configuration or isinstance(configuration[parameter_name], parameter_type):
+            continue
 
-            # If the input type is an int, but float is required, convert it.
-            if parameter_type == float and isinstance(configuration[parameter_name], int):
-                configuration[parameter_name] = float(configuration[parameter_name])
-                continue
+        if parameter_type == float and isinstance(configuration[parameter_name], int):
+            continue
 
-            wrong_parameter_types += "\tWriter parameter '%s' expected of type '%s', but received of type '%s'.\n" % \
-                                     (parameter_name, parameter_type, type(configuration[parameter_name]))
+        wrong_parameter_types += "\tWriter parameter '%s' expected of type '%s', but received of type '%s'.\n" % \
+                                 (parameter_name, parameter_type, type(configuration[parameter_name]))
 
     if wrong_parameter_types:
-        raise ValueError("Received parameters of invalid type:\n%s", wrong_parameter_types)
+        errors.append("Received parameters of invalid type:\n%s" % wrong_parameter_types)
 
-    user_id = configuration["user_id"]
-    if user_id < E_ACCOUNT_USER_ID_RANGE[0] or user_id > E_ACCOUNT_USER_ID_RANGE[1]:
-        raise ValueError("Provided user_id %d outside of specified range [%d-%d]." % (user_id,
-                                                                                      E_ACCOUNT_USER_ID_RANGE[0],
-                                                                                      E_ACCOUNT_USER_ID_RANGE[1]))
+    user_id = configuration.get("user_id")
+    if user_id is not None:
+        if not isinstance(user_id, int):
+            errors.append("Provided user_id '%s' is not an integer." % (user_id,))
+        elif user_id < _USER_ID_MIN or user_id > _USER_ID_MAX:
+            errors.append("Provided user_id %d outside of specified range [%d-%d]." % (user_id,
+                                                                                       _USER_ID_MIN,
+                                                                                       _USER_ID_MAX))
 
-    # Check if the filename ends with h5.
-    if configuration["output_file"][-3:] != ".h5":
-        configuration["output_file"] += ".h5"
+    return errors
 
 
-def validate_backend_config(configuration):
+def get_backend_config_errors(configuration):
+    """
+    Return the list of problems with the backend configuration. The configuration is not modified.
+    """
     if not configuration:
-        raise ValueError("Backend configuration cannot be empty.")
+        return ["Backend configuration cannot be empty."]
 
-    if not all(x in configuration for x in MANDATORY_BACKEND_CONFIG_PARAMETERS):
-        missing_parameters = [x for x in MANDATORY_BACKEND_CONFIG_PARAMETERS if x not in configuration]
-        raise ValueError("Backend configuration missing mandatory parameters: %s" % missing_parameters)
+    errors = []
+
+    missing_parameters = [x for x in _BACKEND_PARAMETERS if x not in configuration]
+    if missing_parameters:
+        errors.append("Backend configuration missing mandatory parameters: %s" % missing_parameters)
 
     if configuration.get("n_frames", 0) != 0:
-        raise ValueError("The only allowed values for backend config n_frames=0.")
+        errors.append("The only allowed values for backend config n_frames=0.")
 
+    return errors
 
-def validate_detector_config(configuration):
+
+def get_detector_config_errors(configuration):
+    """
+    Return the list of problems with the detector configuration. The configuration is not modified.
+    """
     if not configuration:
-        raise ValueError("Detector configuration cannot be empty.")
+        return ["Detector configuration cannot be empty."]
+
+    # n_frames is accepted as an alias for frames - see normalize_detector_config.
+    missing_parameters = [x for x in _DETECTOR_PARAMETERS if x not in configuration and
+                          not (x == "frames" and "n_frames" in configuration)]
+    if missing_parameters:
+        return ["Detector configuration missing mandatory parameters: %s" % missing_parameters]
+
+    return []
+
+
+def get_configs_dependencies_errors(writer_config, backend_config, detector_config):
+    """
+    Return the list of inconsistencies between the sections. Parameters missing in a section are not reported here.
+    """
+    errors = []
+
+    if "bit_depth" in backend_config and "dr" in detector_config and \
+            backend_config["bit_depth"] != detector_config["dr"]:
+        errors.append("Invalid config. Backend 'bit_depth' set to '%s', but detector 'dr' set to '%s'."
+                      " They must be equal."
+                      % (backend_config["bit_depth"], detector_config["dr"]))
+
+    timing = detector_config.get("timing")
+    detector_frames = detector_config.get("frames", detector_config.get("n_frames"))
+    writer_frames = writer_config.get("n_frames")
+
+    if timing is None:
+        return errors
+
+    if timing == "auto":
+        if detector_frames is not None and writer_frames is not None and detector_frames != writer_frames:
+            errors.append("Invalid config for timing auto. "
+                          "Detector 'frames' set to '%s', but writer 'n_frames' set to '%s'."
+                          " They must be equal."
+                          % (detector_frames, writer_frames))
+
+    elif timing in _TRIGGERED_TIMINGS:
+        if "cycles" in detector_config and writer_frames is not None and detector_config["cycles"] != writer_frames:
+            errors.append("Invalid config for timing trigger. "
+                          "Detector 'cycles' set to '%s', but writer 'n_frames' set to '%s'."
+                          " They must be equal."
+                          % (detector_config["cycles"], writer_frames))
+    else:
+        errors.append("Unexpected detector timing config '%s'. Use 'timing' or 'auto'." % timing)
+
+    return errors
+
+
+def get_frame_size(dynamic_range):
+    """
+    :return: Size (in bytes) of one full detector frame.
+    """
+    return DETECTOR_N_MODULES * DETECTOR_MODULE_PIXELS * dynamic_range // 8
+
+
+def get_data_rate(detector_config):
+    """
+    Data rate (bytes/second) while the detector is acquiring frames.
+    :return: None if the rate is set by the external trigger, or the config is incomplete.
+    """
+    dynamic_range = detector_config.get("dr")
+    period = detector_config.get("period")
+    timing = detector_config.get("timing")
+    frames = detector_config.get("frames", detector_config.get("n_frames"))
+
+    if not isinstance(dynamic_range, int) or not isinstance(period, (int, float)) or period <= 0:
+        return None
+
+    # With gating, or a single frame per trigger, the frame rate is given by the trigger.
+    if timing == "gating" or (timing == "trigger" and frames == 1):
+        return None
+
+    return get_frame_size(dynamic_range) / period
+
+
+def _get_data_rate_usage(detector_config, max_data_rate):
+    data_rate = get_data_rate(detector_config)
+
+    if data_rate is None or not max_data_rate:
+        return None, None
+
+    return data_rate, data_rate / max_data_rate
+
+
+def get_data_rate_errors(detector_config, max_data_rate=DEFAULT_MAX_DATA_RATE):
+    """
+    Return the problems with the data rate implied by the detector configuration.
+    """
+    data_rate, usage = _get_data_rate_usage(detector_config, max_data_rate)
+
+    if usage is None or usage <= 1:
+        return []
+
+    min_period = get_frame_size(detector_config["dr"]) / max_data_rate
+
+    return ["Invalid config. Detector 'dr' %s and 'period' %s give %.1f MB/s, %.1f MB/s (%.0f%%) above the "
+            "sustainable %.1f MB/s - frames would be lost. Use a 'period' of at least %.4f or a lower 'dr'."
+            % (detector_config["dr"], detector_config["period"], data_rate / 1e6, (data_rate - max_data_rate) / 1e6,
+               (usage - 1) * 100, max_data_rate / 1e6, min_period)]
+
+
+def get_data_rate_warnings(detector_config, max_data_rate=DEFAULT_MAX_DATA_RATE):
+    """
+    Return the warnings for data rates close to the sustainable one.
+    """
+    data_rate, usage = _get_data_rate_usage(detector_config, max_data_rate)
+
+    if usage is None or usage <= DATA_RATE_WARNING_THRESHOLD or usage > 1:
+        return []
+
+    return ["Detector 'dr' %s and 'period' %s give %.1f MB/s, %.0f%% of the sustainable %.1f MB/s "
+            "(margin %.1f MB/s)." % (detector_config["dr"], detector_config["period"], data_rate / 1e6,
+                                     usage * 100, max_data_rate / 1e6, (max_data_rate - data_rate) / 1e6)]
+
+
+def get_config_errors(configuration, validate_writer=True, validate_backend=True, validate_detector=True,
+                      max_data_rate=DEFAULT_MAX_DATA_RATE):
+    """
+    Return all the problems with a complete configuration ({"writer": ..., "backend": ..., "detector": ...}).
+    The configuration is not modified.
+    """
+    if not isinstance(configuration, dict):
+        return ["Configuration must be a dictionary with writer, backend and detector sections."]
+
+    writer_config = configuration.get("writer") or {}
+    backend_config = configuration.get("backend") or {}
+    detector_config = configuration.get("detector") or {}
+
+    errors = []
+
+    if validate_writer:
+        errors.extend(get_writer_config_errors(writer_config))
 
+    if validate_backend:
+        errors.extend(get_backend_config_errors(backend_config))
+
+    if validate_detector:
+        errors.extend(get_detector_config_errors(detector_config))
+
+    errors.extend(get_configs_dependencies_errors(writer_config, backend_config, detector_config))
+    errors.extend(get_data_rate_errors(detector_config, max_data_rate))
+
+    return errors
+
+
+def validate_configurations(configurations, **kwargs):
+    """
+    Validate a list of configurations (a scan plan) at once.
+    :return: List of {"index", "valid", "errors", "warnings"}, one for each configuration.
+    """
+    results = []
+
+    for index, configuration in enumerate(configurations):
+        errors = get_config_errors(configuration, **kwargs)
+
+        warnings = []
+        if isinstance(configuration, dict):
+            warnings = get_data_rate_warnings(configuration.get("detector") or {},
+                                              kwargs.get("max_data_rate", DEFAULT_MAX_DATA_RATE))
+
+        results.append({"index": index,
+                        "valid": not errors,
+                        "errors": errors,
+                        "warnings": warnings})
+
+    return results
+
+
+def normalize_writer_config(configuration):
+    for parameter_name, parameter_type in _WRITER_PARAMETERS_TYPES:
+        if parameter_type == float and isinstance(configuration.get(parameter_name), int):
+            configuration[parameter_name] = float(configuration[parameter_name])
+
+    # Check if the filename ends with h5.
+    if "output_file" in configuration and configuration["output_file"][-3:] != ".h5":
+        configuration["output_file"] += ".h5"
+
+
+def normalize_detector_config(configuration):
     # TODO: Move to n_frames with new detector client.
     if "n_frames" in configuration:
         configuration['frames'] = configuration["n_frames"]
         del configuration["n_frames"]
 
-
-    if not all(x in configuration for x in MANDATORY_DETECTOR_CONFIG_PARAMETERS):
-        missing_parameters = [x for x in MANDATORY_DETECTOR_CONFIG_PARAMETERS if x not in configuration]
-        raise ValueError("Detector configuration missing mandatory parameters: %s" % missing_parameters)
-
-    if configuration["timing"] == "gating":
+    if configuration.get("timing") == "gating":
         configuration["exptime"] = -1
         configuration["period"] = -1
 
 
-def validate_configs_dependencies(writer_config, backend_config, detector_config):
-    if backend_config["bit_depth"] != detector_config["dr"]:
-        raise ValueError("Invalid config. Backend 'bit_depth' set to '%s', but detector 'dr' set to '%s'."
-                         " They must be equal."
-                         % (backend_config["bit_depth"], detector_config["dr"]))
+def _raise_first_error(errors):
+    if errors:
+        raise ValueError(errors[0])
 
-    # TODO: Move to n_frames with new detector client.
-    if detector_config["timing"] == "auto":
-        if detector_config["frames"] != writer_config["n_frames"]:
-            raise ValueError("Invalid config for timing auto. "
-                             "Detector 'n_frames' set to '%s', but writer 'n_frames' set to '%s'."
-                             " They must be equal."
-                             % (detector_config["n_frames"], writer_config["n_frames"]))
-
-    elif detector_config["timing"] == "trigger" or detector_config["timing"] == "gating":
-        if detector_config["cycles"] != writer_config["n_frames"]:
-            raise ValueError("Invalid config for timing trigger. "
-                             "Detector 'cycles' set to '%s', but writer 'n_frames' set to '%s'."
-                             " They must be equal."
-                             % (detector_config["cycles"], writer_config["n_frames"]))
-    else:
-        raise ValueError("Unexpected detector timing config '%s'. Use 'timing' or 'auto'." % detector_config["timing"])
+
+def validate_writer_config(configuration):
+    _raise_first_error(get_writer_config_errors(configuration))
+
+    unexpected_parameters = [x for x in configuration if x not in _WRITER_PARAMETERS_SET]
+    if unexpected_parameters:
+        _logger.warning("Received unexpected parameters for writer: %s" % unexpected_parameters)
+
+    normalize_writer_config(configuration)
 
 
-def interpret_status(statuses):
-    _logger.debug("Interpreting statuses: %s", statuses)
+def validate_backend_config(configuration):
+    _raise_first_error(get_backend_config_errors(configuration))
+
+
+def validate_detector_config(configuration):
+    _raise_first_error(get_detector_config_errors(configuration))
+
+    normalize_detector_config(configuration)
+
+
+def validate_configs_dependencies(writer_config, backend_config, detector_config,
+                                  max_data_rate=DEFAULT_MAX_DATA_RATE):
+    _raise_first_error(get_configs_dependencies_errors(writer_config, backend_config, detector_config))
+    _raise_first_error(get_data_rate_errors(detector_config, max_data_rate))
+
+    for warning in get_data_rate_warnings(detector_config, max_data_rate):
+        _logger.warning(warning)
+
+
+def interpret_status(statuses, armed=False, arming=False):
+    """
+    :param armed: The writer was started for an armed acquisition, the detector not yet.
+    :param arming: The writer was started by arm, but it is not known to be receiving yet.
+    """
+    _logger.debug("Interpreting statuses: %s (armed=%s, arming=%s)", statuses, armed, arming)
 
     writer = statuses["writer"]
 
@@ -139,7 +355,16 @@ def interpret_status(statuses):
     # If no other conditions match.
     interpreted_status = IntegrationStatus.ERROR
 
-    if cmp(writer, "stopped"):
+    # When armed, the writer is already running and waiting for the detector to start.
+    if armed:
+        if cmp(writer, ("receiving", "writing")):
+            interpreted_status = IntegrationStatus.ARMED
+
+        # The writer process is still starting.
+        elif arming and cmp(writer, "stopped"):
+            interpreted_status = IntegrationStatus.ARMING
+
+    elif cmp(writer, "stopped"):
         interpreted_status = IntegrationStatus.READY
 
     elif cmp(writer, ("receiving", "writing")):
@@ -0,0 +1,116 @@
+from logging import getLogger
+from threading import Event
+from time import monotonic
+
+_logger = getLogger(__name__)
+
+# Shortest and longest interval (in seconds) between two status checks.
+DEFAULT_MIN_CHECK_INTERVAL = 0.005
+DEFAULT_MAX_CHECK_INTERVAL = 0.5
+# The interval is this fraction of the time to the closest expected transition.
+CHECK_INTERVAL_FRACTION = 0.25
+# Time (in seconds) to wait for a status after it is expected.
+DEFAULT_STATUS_TIMEOUT = 10.0
+
+
+def get_expected_duration(detector_config):
+    """
+    Expected acquisition duration (in seconds) from the detector config.
+    :return: None if the duration is given by an external trigger or the config is incomplete.
+    """
+    if not detector_config or detector_config.get("timing") != "auto":
+        return None
+
+    frames = detector_config.get("frames", detector_config.get("n_frames"))
+    period = detector_config.get("period")
+    cycles = detector_config.get("cycles") or 1
+
+    if not isinstance(frames, int) or not isinstance(period, (int, float)) or period <= 0:
+        return None
+
+    return frames * cycles * period
+
+
+def get_check_interval(elapsed, expected_transitions, min_interval=DEFAULT_MIN_CHECK_INTERVAL,
+                       max_interval=DEFAULT_MAX_CHECK_INTERVAL):
+    """
+    Interval until the next status check: short close to an expected transition, growing away from it.
+    :param elapsed: Time since the wait started.
+    :param expected_transitions: Times (since the wait started) at which the status is expected to change.
+    """
+    distance = min(abs(elapsed - transition) for transition in expected_transitions)
+
+    return min(max(distance * CHECK_INTERVAL_FRACTION, min_interval), max_interval)
+
+
+def as_tuple(statuses):
+    return tuple(statuses) if isinstance(statuses, (tuple, list)) else (statuses,)
+
+
+class StatusWaiter(object):
+    """
+    Wait for the integration to reach a status.
+
+    The status is checked often around the expected transitions (right after the call and at the expected end of the
+    acquisition) and less and less often in between. Status changes reported by the status provider wake the waiter up
+    right away.
+    """
+
+    def __init__(self, status_provider=None, min_interval=DEFAULT_MIN_CHECK_INTERVAL,
+                 max_interval=DEFAULT_MAX_CHECK_INTERVAL, timeout=DEFAULT_STATUS_TIMEOUT):
+        self.status_provider = status_provider
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+
+    def wait_for_status(self, get_status, target_status, expected_duration=0, allowed_status=None, timeout=None):
+        """
+        :param get_status: Function returning the current status.
+        :param target_status: Status (or tuple of statuses) to wait for.
+        :param expected_duration: Time (in seconds) after which the target status is expected, None if not known.
+        :param allowed_status: If set, fail as soon as the status is neither target nor one of these.
+        :param timeout: Time to wait after the expected duration. Defaults to the waiter timeout.
+        :return: The reached status.
+        """
+        target_status = as_tuple(target_status)
+        allowed_status = as_tuple(allowed_status) if allowed_status is not None else None
+        timeout = self.timeout if timeout is None else timeout
+
+        expected_transitions = [0] if not expected_duration else [0, expected_duration]
+        deadline = (expected_duration or 0) + timeout
+
+        status_changed = Event()
+
+        def on_status_change(status_details=None):
+            status_changed.set()
+
+        if self.status_provider is not None:
+            self.status_provider.add_status_listener(on_status_change)
+
+        start_time = monotonic()
+        n_checks = 0
+
+        try:
+            while True:
+                status_changed.clear()
+                status = get_status()
+                n_checks += 1
+
+                if status in target_status:
+                    _logger.debug("Status %s reached after %.3f seconds and %d checks.",
+                                  status, monotonic() - start_time, n_checks)
+                    return status
+
+                if allowed_status is not None and status not in allowed_status:
+                    raise ValueError("Expecting status %s, but got %s." % (target_status, status))
+
+                elapsed = monotonic() - start_time
+                if elapsed >= deadline:
+                    raise ValueError("Timeout while waiting for status %s. Last status %s after %.1f seconds." %
+                                     (target_status, status, elapsed))
+
+                interval = get_check_interval(elapsed, expected_transitions, self.min_interval, self.max_interval)
+                status_changed.wait(min(interval, deadline - elapsed))
+        finally:
+            if self.status_provider is not None:
+                self.status_provider.remove_status_listener(on_status_change)
@@ -0,0 +1,501 @@
+"""
+Writer client spreading the frames of an acquisition over several writer processes (shards).
+
+The backend sends frame i to the output stream i % N, where N is the number of shards. Each shard writes the frames
+of its stream to its own part file:
+
+    OUTPUT_FILE_part000.h5, OUTPUT_FILE_part001.h5, ...
+
+Once all the shards stopped, a master file is written at the requested output file, in the background (the group
+reports "writing" until it is done). Each per frame dataset of the part files is a virtual dataset in the master file,
+with the frames interleaved back in acquisition order (master[i::N] = part_i). The other datasets are linked from the
+first part file. The interleaving only holds if the shards got consecutive frames: a stopped acquisition (shard i has
+frames i, i + N, ... up to the last frame sent) gets a master file with the written frames only, but the master file is
+not written (error status) if frames are missing in between.
+
+A shard is either a writer started by the DIA on this host (any writer client, CppWriterClient or WriterPool) or a
+standby writer running on another node (RemoteWriterClient).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from logging import getLogger
+from threading import Lock
+
+import requests
+
+from csaxs_dia.writer_pool import WRITER_REQUEST_TIMEOUT
+
+_logger = getLogger(__name__)
+
+PART_FILE_SUFFIX = "_part%03d.h5"
+
+# Writer statuses, the ones a shard is still busy with first.
+WRITER_STATUS_PRIORITY = ("writing", "receiving", "stopped")
+
+# Statistics of the shards that are summed up in the group statistics.
+SUMMED_STATISTICS = ("n_written_frames", "n_received_frames")
+
+# Status reported by a shard that cannot be reached.
+WRITER_STATUS_ERROR = "error"
+
+# Master file states, in the group statistics.
+MASTER_FILE_PENDING = "pending"
+MASTER_FILE_WRITING = "writing"
+MASTER_FILE_WRITTEN = "written"
+MASTER_FILE_ERROR = "error"
+
+
+def get_part_filename(output_file, shard_index):
+    base_name = output_file[:-3] if output_file.endswith(".h5") else output_file
+    return base_name + PART_FILE_SUFFIX % shard_index
+
+
+def get_shard_n_frames(n_frames, n_shards, shard_index):
+    """
+    Number of frames the shard receives when the frames are distributed modulo n_shards.
+    """
+    return len(range(shard_index, n_frames, n_shards))
+
+
+def is_remote_shard(shard):
+    return shard.startswith("http://") or shard.startswith("https://")
+
+
+def get_writer_shards_errors(writer_shards):
+    """
+    Return the list of problems with the shards of a writer group (stream addresses or standby writer urls). The
+    backend fan-out is not configured by the DIA: each shard has to receive a distinct backend output stream.
+    """
+    errors = []
+
+    if len(writer_shards) < 2:
+        errors.append("A writer group needs at least 2 shards, %d provided." % len(writer_shards))
+
+    duplicated_shards = sorted(set(shard for shard in writer_shards if writer_shards.count(shard) > 1))
+    if duplicated_shards:
+        errors.append("Writer shards provided more than once: %s. Each shard receives its own backend output stream."
+                      % duplicated_shards)
+
+    invalid_shards = [shard for shard in writer_shards if not is_remote_shard(shard) and "://" not in shard]
+    if invalid_shards:
+        errors.append("Writer shards must be stream addresses (tcp://...) or standby writer urls (http://...): %s."
+                      % invalid_shards)
+
+    return errors
+
+
+def get_group_status(statuses):
+    """
+    Single writer status of the group: the first status that is not a known writer status (an error), otherwise the
+    status of the busiest shard - the group is stopped only when all the shards are.
+    """
+    for status in statuses:
+        if status not in WRITER_STATUS_PRIORITY:
+            return status
+
+    for status in WRITER_STATUS_PRIORITY:
+        if status in statuses:
+            return status
+
+    return "stopped"
+
+
+def get_group_statistics(shard_statistics):
+    """
+    Sum up the frame counters of the shards. The statistics of each shard are kept under "shards".
+    """
+    statistics = {}
+
+    for shard in shard_statistics:
+        for key in SUMMED_STATISTICS:
+            value = shard.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                statistics[key] = statistics.get(key, 0) + value
+
+    statistics["n_shards"] = len(shard_statistics)
+    statistics["shards"] = shard_statistics
+
+    return statistics
+
+
+def get_interleaved_n_frames(parts_n_frames):
+    """
+    Number of frames in acquisition order that the part files hold, if they have consecutive frames distributed
+    modulo the number of shards (shard i has frames i, i + N, ...). None if frames are missing in between.
+    :param parts_n_frames: Number of frames of each part file, indexed by shard index.
+    """
+    n_frames = sum(parts_n_frames)
+    n_shards = len(parts_n_frames)
+
+    for index, part_n_frames in enumerate(parts_n_frames):
+        if part_n_frames != get_shard_n_frames(n_frames, n_shards, index):
+            return None
+
+    return n_frames
+
+
+def write_master_file(output_file, part_files, n_frames):
+    """
+    Write the master file with the frames of the part files interleaved: frame i is frame i // n_shards of part file
+    i % n_shards. Datasets without a frame dimension are linked from the first part file.
+    :param part_files: Part file names, indexed by shard index. Missing shards (no frames) are None.
+    :param n_frames: Number of frames of the acquisition. A stopped acquisition has less - the master file then has
+    the written frames only.
+    :return: Number of frames in the master file.
+    """
+    # Imported only when needed - h5py is not required to drive a single writer.
+    import h5py
+
+    n_shards = len(part_files)
+
+    master_folder = os.path.dirname(os.path.abspath(output_file))
+    # Relative source paths - the VDS library resolves them relative to the master file.
+    source_files = {index: os.path.relpath(os.path.abspath(part_file), master_folder)
+                    for index, part_file in enumerate(part_files) if part_file is not None}
+
+    if not source_files:
+        raise ValueError("No part file to write the master file from.")
+
+    first_index = min(source_files)
+
+    # Datasets of each part file: {shard index: [(path, shape, dtype)]}.
+    part_datasets = {}
+
+    for part_index, part_file in source_files.items():
+        datasets = []
+
+        def visit(name, item):
+            if isinstance(item, h5py.Dataset):
+                datasets.append((name, item.shape, item.dtype))
+
+        with h5py.File(part_files[part_index], "r") as file:
+            file.visititems(visit)
+
+        part_datasets[part_index] = datasets
+
+    # The frame dimension is the longest first dimension in the file.
+    parts_n_frames = [max((shape[0] for _, shape, _ in part_datasets[index] if shape), default=0)
+                      if index in part_datasets else 0 for index in range(n_shards)]
+
+    # With lost frames (or a backend not distributing the frames modulo n_shards), the frames cannot be put back
+    # in acquisition order.
+    written_n_frames = get_interleaved_n_frames(parts_n_frames)
+    if written_n_frames is None or written_n_frames > n_frames:
+        raise ValueError("Part files have %s frames, for %d expected frames. Cannot interleave the frames." %
+                         (parts_n_frames, n_frames))
+
+    if written_n_frames == 0:
+        raise ValueError("No frames written in the part files.")
+
+    if written_n_frames < n_frames:
+        _logger.warning("Only %d of %d frames were written (stopped acquisition). The master file '%s' has the "
+                        "written frames only.", written_n_frames, n_frames, output_file)
+
+    # Frame datasets: {path: {shard index: (shape, dtype)}}, from the parts with frames.
+    frame_datasets = {}
+    linked_datasets = []
+
+    for part_index, datasets in part_datasets.items():
+        part_n_frames = parts_n_frames[part_index]
+
+        for name, shape, dtype in datasets:
+            if part_n_frames > 0 and shape and shape[0] == part_n_frames:
+                frame_datasets.setdefault(name, {})[part_index] = (shape, dtype)
+            elif part_index == first_index:
+                linked_datasets.append(name)
+
+    parts_with_frames = set(index for index in part_datasets if parts_n_frames[index] > 0)
+
+    for name, parts in frame_datasets.items():
+        if set(parts) != parts_with_frames:
+            raise ValueError("Frame dataset '%s' is missing in some part files." % name)
+
+    with h5py.File(output_file, "w") as master:
+        for name, parts in frame_datasets.items():
+            shape, dtype = parts[min(parts)]
+
+            layout = h5py.VirtualLayout(shape=(written_n_frames,) + shape[1:], dtype=dtype)
+            for index, (part_shape, _) in parts.items():
+                source = h5py.VirtualSource(source_files[index], name, shape=part_shape)
+                layout[index::n_shards] = source
+
+            master.create_virtual_dataset(name, layout, fillvalue=0)
+
+        for name in linked_datasets:
+            master[name] = h5py.ExternalLink(source_files[first_index], name)
+
+    _logger.info("Master file '%s' written with %d frames in %d frame datasets from %d part files.",
+                 output_file, written_n_frames, len(frame_datasets), len(source_files))
+
+    return written_n_frames
+
+
+class RemoteWriterClient(object):
+    """
+    Writer client for a standby writer (see writer_pool) running on another node. The writer process is not managed
+    by the DIA: it has to be running in standby mode when the acquisition starts, and report "stopped" (ready for the
+    next POST /parameters and POST /start) once the acquisition is written. A writer that cannot be reached is in
+    error.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self._parameters = None
+        self._started = False
+
+    def set_parameters(self, parameters):
+        self._parameters = parameters
+
+    def start(self):
+        if self._parameters is None:
+            raise ValueError("Writer parameters not set.")
+
+        requests.post(self.url + "/parameters", json=self._parameters,
+                      timeout=WRITER_REQUEST_TIMEOUT).raise_for_status()
+        requests.post(self.url + "/start", timeout=WRITER_REQUEST_TIMEOUT).raise_for_status()
+
+        self._started = True
+
+    def get_status(self):
+        # Queried even when idle - a writer that is not running shows up at startup, not with the next acquisition.
+        try:
+            return requests.get(self.url + "/status", timeout=WRITER_REQUEST_TIMEOUT).json()["status"]
+        except requests.exceptions.ConnectionError as e:
+            # The writer crashed or its node is down - the acquisition is lost.
+            _logger.error("Cannot reach the writer %s: %s", self.url, e)
+            return WRITER_STATUS_ERROR
+
+    def get_statistics(self):
+        if not self._started:
+            return {}
+
+        return requests.get(self.url + "/statistics", timeout=WRITER_REQUEST_TIMEOUT).json()
+
+    def stop(self):
+        if self._started:
+            requests.get(self.url + "/stop", timeout=WRITER_REQUEST_TIMEOUT)
+
+    def kill(self):
+        # The process runs on another node - stopping it is all that can be done from here.
+        try:
+            self.stop()
+        finally:
+            self._started = False
+
+    def reset(self):
+        self._parameters = None
+        self.kill()
+
+
+class WriterGroup(object):
+    """
+    Writer client driving a group of writers, one for each backend output stream.
+    """
+
+    def __init__(self, writer_clients, write_master_file=True):
+        if not writer_clients:
+            raise ValueError("A writer group needs at least one writer.")
+
+        self.writer_clients = list(writer_clients)
+        self.write_master_file = write_master_file
+
+        self._parameters = None
+        # Shards with frames in the current acquisition.
+        self._active_indexes = []
+        # One of the MASTER_FILE_ states, None if there is no master file to write.
+        self.master_file_status = None
+        self.master_file_error = None
+        # Number of frames in the written master file - less than requested for a stopped acquisition.
+        self.master_file_n_frames = None
+        # Incremented with every acquisition - results of the master file writes of previous ones are discarded.
+        self._acquisition_id = 0
+
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.writer_clients),
+                                            thread_name_prefix="writer_group")
+        # The master file is written in the background, not in the status request that noticed the shards stopped.
+        self._master_file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer_group_master_file")
+
+    @property
+    def url(self):
+        return ",".join(str(client.url) for client in self.writer_clients)
+
+    @property
+    def n_shards(self):
+        return len(self.writer_clients)
+
+    def _run_on_shards(self, method_name, indexes=None):
+        """
+        Call the method on the shards concurrently.
+        :return: List of results, in shard order. Raises the first error once all calls completed.
+        """
+        indexes = range(self.n_shards) if indexes is None else indexes
+
+        futures = [(index, self._executor.submit(getattr(self.writer_clients[index], method_name)))
+                   for index in indexes]
+
+        results = []
+        errors = []
+
+        for index, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                _logger.error("Writer shard %d %s() failed: %s", index, method_name, e)
+                errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def get_part_files(self):
+        """
+        Part file names of the current acquisition, indexed by shard. Shards without frames are None.
+        """
+        if self._parameters is None:
+            return []
+
+        return [get_part_filename(self._parameters["output_file"], index) if index in self._active_indexes else None
+                for index in range(self.n_shards)]
+
+    def set_parameters(self, parameters):
+        n_frames = parameters["n_frames"]
+
+        active_indexes = [index for index in range(self.n_shards)
+                          if get_shard_n_frames(n_frames, self.n_shards, index) > 0]
+
+        for index in active_indexes:
+            shard_parameters = deepcopy(parameters)
+            shard_parameters["output_file"] = get_part_filename(parameters["output_file"], index)
+            shard_parameters["n_frames"] = get_shard_n_frames(n_frames, self.n_shards, index)
+
+            self.writer_clients[index].set_parameters(shard_parameters)
+
+        with self._lock:
+            self._parameters = parameters
+            self._active_indexes = active_indexes
+            self._clear_master_file()
+
+    def start(self):
+        if self._parameters is None:
+            raise ValueError("Writer parameters not set.")
+
+        try:
+            self._run_on_shards("start", self._active_indexes)
+        except:
+            # Do not leave part of the group running.
+            try:
+                self._kill_shards()
+            except Exception as e:
+                _logger.error("Could not kill the writer group after a failed start: %s", e)
+            raise
+
+        with self._lock:
+            self._clear_master_file()
+            self.master_file_status = MASTER_FILE_PENDING if self.write_master_file else None
+
+    def _clear_master_file(self):
+        # Called under the lock.
+        self._acquisition_id += 1
+        self.master_file_status = None
+        self.master_file_error = None
+        self.master_file_n_frames = None
+
+    def _submit_master_file(self, output_file, part_files, n_frames):
+        # Called under the lock.
+        self.master_file_status = MASTER_FILE_WRITING
+        self._master_file_executor.submit(self._write_master_file, self._acquisition_id,
+                                          output_file, part_files, n_frames)
+
+    def _write_master_file(self, acquisition_id, output_file, part_files, n_frames):
+        written_n_frames = None
+
+        try:
+            written_n_frames = write_master_file(output_file, part_files, n_frames)
+            status, error = MASTER_FILE_WRITTEN, None
+        except Exception as e:
+            _logger.error("Could not write the master file '%s': %s", output_file, e)
+            status, error = MASTER_FILE_ERROR, str(e)
+
+        with self._lock:
+            if acquisition_id == self._acquisition_id:
+                self.master_file_status = status
+                self.master_file_error = error
+                self.master_file_n_frames = written_n_frames
+
+    def get_status(self):
+        status = get_group_status(self._run_on_shards("get_status"))
+
+        if status != "stopped":
+            return status
+
+        with self._lock:
+            # All the shards stopped - start writing the master file (after a reset, reset submits it).
+            if self.master_file_status == MASTER_FILE_PENDING and self._parameters is not None:
+                self._submit_master_file(self._parameters["output_file"], self.get_part_files(),
+                                         self._parameters["n_frames"])
+
+            # The acquisition is complete only once the master file is written.
+            if self.master_file_status == MASTER_FILE_WRITING:
+                return "writing"
+
+        return status
+
+    def get_statistics(self):
+        statistics = get_group_statistics(self._run_on_shards("get_statistics"))
+
+        with self._lock:
+            if self.master_file_status is not None:
+                statistics["master_file_status"] = self.master_file_status
+
+            if self.master_file_error is not None:
+                statistics["master_file_error"] = self.master_file_error
+
+            if self.master_file_n_frames is not None:
+                statistics["master_file_n_frames"] = self.master_file_n_frames
+
+        return statistics
+
+    def stop(self):
+        self._run_on_shards("stop", self._active_indexes)
+
+    def _kill_shards(self):
+        with self._lock:
+            self._clear_master_file()
+
+        self._run_on_shards("kill")
+
+    def kill(self):
+        self._kill_shards()
+
+    def reset(self):
+        with self._lock:
+            # The master file of an acquisition reset right after its stop is still written, once the shards exited.
+            pending_master_file = None
+            if self.master_file_status == MASTER_FILE_PENDING:
+                pending_master_file = (self._parameters["output_file"], self.get_part_files(),
+                                       self._parameters["n_frames"])
+            # One being written is completed - reported as writing until it is done.
+            elif self.master_file_status != MASTER_FILE_WRITING:
+                self._clear_master_file()
+
+            self._parameters = None
+            self._active_indexes = []
+
+        try:
+            self._run_on_shards("reset")
+        finally:
+            with self._lock:
+                if pending_master_file is not None and self.master_file_status == MASTER_FILE_PENDING:
+                    self._submit_master_file(*pending_master_file)
+
+    def close(self):
+        for client in self.writer_clients:
+            if hasattr(client, "close"):
+                client.close()
+
+        self._executor.shutdown(wait=False)
+        # A master file being written is completed.
+        self._master_file_executor.shutdown(wait=True)
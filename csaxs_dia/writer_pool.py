@@ -0,0 +1,338 @@
+"""
+Writer client that keeps writer processes started and idle, so an acquisition does not wait for the writer to start.
+
+The pool needs a writer with a standby mode, which the current writer does not have - it takes the output file and
+the number of frames on its command line. The writer side change is described in the README ("Standby writers") and
+the pool is only used when enabled (--writer_pool_size). The standby protocol:
+
+    writer_executable --standby STREAM_URL REST_PORT USER_ID
+
+A standby writer initializes itself, connects to the backend stream and waits on its REST interface, reporting the
+status "stopped". The acquisition parameters (output_file, n_frames...) are handed over with POST /parameters (as for
+a running writer) followed by POST /start (new). Status, statistics and stop are the ones of the current writer REST
+interface (GET /status, GET /statistics, GET /stop). Once the acquisition is written the writer reports "stopped"
+again. Writers of the pool are used for one acquisition only and terminated afterwards.
+"""
+import os
+import subprocess
+from datetime import datetime
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+
+import requests
+
+_logger = getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 0
+DEFAULT_IDLE_TIMEOUT = 600
+DEFAULT_PORT_COUNT = 16
+
+WRITER_STARTUP_TIMEOUT = 10
+WRITER_REQUEST_TIMEOUT = 2
+# Time (in seconds) a terminated writer has to exit before it is killed.
+WRITER_EXIT_TIMEOUT = 5
+# Interval (in seconds) of the idle writers expiration check.
+REAP_INTERVAL = 1
+
+
+class StandbyWriter(object):
+    def __init__(self, process, port, user_id):
+        self.process = process
+        self.port = port
+        self.user_id = user_id
+        self.url = "http://127.0.0.1:%d" % port
+        self.idle_since = monotonic()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def wait_until_ready(self, timeout=WRITER_STARTUP_TIMEOUT):
+        start_time = monotonic()
+
+        while monotonic() - start_time < timeout:
+            if not self.is_alive():
+                raise RuntimeError("Writer on port %d exited with code %s during startup." %
+                                   (self.port, self.process.returncode))
+            try:
+                requests.get(self.url + "/status", timeout=WRITER_REQUEST_TIMEOUT)
+                return
+            except requests.exceptions.ConnectionError:
+                sleep(0.05)
+
+        raise RuntimeError("Writer on port %d did not start in %s seconds." % (self.port, timeout))
+
+    def terminate(self, timeout=WRITER_EXIT_TIMEOUT):
+        """
+        Terminate the process and wait for it to exit (so it does not stay a zombie). Kill it if it does not exit in
+        time.
+        """
+        if self.is_alive():
+            self.process.terminate()
+
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            _logger.warning("Writer on port %d did not exit in %s seconds. Killing it.", self.port, timeout)
+            self.kill()
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+
+        self.process.wait()
+
+
+class WriterPool(object):
+    def __init__(self, stream_url, writer_executable, writer_port, log_folder=None,
+                 pool_size=1, idle_timeout=DEFAULT_IDLE_TIMEOUT, port_count=DEFAULT_PORT_COUNT):
+        self.stream_url = stream_url
+        self.writer_executable = writer_executable
+        self.writer_port = writer_port
+        self.log_folder = log_folder
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+
+        self.url = "http://127.0.0.1:%d" % writer_port
+
+        # Ports, idle writers, writers being started and the active writer are only accessed under the lock.
+        self._free_ports = list(range(writer_port, writer_port + port_count))
+        # Idle writers, indexed by user id.
+        self._idle_writers = {}
+        # Number of writers being started, indexed by user id - they count as idle when replenishing.
+        self._n_starting_writers = {}
+        self._active_writer = None
+        self._parameters = None
+
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._reaper_thread = Thread(target=self._reap_idle_writers, name="writer_pool_reaper", daemon=True)
+        self._reaper_thread.start()
+
+    def _spawn_writer(self, user_id):
+        with self._lock:
+            if not self._free_ports:
+                raise RuntimeError("No free port left for a new writer process.")
+            port = self._free_ports.pop(0)
+
+        command = [self.writer_executable, "--standby", self.stream_url, str(port), str(user_id)]
+        _logger.info("Starting standby writer: %s", command)
+
+        log_file = subprocess.DEVNULL
+        if self.log_folder:
+            log_filename = "%s_%d.log" % (datetime.now().strftime("%Y%m%d-%H%M%S"), port)
+            log_file = open(os.path.join(self.log_folder, log_filename), "w")
+
+        try:
+            process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
+        except:
+            self._release_port(port)
+            raise
+        finally:
+            if log_file is not subprocess.DEVNULL:
+                log_file.close()
+
+        writer = StandbyWriter(process, port, user_id)
+
+        try:
+            writer.wait_until_ready()
+        except:
+            self._retire_writer(writer)
+            raise
+
+        return writer
+
+    def _release_port(self, port):
+        with self._lock:
+            self._free_ports.append(port)
+
+    def _retire_writer(self, writer):
+        # The port is free only once the process exited.
+        writer.terminate()
+        self._release_port(writer.port)
+
+    def _replenish(self, user_id):
+        # Reserve the missing writers under the lock, so concurrent replenishes do not start too many.
+        with self._lock:
+            n_idle = len(self._idle_writers.get(user_id, [])) + self._n_starting_writers.get(user_id, 0)
+            n_missing = self.pool_size - n_idle
+
+            if n_missing <= 0:
+                return
+
+            self._n_starting_writers[user_id] = self._n_starting_writers.get(user_id, 0) + n_missing
+
+        for index in range(n_missing):
+            try:
+                writer = self._spawn_writer(user_id)
+            except Exception as e:
+                _logger.warning("Could not start standby writer for user %s: %s", user_id, e)
+
+                with self._lock:
+                    self._n_starting_writers[user_id] -= n_missing - index
+                return
+
+            with self._lock:
+                self._n_starting_writers[user_id] -= 1
+
+                closed = self._stop_event.is_set()
+                if not closed:
+                    self._idle_writers.setdefault(user_id, []).append(writer)
+
+            if closed:
+                self._retire_writer(writer)
+
+    def replenish_in_background(self, user_id):
+        Thread(target=self._replenish, args=(user_id,), name="writer_pool_replenish", daemon=True).start()
+
+    def _take_idle_writer(self, user_id):
+        dead_writers = []
+        idle_writer = None
+
+        with self._lock:
+            idle_writers = self._idle_writers.get(user_id, [])
+
+            while idle_writers:
+                writer = idle_writers.pop(0)
+                if writer.is_alive():
+                    idle_writer = writer
+                    break
+
+                dead_writers.append(writer)
+
+        for writer in dead_writers:
+            _logger.warning("Standby writer on port %d died. Discarding it.", writer.port)
+            self._retire_writer(writer)
+
+        return idle_writer
+
+    def _reap_idle_writers(self):
+        while not self._stop_event.wait(REAP_INTERVAL):
+            expired_writers = []
+
+            with self._lock:
+                for user_id, idle_writers in self._idle_writers.items():
+                    for writer in list(idle_writers):
+                        if not writer.is_alive() or monotonic() - writer.idle_since > self.idle_timeout:
+                            idle_writers.remove(writer)
+                            expired_writers.append(writer)
+
+            for writer in expired_writers:
+                _logger.info("Stopping idle writer on port %d for user %s.", writer.port, writer.user_id)
+                self._retire_writer(writer)
+
+    def prestart(self, user_id):
+        """
+        Make sure idle writers are available for the provided user id.
+        """
+        self.replenish_in_background(user_id)
+
+    def set_parameters(self, parameters):
+        self._parameters = parameters
+
+        # Warm up writers for this user before the acquisition is started.
+        with self._lock:
+            n_idle = len(self._idle_writers.get(parameters["user_id"], []))
+
+        if n_idle < self.pool_size:
+            self.prestart(parameters["user_id"])
+
+    def start(self):
+        if self._parameters is None:
+            raise ValueError("Writer parameters not set.")
+
+        user_id = self._parameters["user_id"]
+
+        # The writer of the previous acquisition was kept for its statistics.
+        previous_writer = self._detach_active_writer()
+        if previous_writer is not None:
+            self._retire_writer(previous_writer)
+
+        writer = self._take_idle_writer(user_id)
+        if writer is None:
+            _logger.info("No idle writer for user %s available. Starting one now.", user_id)
+            writer = self._spawn_writer(user_id)
+
+        try:
+            requests.post(writer.url + "/parameters", json=self._parameters,
+                          timeout=WRITER_REQUEST_TIMEOUT).raise_for_status()
+            requests.post(writer.url + "/start", timeout=WRITER_REQUEST_TIMEOUT).raise_for_status()
+        except:
+            self._retire_writer(writer)
+            raise
+
+        with self._lock:
+            self._active_writer = writer
+
+        self.replenish_in_background(user_id)
+
+    def _detach_active_writer(self):
+        """
+        Clear the active writer. Only the caller that cleared it releases its port.
+        """
+        with self._lock:
+            writer = self._active_writer
+            self._active_writer = None
+
+        return writer
+
+    def _get_active_writer(self):
+        with self._lock:
+            writer = self._active_writer
+
+            if writer is not None and not writer.is_alive():
+                # poll() in is_alive already collected the exit status - the port can be reused right away.
+                self._active_writer = None
+                self._free_ports.append(writer.port)
+                writer = None
+
+        return writer
+
+    def get_status(self):
+        writer = self._get_active_writer()
+
+        if writer is None:
+            return "stopped"
+
+        return requests.get(writer.url + "/status", timeout=WRITER_REQUEST_TIMEOUT).json()["status"]
+
+    def get_statistics(self):
+        writer = self._get_active_writer()
+
+        if writer is None:
+            return {}
+
+        return requests.get(writer.url + "/statistics", timeout=WRITER_REQUEST_TIMEOUT).json()
+
+    def stop(self):
+        writer = self._get_active_writer()
+
+        if writer is not None:
+            requests.get(writer.url + "/stop", timeout=WRITER_REQUEST_TIMEOUT)
+
+    def kill(self):
+        writer = self._detach_active_writer()
+
+        if writer is not None:
+            writer.kill()
+            self._release_port(writer.port)
+
+    def reset(self):
+        self._parameters = None
+
+        writer = self._detach_active_writer()
+
+        # Reset follows stop - the writer gets the time to close its file before it is killed.
+        if writer is not None:
+            self._retire_writer(writer)
+
+    def close(self):
+        self._stop_event.set()
+        self.reset()
+
+        with self._lock:
+            idle_writers = [writer for writers in self._idle_writers.values() for writer in writers]
+            self._idle_writers = {}
+
+        for writer in idle_writers:
+            self._retire_writer(writer)
@@ -0,0 +1,106 @@
+import random
+from threading import Lock, Thread
+from time import sleep
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from socketserver import ThreadingMixIn
+
+import bottle
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class FakeBackendServer(object):
+    """
+    Local server with the backend REST API, driven by the detector_integration_api BackendClient. Every request is
+    delayed by latency seconds and fails with HTTP 500 with the probability failure_rate. Requests to routes the
+    backend does not have are counted in n_unknown_requests - the benchmark reports them.
+
+    The writer is not faked here - it is a separate process started by CppWriterClient (see tests/fake_writer.py).
+    """
+
+    def __init__(self, latency=0, failure_rate=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+        self.state = "INITIALIZED"
+        self.config = {}
+        self.n_received_frames = 0
+
+        self.n_requests = 0
+        self.n_unknown_requests = 0
+        self._lock = Lock()
+
+        self.app = bottle.Bottle()
+        self.app.add_hook("before_request", self._inject_latency_and_failures)
+        self.app.error_handler[404] = self._unknown_request
+        self._register_routes(self.app)
+
+        self._server = make_server(host, port, self.app, ThreadingWSGIServer, QuietRequestHandler)
+        self.url = "http://%s:%d" % (host, self._server.server_port)
+
+        self._thread = None
+
+    def _inject_latency_and_failures(self):
+        with self._lock:
+            self.n_requests += 1
+
+        if self.latency:
+            sleep(self.latency)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise bottle.HTTPError(500, "Injected failure.")
+
+    def _unknown_request(self, error):
+        with self._lock:
+            self.n_unknown_requests += 1
+
+        return '{"state": "error", "status": "Unknown route %s %s."}' % (bottle.request.method, bottle.request.path)
+
+    def _get_state(self):
+        return {"state": "ok", "status": self.state}
+
+    def _register_routes(self, app):
+
+        @app.get("/v1/state")
+        def get_state():
+            return self._get_state()
+
+        @app.post("/v1/state/configure")
+        def configure():
+            self.config = bottle.request.json["settings"]
+            self.state = "CONFIGURED"
+            return self._get_state()
+
+        @app.post("/v1/state/open")
+        def open_backend():
+            self.state = "OPEN"
+            return self._get_state()
+
+        @app.post("/v1/state/close")
+        def close_backend():
+            self.state = "CONFIGURED"
+            return self._get_state()
+
+        @app.post("/v1/state/reset")
+        def reset():
+            self.state = "INITIALIZED"
+            return self._get_state()
+
+        @app.get("/v1/metrics")
+        def get_metrics():
+            return {"state": "ok", "metrics": {"n_received_frames": self.n_received_frames}}
+
+    def start(self):
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,330 @@
+"""
+End-to-end DIA benchmark against local stand-in components.
+
+The DIA uses its real backend and writer clients (BackendClient, CppWriterClient). The backend is a local server with
+the backend REST API (see fake_servers.py), the writer is a fake writer process started by CppWriterClient (see
+tests/fake_writer.py) and the detector is a FakeEiger. All of them can be slowed down, the backend and the writer can
+also be made to fail. The benchmark drives the DIA REST interface through full config/start/reset cycles and reports:
+
+- status QPS (REST and direct IntegrationManager calls)
+- config apply latency
+- start latency: from the start request until the status is RUNNING (or READY, for acquisitions already done)
+- acquisition latency: from the start request until the status is READY again
+- reset latency
+
+Each run is saved as a JSON file, which can be used as --baseline for a later run.
+
+    python -m tests.benchmark.run_benchmark --n_cycles 50 --component_latency 0.005 --output_folder /tmp/dia_bench
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import tempfile
+from copy import deepcopy
+from datetime import datetime
+from threading import Thread
+from time import monotonic, sleep
+from wsgiref.simple_server import make_server
+
+import bottle
+import requests
+
+from detector_integration_api.client.backend_rest_client import BackendClient
+from detector_integration_api.client.cpp_writer_client import CppWriterClient
+from detector_integration_api.rest_api.rest_server import register_rest_interface
+from detector_integration_api.utils import ClientDisableWrapper
+
+from csaxs_dia import rest_addon
+from csaxs_dia.detector_client import EigerClientWrapper
+from csaxs_dia.detector_session import DetectorSession
+from csaxs_dia.manager import IntegrationManager
+from csaxs_dia.status_provider import StatusProvider
+from csaxs_dia.timing import LatencyRecorder, get_latency_statistics
+from csaxs_dia.validation_eiger9m import IntegrationStatus
+from tests.benchmark.fake_servers import FakeBackendServer, ThreadingWSGIServer, QuietRequestHandler
+from tests.fake_eiger import FakeEiger
+from tests.fake_writer import create_writer_executable
+from tests.utils import get_valid_config
+
+REQUEST_TIMEOUT = 30
+
+# Single number results compared against the baseline - lower is better, except for the QPS.
+COMPARED_RESULTS = [("status_qps", True),
+                    ("manager_status_qps", True),
+                    ("config_latency.p50", False),
+                    ("config_latency.p95", False),
+                    ("start_latency.p50", False),
+                    ("start_latency.p95", False),
+                    ("acquisition_latency.p50", False),
+                    ("acquisition_latency.p95", False),
+                    ("reset_latency.p50", False),
+                    ("reset_latency.p95", False)]
+
+
+class NullCliClient(object):
+    """
+    Stand-in for the CLI detector client - the benchmark configs only use parameters the Eiger object exposes.
+    """
+
+    def set_config(self, configuration):
+        pass
+
+
+def get_free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class BenchmarkSetup(object):
+    def __init__(self, component_latency, detector_latency, failure_rate, frame_time):
+        self.backend_server = FakeBackendServer(latency=component_latency, failure_rate=failure_rate)
+        self.eiger = FakeEiger(command_latency=detector_latency)
+
+        # Writer executable and writer logs.
+        self._folder = tempfile.TemporaryDirectory()
+        writer_executable = create_writer_executable(self._folder.name,
+                                                     "--frame_time", frame_time,
+                                                     "--latency", component_latency,
+                                                     "--failure_rate", failure_rate)
+
+        backend_client = ClientDisableWrapper(BackendClient(self.backend_server.url))
+        self.writer_client = CppWriterClient(stream_url="tcp://127.0.0.1:40000",
+                                             writer_executable=writer_executable,
+                                             writer_port=get_free_port(),
+                                             log_folder=self._folder.name)
+        writer_client = ClientDisableWrapper(self.writer_client)
+        detector_client = ClientDisableWrapper(EigerClientWrapper(session=DetectorSession(lambda: self.eiger),
+                                                                  old_client=NullCliClient()))
+
+        self.status_provider = StatusProvider(backend_client, writer_client, detector_client)
+        self.latency_recorder = LatencyRecorder()
+        self.integration_manager = IntegrationManager(backend_client=backend_client,
+                                                      writer_client=writer_client,
+                                                      detector_client=detector_client,
+                                                      status_provider=self.status_provider,
+                                                      latency_recorder=self.latency_recorder)
+
+        app = bottle.Bottle()
+        register_rest_interface(app=app, integration_manager=self.integration_manager)
+        rest_addon.add_rest_interface(app=app, integration_manager=self.integration_manager)
+
+        self._dia_server = make_server("127.0.0.1", 0, app, ThreadingWSGIServer, QuietRequestHandler)
+        self.dia_url = "http://127.0.0.1:%d" % self._dia_server.server_port
+
+    def start(self):
+        self.backend_server.start()
+        Thread(target=self._dia_server.serve_forever, daemon=True).start()
+        self.status_provider.start_polling()
+
+    def stop(self):
+        self.status_provider.stop_polling()
+        self._dia_server.shutdown()
+
+        try:
+            self.writer_client.kill()
+        except Exception:
+            pass
+
+        self.backend_server.stop()
+        self._folder.cleanup()
+
+
+def timed_request(method, url, **kwargs):
+    """
+    :return: Tuple (duration, request successful).
+    """
+    start_time = monotonic()
+
+    try:
+        response = requests.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        successful = response.ok and response.json().get("state") == "ok"
+    except Exception:
+        successful = False
+
+    return monotonic() - start_time, successful
+
+
+def measure_qps(get_status, duration, n_threads):
+    counts = [0] * n_threads
+    stop_time = monotonic() + duration
+
+    def query(thread_index):
+        while monotonic() < stop_time:
+            try:
+                get_status()
+                counts[thread_index] += 1
+            except Exception:
+                pass
+
+    threads = [Thread(target=query, args=(index,)) for index in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts) / duration
+
+
+def wait_for_status(integration_manager, target_status, timeout=REQUEST_TIMEOUT):
+    start_time = monotonic()
+
+    while monotonic() - start_time < timeout:
+        if integration_manager.get_acquisition_status() in target_status:
+            return True
+        sleep(0.001)
+
+    return False
+
+
+def run_benchmark(n_cycles, component_latency, detector_latency, failure_rate, frame_time, n_frames,
+                  qps_duration, qps_threads):
+    setup = BenchmarkSetup(component_latency, detector_latency, failure_rate, frame_time)
+    setup.start()
+
+    config_durations = []
+    start_durations = []
+    acquisition_durations = []
+    reset_durations = []
+    n_errors = 0
+
+    try:
+        timed_request("POST", setup.dia_url + "/api/v1/reset")
+        base_config = get_valid_config()
+
+        for cycle in range(n_cycles):
+            configuration = deepcopy(base_config)
+            configuration["writer"]["n_frames"] = n_frames
+            configuration["detector"]["frames"] = n_frames
+            # Change one detector parameter every cycle, like in an exposure time scan.
+            configuration["detector"]["exptime"] = 0.001 + cycle * 0.00001
+
+            duration, successful = timed_request("POST", setup.dia_url + "/api/v1/config", json=configuration)
+            config_durations.append(duration)
+            n_errors += not successful
+
+            start_time = monotonic()
+
+            _, successful = timed_request("POST", setup.dia_url + "/api/v1/start", json=configuration)
+            n_errors += not successful
+
+            if wait_for_status(setup.integration_manager, (IntegrationStatus.RUNNING, IntegrationStatus.READY)):
+                start_durations.append(monotonic() - start_time)
+            else:
+                n_errors += 1
+
+            if wait_for_status(setup.integration_manager, (IntegrationStatus.READY,)):
+                acquisition_durations.append(monotonic() - start_time)
+            else:
+                n_errors += 1
+
+            duration, successful = timed_request("POST", setup.dia_url + "/api/v1/reset")
+            reset_durations.append(duration)
+            n_errors += not successful
+
+        status_qps = measure_qps(lambda: requests.get(setup.dia_url + "/api/v1/status", timeout=REQUEST_TIMEOUT),
+                                 qps_duration, qps_threads)
+        manager_status_qps = measure_qps(setup.integration_manager.get_acquisition_status,
+                                         qps_duration, qps_threads)
+
+        return {"status_qps": status_qps,
+                "manager_status_qps": manager_status_qps,
+                "config_latency": get_latency_statistics(config_durations),
+                "start_latency": get_latency_statistics(start_durations),
+                "acquisition_latency": get_latency_statistics(acquisition_durations),
+                "reset_latency": get_latency_statistics(reset_durations),
+                "n_errors": n_errors,
+                "n_backend_requests": setup.backend_server.n_requests,
+                "n_unknown_backend_requests": setup.backend_server.n_unknown_requests,
+                "n_detector_commands": len(setup.eiger.commands),
+                "steps": setup.latency_recorder.get_statistics()}
+    finally:
+        setup.stop()
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def get_result_value(results, name):
+    value = results
+    for key in name.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+
+    return value
+
+
+def compare_with_baseline(results, baseline_results):
+    print("%-25s %15s %15s %10s" % ("result", "baseline", "current", "change"))
+
+    for name, higher_is_better in COMPARED_RESULTS:
+        baseline_value = get_result_value(baseline_results, name)
+        current_value = get_result_value(results, name)
+
+        if not baseline_value or current_value is None:
+            continue
+
+        change = (current_value - baseline_value) / baseline_value * 100
+        marker = "" if (change >= 0) == higher_is_better else " (worse)"
+
+        print("%-25s %15.6g %15.6g %+9.1f%%%s" % (name, baseline_value, current_value, change, marker))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DIA end-to-end benchmark with local stand-in components.")
+    parser.add_argument("--n_cycles", type=int, default=20, help="Number of config/start/reset cycles.")
+    parser.add_argument("--n_frames", type=int, default=10, help="Frames per acquisition.")
+    parser.add_argument("--frame_time", type=float, default=0.001, help="Time (in seconds) to write one frame.")
+    parser.add_argument("--component_latency", type=float, default=0.005,
+                        help="Latency (in seconds) of each backend and writer REST call.")
+    parser.add_argument("--detector_latency", type=float, default=0.01,
+                        help="Latency (in seconds) of each detector command.")
+    parser.add_argument("--failure_rate", type=float, default=0, help="Probability of a component call failing.")
+    parser.add_argument("--qps_duration", type=float, default=2, help="Duration (in seconds) of the QPS measurement.")
+    parser.add_argument("--qps_threads", type=int, default=8, help="Concurrent clients for the QPS measurement.")
+    parser.add_argument("--output_folder", default=".", help="Folder to save the benchmark results to.")
+    parser.add_argument("--baseline", default=None, help="Results file of a previous run to compare with.")
+
+    arguments = parser.parse_args()
+
+    parameters = {"n_cycles": arguments.n_cycles,
+                  "n_frames": arguments.n_frames,
+                  "frame_time": arguments.frame_time,
+                  "component_latency": arguments.component_latency,
+                  "detector_latency": arguments.detector_latency,
+                  "failure_rate": arguments.failure_rate,
+                  "qps_duration": arguments.qps_duration,
+                  "qps_threads": arguments.qps_threads}
+
+    results = run_benchmark(**parameters)
+
+    output = {"timestamp": datetime.now().isoformat(),
+              "git_revision": get_git_revision(),
+              "parameters": parameters,
+              "results": results}
+
+    output_filename = os.path.join(arguments.output_folder,
+                                   "dia_benchmark_%s.json" % datetime.now().strftime("%Y%m%d-%H%M%S"))
+    with open(output_filename, "w") as output_file:
+        json.dump(output, output_file, indent=2)
+
+    print("Results saved to %s" % output_filename)
+    print(json.dumps({name: value for name, value in results.items() if name != "steps"}, indent=2))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as input_file:
+            baseline = json.load(input_file)
+
+        if baseline["parameters"] != parameters:
+            print("Warning: baseline was run with different parameters %s." % baseline["parameters"])
+
+        compare_with_baseline(results, baseline["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from time import sleep
+
+
+def _detector_property(name):
+
+    def getter(self):
+        self._execute_command("get", name)
+        return self.values[name]
+
+    def setter(self, value):
+        self._execute_command("put", name, value)
+        self.values[name] = value
+
+    return property(getter, setter)
+
+
+class FakeEiger(object):
+    """
+    Stand-in for sls_detector.Eiger. Every command is recorded and delayed by command_latency seconds.
+    """
+
+    def __init__(self, command_latency=0):
+        self.command_latency = command_latency
+        self.commands = []
+
+        self.values = {"period": 0.0,
+                       "n_frames": 1,
+                       "dynamic_range": 16,
+                       "exposure_time": 0.0,
+                       "timing_mode": "auto",
+                       "n_cycles": 1,
+                       "sub_exposure_time": 0.0,
+                       "threshold": 0,
+                       "status": "idle"}
+
+    def _execute_command(self, *command):
+        self.commands.append(command)
+
+        if self.command_latency:
+            sleep(self.command_latency)
+
+    period = _detector_property("period")
+    n_frames = _detector_property("n_frames")
+    dynamic_range = _detector_property("dynamic_range")
+    exposure_time = _detector_property("exposure_time")
+    timing_mode = _detector_property("timing_mode")
+    n_cycles = _detector_property("n_cycles")
+    sub_exposure_time = _detector_property("sub_exposure_time")
+    threshold = _detector_property("threshold")
+    status = _detector_property("status")
+
+    def start_detector(self):
+        self._execute_command("start")
+        self.values["status"] = "running"
+
+    def stop_detector(self):
+        self._execute_command("stop")
+        self.values["status"] = "idle"
@@ -0,0 +1,211 @@
+"""
+Stand-in for the writer process, with the writer command line and REST interface:
+
+    python fake_writer.py STREAM_URL OUTPUT_FILE N_FRAMES REST_PORT USER_ID
+
+The writer is 'receiving' for n_frames * frame_time seconds and exits once it also got the parameters (POST
+/parameters), as the writer does once the file is written.
+GET /stop and GET /kill make it exit right away.
+
+Started with --standby (see csaxs_dia.writer_pool), it waits for POST /parameters and POST /start instead, and reports
+'stopped' again once done:
+
+    python fake_writer.py --standby STREAM_URL REST_PORT USER_ID
+
+Without --frame_time, no frame arrives and the writer is 'receiving' until stopped. Every request is delayed by --latency
+seconds and fails with HTTP 500 with the probability --failure_rate.
+Nothing is received or written.
+"""
+import argparse
+import json
+import os
+import random
+import stat
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic, sleep
+
+
+def create_writer_executable(folder, *options):
+    """
+    Write an executable script starting the fake writer with the provided options, to be used as writer executable.
+    :return: Path of the script.
+    """
+    filename = os.path.join(folder, "start_writer.sh")
+    command = [sys.executable, os.path.realpath(__file__)] + [str(option) for option in options]
+
+    with open(filename, "w") as output_file:
+        output_file.write("#!/bin/sh\nexec %s \"$@\"\n" % " ".join('"%s"' % part for part in command))
+
+    os.chmod(filename, os.stat(filename).st_mode | stat.S_IEXEC)
+
+    return filename
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeWriterState(object):
+    def __init__(self, standby, frame_time=0.0, parameters=None):
+        self.standby = standby
+        self.frame_time = frame_time
+        self.parameters = parameters
+        self.start_time = None if standby else monotonic()
+        self.stopped = standby
+        # The writer closes the file only once it got the parameters over REST.
+        self.parameters_received = standby
+
+        self._lock = Lock()
+
+    def start(self):
+        with self._lock:
+            self.start_time = monotonic()
+            self.stopped = False
+
+    def stop(self):
+        with self._lock:
+            self.stopped = True
+
+    def get_n_written_frames(self):
+        with self._lock:
+            if self.start_time is None:
+                return 0
+
+            # Without a frame time, no frame ever arrives - the writer receives until stopped.
+            n_frames = self.parameters.get("n_frames", 0)
+            if self.frame_time <= 0:
+                return 0
+
+            return min(n_frames, int((monotonic() - self.start_time) / self.frame_time))
+
+    def is_done(self):
+        if self.stopped:
+            return True
+
+        return self.parameters_received and self.get_n_written_frames() >= self.parameters.get("n_frames", 0)
+
+    def get_status(self):
+        return "stopped" if self.stopped or self.start_time is None or self.is_done() else "receiving"
+
+
+def get_request_handler(state, server, latency=0.0, failure_rate=0.0):
+
+    def exit_writer():
+        Thread(target=server.shutdown, daemon=True).start()
+
+    class RequestHandler(BaseHTTPRequestHandler):
+
+        def _reply(self, content, code=200):
+            body = json.dumps(content).encode()
+
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _inject_latency_and_failures(self):
+            if latency:
+                sleep(latency)
+
+            if failure_rate and random.random() < failure_rate:
+                self._reply({"state": "error", "status": "Injected failure."}, 500)
+                return True
+
+            return False
+
+        def do_GET(self):
+            if self._inject_latency_and_failures():
+                return
+
+            if self.path == "/status":
+                self._reply({"state": "ok", "status": state.get_status()})
+
+            elif self.path == "/statistics":
+                n_written_frames = state.get_n_written_frames()
+                self._reply({"n_received_frames": n_written_frames, "n_written_frames": n_written_frames})
+
+            elif self.path in ("/stop", "/kill"):
+                state.stop()
+                self._reply({"state": "ok", "status": "stopped"})
+
+                if not state.standby or self.path == "/kill":
+                    exit_writer()
+
+            else:
+                self._reply({"state": "error"}, 404)
+
+        def do_POST(self):
+            if self._inject_latency_and_failures():
+                return
+
+            if self.path == "/parameters":
+                length = int(self.headers.get("Content-Length", 0))
+                parameters = json.loads(self.rfile.read(length))
+
+                # Without standby, the output file and the frames are given on the command line.
+                if state.standby:
+                    state.parameters = parameters
+                else:
+                    state.parameters.update(parameters)
+                    state.parameters_received = True
+
+                self._reply({"state": "ok", "parameters": state.parameters})
+
+            elif self.path == "/start" and state.standby:
+                if state.parameters is None:
+                    self._reply({"state": "error", "status": "Parameters not set."}, 400)
+                    return
+
+                state.start()
+                self._reply({"state": "ok", "status": state.get_status()})
+
+            else:
+                self._reply({"state": "error"}, 404)
+
+        def log_message(self, *args):
+            pass
+
+    return RequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake writer.")
+    parser.add_argument("--standby", action="store_true", help="Wait for POST /start.")
+    parser.add_argument("--frame_time", type=float, default=0.0, help="Time (in seconds) to write one frame.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latency (in seconds) of each REST call.")
+    parser.add_argument("--failure_rate", type=float, default=0.0, help="Probability of a REST call failing.")
+    parser.add_argument("arguments", nargs="+",
+                        help="STREAM_URL OUTPUT_FILE N_FRAMES REST_PORT USER_ID, "
+                             "or STREAM_URL REST_PORT USER_ID with --standby.")
+
+    arguments = parser.parse_args()
+
+    if arguments.standby:
+        _, rest_port, _ = arguments.arguments
+        state = FakeWriterState(standby=True)
+    else:
+        _, output_file, n_frames, rest_port, _ = arguments.arguments
+        state = FakeWriterState(standby=False, frame_time=arguments.frame_time,
+                                parameters={"output_file": output_file, "n_frames": int(n_frames)})
+
+    server = ThreadingHTTPServer(("127.0.0.1", int(rest_port)), None)
+    server.RequestHandlerClass = get_request_handler(state, server, arguments.latency, arguments.failure_rate)
+
+    # Without standby, the writer exits once all the frames are written.
+    if not state.standby:
+        def exit_when_done():
+            while not state.is_done():
+                sleep(0.001)
+            server.shutdown()
+
+        Thread(target=exit_when_done, daemon=True).start()
+
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import unittest
+from time import sleep
+from unittest.mock import MagicMock
+
+from csaxs_dia.acquisition_queue import AcquisitionQueue
+from csaxs_dia.validation_eiger9m import IntegrationStatus
+from tests.utils import get_valid_config
+
+
+def wait_for_queue(queue, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if not queue.is_running():
+            return
+        sleep(0.01)
+
+
+class TestAcquisitionQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.integration_manager = MagicMock()
+        self.integration_manager.get_acquisition_config.return_value = get_valid_config()
+        self.integration_manager.get_acquisition_status.return_value = IntegrationStatus.READY
+        self.integration_manager.start_acquisition.return_value = IntegrationStatus.RUNNING
+        self.integration_manager.writer_client.get_statistics.return_value = {}
+
+        self.queue = AcquisitionQueue(self.integration_manager, start_timeout=0.5)
+
+    def test_run_items(self):
+        self.queue.submit([{"output_file": "/tmp/scan_0.h5"},
+                           {"output_file": "/tmp/scan_1.h5", "detector": {"exptime": 0.002}},
+                           {"output_file": "/tmp/scan_2.h5"}])
+        wait_for_queue(self.queue)
+
+        status = self.queue.get_status()
+        self.assertEqual(status["state"], "completed")
+        self.assertEqual(status["n_done"], 3)
+
+        started_configs = [call[0][0] for call in self.integration_manager.start_acquisition.call_args_list]
+        self.assertEqual([config["writer"]["output_file"] for config in started_configs],
+                         ["/tmp/scan_0.h5", "/tmp/scan_1.h5", "/tmp/scan_2.h5"])
+
+        # Partial configs are applied on top of the previous item.
+        self.assertEqual([config["detector"]["exptime"] for config in started_configs], [0.001, 0.002, 0.002])
+
+    def test_failed_item(self):
+        self.integration_manager.start_acquisition.side_effect = [IntegrationStatus.RUNNING,
+                                                                  ValueError("Writer not responding.")]
+
+        self.queue.submit([{"output_file": "/tmp/scan_0.h5"},
+                           {"output_file": "/tmp/scan_1.h5"},
+                           {"output_file": "/tmp/scan_2.h5"}])
+        wait_for_queue(self.queue)
+
+        status = self.queue.get_status()
+        self.assertEqual(status["state"], "failed")
+        self.assertEqual([item["state"] for item in status["items"]], ["done", "failed", "skipped"])
+        self.assertEqual(status["items"][1]["error"], "Writer not responding.")
+
+    def test_wait_for_start_when_ready(self):
+        # READY when started: the acquisition is not done before it was seen running.
+        self.integration_manager.start_acquisition.return_value = IntegrationStatus.READY
+        self.integration_manager.get_acquisition_status.side_effect = \
+            [IntegrationStatus.READY] * 3 + [IntegrationStatus.RUNNING] * 3 + [IntegrationStatus.READY] * 100
+
+        self.queue.submit([{"output_file": "/tmp/scan_0.h5"}])
+        wait_for_queue(self.queue)
+
+        self.assertEqual(self.queue.get_status()["state"], "completed")
+        self.assertGreaterEqual(self.integration_manager.get_acquisition_status.call_count, 7)
+
+    def test_short_acquisition_with_written_frames(self):
+        # Completed before RUNNING was seen - the written frames tell it ran.
+        self.integration_manager.start_acquisition.return_value = IntegrationStatus.READY
+        self.integration_manager.writer_client.get_statistics.return_value = {"n_written_frames": 100}
+
+        self.queue.submit([{"output_file": "/tmp/scan_0.h5"}])
+        wait_for_queue(self.queue)
+
+        self.assertEqual(self.queue.get_status()["state"], "completed")
+
+    def test_not_started(self):
+        self.integration_manager.start_acquisition.return_value = IntegrationStatus.READY
+
+        self.queue.submit([{"output_file": "/tmp/scan_0.h5"}, {"output_file": "/tmp/scan_1.h5"}])
+        wait_for_queue(self.queue)
+
+        status = self.queue.get_status()
+        self.assertEqual(status["state"], "failed")
+        self.assertEqual([item["state"] for item in status["items"]], ["failed", "skipped"])
+        self.assertEqual(self.integration_manager.start_acquisition.call_count, 1)
+
+    def test_invalid_submit(self):
+        with self.assertRaisesRegex(ValueError, "non empty list"):
+            self.queue.submit([])
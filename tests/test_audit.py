@@ -0,0 +1,53 @@
+import logging
+import unittest
+from queue import Queue
+
+from csaxs_dia.audit import AuditQueueHandler, STATUS_AUDIT_LOGGER_NAME, STATUS_SAMPLING_RATE
+
+
+def get_record(name, msg, *args):
+    return logging.LogRecord(name, logging.INFO, __file__, 0, msg, args, None)
+
+
+class TestAuditQueueHandler(unittest.TestCase):
+
+    def test_args_kept_unformatted(self):
+        queue = Queue()
+        handler = AuditQueueHandler(queue)
+
+        configuration = {"exptime": 0.001}
+        handler.emit(get_record("audit_trail", "Detector config: %s", configuration))
+        configuration["exptime"] = 0.002
+
+        record = queue.get_nowait()
+        self.assertEqual(record.msg, "Detector config: %s")
+        self.assertEqual(record.getMessage(), "Detector config: {'exptime': 0.001}")
+
+    def test_drop_when_full(self):
+        queue = Queue(2)
+        handler = AuditQueueHandler(queue)
+
+        for index in range(5):
+            handler.emit(get_record("audit_trail", "Step %d", index))
+
+        self.assertEqual(handler.n_dropped, 3)
+        self.assertEqual([queue.get_nowait().getMessage() for _ in range(2)], ["Step 0", "Step 1"])
+
+        handler.emit(get_record("audit_trail", "Step 5"))
+        self.assertEqual(queue.get_nowait().getMessage(), "3 audit records dropped.")
+        self.assertEqual(queue.get_nowait().getMessage(), "Step 5")
+
+    def test_status_sampling(self):
+        queue = Queue(100)
+        handler = AuditQueueHandler(queue)
+
+        for _ in range(50):
+            queue.put_nowait(get_record("audit_trail", "Filler"))
+
+        for _ in range(STATUS_SAMPLING_RATE * 2):
+            handler.emit(get_record(STATUS_AUDIT_LOGGER_NAME, "writer_client.get_status()"))
+
+        # Only one status record in STATUS_SAMPLING_RATE is kept while the queue is filling up.
+        self.assertEqual(queue.qsize(), 52)
+        self.assertEqual(handler.n_sampled_out, STATUS_SAMPLING_RATE * 2 - 2)
+        self.assertEqual(handler.n_dropped, 0)
@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import unittest
+
+from csaxs_dia.config_store import ConfigStore
+
+
+class TestConfigStore(unittest.TestCase):
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            store = ConfigStore(os.path.join(folder, "applied_config.json"))
+            self.assertIsNone(store.load())
+
+            store.save({"bit_depth": 16}, {"dr": 16, "period": 0.01})
+            self.assertEqual(store.load(), {"backend": {"bit_depth": 16},
+                                            "detector": {"dr": 16, "period": 0.01}})
+
+            store.clear()
+            self.assertIsNone(store.load())
+            store.clear()
+
+    def test_modified_record_ignored(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "applied_config.json")
+            store = ConfigStore(filename)
+            store.save({"bit_depth": 16}, {"dr": 16})
+
+            with open(filename) as input_file:
+                record = json.load(input_file)
+            record["backend"]["config"]["bit_depth"] = 32
+            with open(filename, "w") as output_file:
+                json.dump(record, output_file)
+
+            self.assertIsNone(store.load())
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import MagicMock, PropertyMock
+
+from csaxs_dia.detector_client import EigerClientWrapper
+from csaxs_dia.detector_session import DetectorSession
+from tests.fake_eiger import FakeEiger
+from tests.utils import get_valid_config
+
+
+class TestEigerClientWrapper(unittest.TestCase):
+
+    def test_native_parameters(self):
+        eiger = FakeEiger()
+        old_client = MagicMock()
+        client = EigerClientWrapper(session=DetectorSession(lambda: eiger), old_client=old_client)
+
+        detector_config = get_valid_config()["detector"]
+        client.set_config(detector_config)
+
+        self.assertEqual(eiger.values["period"], detector_config["period"])
+        self.assertEqual(eiger.values["n_frames"], detector_config["frames"])
+        self.assertEqual(eiger.values["dynamic_range"], detector_config["dr"])
+        self.assertEqual(eiger.values["exposure_time"], detector_config["exptime"])
+        self.assertEqual(eiger.values["timing_mode"], detector_config["timing"])
+        self.assertEqual(eiger.values["n_cycles"], detector_config["cycles"])
+
+        old_client.set_config.assert_not_called()
+
+    def test_pass_through_and_cli_fallback(self):
+        eiger = FakeEiger()
+        old_client = MagicMock()
+        client = EigerClientWrapper(session=DetectorSession(lambda: eiger), old_client=old_client)
+
+        client.set_config({"exptime": 0.002, "sub_exposure_time": 0.001, "flags": "parallel"})
+
+        self.assertEqual(eiger.values["exposure_time"], 0.002)
+        self.assertEqual(eiger.values["sub_exposure_time"], 0.001)
+        old_client.set_config.assert_called_once_with({"flags": "parallel"})
+
+    def test_get_config(self):
+        eiger = FakeEiger()
+        client = EigerClientWrapper(session=DetectorSession(lambda: eiger), old_client=MagicMock())
+
+        client.set_config({"exptime": 0.002, "frames": 10})
+
+        # Parameters only available via CLI are not read.
+        self.assertEqual(client.get_config(["exptime", "frames", "flags"]), {"exptime": 0.002, "frames": 10})
+
+    def test_single_parameter_latency(self):
+        eiger = FakeEiger()
+        old_client = MagicMock()
+        client = EigerClientWrapper(session=DetectorSession(lambda: eiger), old_client=old_client)
+
+        client.set_config({"exptime": 0.002})
+
+        # One command round trip - no read back, no CLI call.
+        self.assertEqual(eiger.commands, [("put", "exposure_time", 0.002)])
+        old_client.set_config.assert_not_called()
+
+
+class TestDetectorSession(unittest.TestCase):
+
+    def test_lazy_connect(self):
+        factory = MagicMock(side_effect=FakeEiger)
+        session = DetectorSession(factory)
+
+        client = EigerClientWrapper(session=session, old_client=MagicMock())
+        factory.assert_not_called()
+
+        client.start()
+        client.get_status()
+        client.stop()
+        self.assertEqual(factory.call_count, 1)
+
+    def test_reconnect(self):
+        broken_eiger = MagicMock()
+        type(broken_eiger).status = PropertyMock(side_effect=RuntimeError("Cannot connect to the detector."))
+        eiger = FakeEiger()
+
+        session = DetectorSession(MagicMock(side_effect=[broken_eiger, eiger]))
+        client = EigerClientWrapper(session=session, old_client=MagicMock())
+
+        # Reading the status is retried on a new connection.
+        self.assertEqual(client.get_status(), eiger.status)
+
+        session.detector_factory = MagicMock(side_effect=RuntimeError("Detector offline."))
+        session.disconnect()
+
+        with self.assertRaisesRegex(RuntimeError, "Detector offline"):
+            client.stop()
+
+    def test_start_not_retried(self):
+        broken_eiger = MagicMock()
+        broken_eiger.start_detector.side_effect = RuntimeError("Socket timed out.")
+        eiger = FakeEiger()
+
+        factory = MagicMock(side_effect=[broken_eiger, eiger])
+        client = EigerClientWrapper(session=DetectorSession(factory), old_client=MagicMock())
+
+        # The start might have reached the detector - it is not sent twice.
+        with self.assertRaisesRegex(RuntimeError, "Socket timed out"):
+            client.start()
+        broken_eiger.start_detector.assert_called_once_with()
+
+        # The next command runs on a new connection.
+        client.start()
+        self.assertEqual(client.get_status(), "running")
+
+    def test_command_error_not_retried(self):
+        eiger = MagicMock()
+        type(eiger).threshold = PropertyMock(side_effect=ValueError("Energy out of range."))
+
+        factory = MagicMock(return_value=eiger)
+        client = EigerClientWrapper(session=DetectorSession(factory), old_client=MagicMock())
+
+        with self.assertRaisesRegex(ValueError, "Energy out of range"):
+            client.set_threshold(100000)
+        self.assertEqual(factory.call_count, 1)
@@ -0,0 +1,432 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+from threading import Event, Thread, Timer
+from time import monotonic, sleep
+from unittest.mock import MagicMock
+
+from csaxs_dia.config_store import ConfigStore
+from csaxs_dia.manager import ARM_TIMEOUT, IntegrationManager, STATUS_TIMEOUT, get_detector_parameters_order, \
+    run_in_parallel
+from csaxs_dia.validation_eiger9m import IntegrationStatus
+from tests.utils import get_valid_config
+
+
+def get_test_manager():
+    clients = {}
+
+    for name in ("backend_client", "writer_client", "detector_client"):
+        client = MagicMock()
+        client.client_enabled = True
+        client.is_client_enabled.return_value = True
+        clients[name] = client
+
+    return IntegrationManager(status_provider=MagicMock(), **clients)
+
+
+class TestDetectorConfigDiff(unittest.TestCase):
+
+    def test_only_changed_parameters_applied(self):
+        manager = get_test_manager()
+        configuration = get_valid_config()
+
+        manager._set_acquisition_config(configuration)
+        self.assertEqual(manager.detector_client.set_config.call_count, len(configuration["detector"]))
+
+        manager.detector_client.set_config.reset_mock()
+        configuration = get_valid_config()
+        configuration["detector"]["exptime"] = 0.002
+
+        manager._set_acquisition_config(configuration)
+        manager.detector_client.set_config.assert_called_once_with({"exptime": 0.002})
+
+        manager.detector_client.set_config.reset_mock()
+        manager._set_acquisition_config(get_valid_config())
+        manager.detector_client.set_config.assert_called_once_with({"exptime": 0.001})
+
+    def test_partial_failure(self):
+        manager = get_test_manager()
+        manager._set_acquisition_config(get_valid_config())
+
+        def fail_on_exptime(parameters):
+            if "exptime" in parameters:
+                raise RuntimeError("Detector did not respond.")
+
+        manager.detector_client.set_config.side_effect = fail_on_exptime
+
+        configuration = get_valid_config()
+        configuration["detector"]["exptime"] = 0.002
+        configuration["detector"]["period"] = 0.05
+
+        with self.assertRaisesRegex(ValueError, "Detector did not respond"):
+            manager._set_acquisition_config(configuration)
+
+        self.assertFalse(manager.last_config_successful)
+
+        # The failed parameter must be sent again, the one that was applied not.
+        manager.detector_client.set_config.reset_mock()
+        manager.detector_client.set_config.side_effect = None
+
+        manager._set_acquisition_config(configuration)
+        manager.detector_client.set_config.assert_called_once_with({"exptime": 0.002})
+
+    def test_parameters_order(self):
+        applied_parameters = {"dr": 16, "period": 0.04, "exptime": 0.001}
+
+        # Longer period first, so the longer exposure time fits in it.
+        self.assertEqual(get_detector_parameters_order({"exptime": 0.05, "period": 0.1, "frames": 10, "dr": 32},
+                                                       applied_parameters),
+                         ["dr", "period", "exptime", "frames"])
+        # Shorter exposure time first, so it fits in the shorter period.
+        self.assertEqual(get_detector_parameters_order({"exptime": 0.0005, "period": 0.01}, applied_parameters),
+                         ["exptime", "period"])
+        self.assertEqual(get_detector_parameters_order({"exptime": 0.001, "period": 0.01}, {}),
+                         ["period", "exptime"])
+
+    def test_reset_clears_applied_parameters(self):
+        manager = get_test_manager()
+        manager._set_acquisition_config(get_valid_config())
+
+        manager._get_acquisition_status = MagicMock(return_value=IntegrationStatus.READY)
+        manager.reset()
+
+        manager.detector_client.set_config.reset_mock()
+        manager._set_acquisition_config(get_valid_config())
+        self.assertEqual(manager.detector_client.set_config.call_count, len(get_valid_config()["detector"]))
+
+
+class TestStatusWaits(unittest.TestCase):
+
+    def test_start_waits_expected_duration(self):
+        manager = get_test_manager()
+        manager._get_acquisition_status = MagicMock(return_value=IntegrationStatus.READY)
+        manager.status_waiter.wait_for_status = MagicMock(return_value=IntegrationStatus.RUNNING)
+
+        manager.start_acquisition(get_valid_config())
+
+        # 100 frames of 0.04 seconds.
+        _, kwargs = manager.status_waiter.wait_for_status.call_args
+        self.assertAlmostEqual(kwargs["expected_duration"], 4.0)
+
+    def test_config_timeout(self):
+        manager = get_test_manager()
+        # READY to accept the config, never READY again.
+        manager._get_acquisition_status = MagicMock(
+            side_effect=chain([IntegrationStatus.READY], repeat(IntegrationStatus.ERROR)))
+
+        # The manager lock is held while waiting - failed configs give up quickly.
+        start_time = monotonic()
+        with self.assertRaisesRegex(ValueError, "Timeout while waiting for status"):
+            manager.set_acquisition_config(get_valid_config())
+        self.assertLess(monotonic() - start_time, STATUS_TIMEOUT + 1)
+
+
+class TestArmedAcquisition(unittest.TestCase):
+
+    def get_manager(self):
+        manager = get_test_manager()
+
+        self.writer_status = "stopped"
+        manager.status_provider.get_quick_status_details.side_effect = \
+            lambda: {"writer": self.writer_status, "backend": "OPEN", "detector": "idle"}
+
+        return manager
+
+    def set_writer_status(self, status):
+        self.writer_status = status
+
+    def test_arm_waits_for_writer_startup(self):
+        manager = self.get_manager()
+
+        # The writer starts receiving only after the (short) config and reset status timeout.
+        manager.writer_client.start.side_effect = \
+            lambda: Timer(STATUS_TIMEOUT + 0.2, self.set_writer_status, ("receiving",)).start()
+
+        arm_thread = Thread(target=lambda: setattr(self, "arm_status", manager.arm_acquisition(get_valid_config())))
+        arm_thread.start()
+
+        sleep(0.2)
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.ARMING)
+
+        arm_thread.join(timeout=ARM_TIMEOUT)
+        self.assertEqual(self.arm_status, IntegrationStatus.ARMED)
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.ARMED)
+        manager.detector_client.start.assert_not_called()
+
+    def test_arm_fails_when_writer_fails(self):
+        manager = self.get_manager()
+        manager.writer_client.start.side_effect = lambda: self.set_writer_status("error")
+
+        with self.assertRaisesRegex(ValueError, "Expecting status"):
+            manager.arm_acquisition(get_valid_config())
+
+        with self.assertRaisesRegex(ValueError, "Cannot fire acquisition"):
+            manager.fire_acquisition()
+
+    def test_fire(self):
+        manager = self.get_manager()
+        manager.writer_client.start.side_effect = lambda: self.set_writer_status("receiving")
+
+        self.assertEqual(manager.arm_acquisition(get_valid_config()), IntegrationStatus.ARMED)
+        manager.detector_client.start.assert_not_called()
+
+        self.assertEqual(manager.fire_acquisition(), IntegrationStatus.RUNNING)
+        manager.detector_client.start.assert_called_once_with()
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.RUNNING)
+
+        # Fired only once.
+        with self.assertRaisesRegex(ValueError, "Cannot fire acquisition"):
+            manager.fire_acquisition()
+
+    def test_start_while_armed_fires(self):
+        manager = self.get_manager()
+        manager.writer_client.start.side_effect = lambda: self.set_writer_status("receiving")
+
+        manager.arm_acquisition(get_valid_config())
+        manager.detector_client.set_config.reset_mock()
+
+        self.assertEqual(manager.start_acquisition(None), IntegrationStatus.RUNNING)
+        manager.detector_client.start.assert_called_once_with()
+        manager.detector_client.set_config.assert_not_called()
+        self.assertEqual(manager.writer_client.start.call_count, 1)
+
+    def test_stop_while_armed(self):
+        manager = self.get_manager()
+        manager.writer_client.start.side_effect = lambda: self.set_writer_status("receiving")
+        manager.writer_client.stop.side_effect = lambda: self.set_writer_status("stopped")
+
+        manager.arm_acquisition(get_valid_config())
+
+        self.assertEqual(manager.stop_acquisition(), IntegrationStatus.READY)
+
+        # The detector was never started - only the writer is stopped.
+        manager.writer_client.stop.assert_called_once_with()
+        manager.detector_client.start.assert_not_called()
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.READY)
+
+
+class TestComponentErrors(unittest.TestCase):
+
+    def test_run_in_parallel(self):
+        def fail(message):
+            raise RuntimeError(message)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results, errors = run_in_parallel(executor, {"writer": lambda: "ok",
+                                                         "backend": lambda: fail("Backend down."),
+                                                         "detector": lambda: fail("Detector down.")})
+
+        self.assertEqual(results, {"writer": "ok"})
+        self.assertEqual({name: str(error) for name, error in errors.items()},
+                         {"backend": "Backend down.", "detector": "Detector down."})
+
+    def test_config_with_two_failed_components(self):
+        with tempfile.TemporaryDirectory() as folder:
+            manager = get_test_manager()
+            manager.config_store = ConfigStore(os.path.join(folder, "applied_config.json"))
+
+            manager._set_acquisition_config(get_valid_config())
+            self.assertIsNotNone(manager.config_store.load())
+
+            manager.backend_client.set_config.side_effect = RuntimeError("Backend down.")
+            manager.detector_client.set_config.side_effect = RuntimeError("Detector down.")
+            manager.writer_client.set_parameters.reset_mock()
+
+            # Forces the backend and detector config to be applied again.
+            configuration = get_valid_config()
+            configuration["backend"]["bit_depth"] = 32
+            configuration["detector"]["dr"] = 32
+
+            with self.assertRaises(ValueError) as context:
+                manager._set_acquisition_config(configuration)
+
+            # Both errors are reported, the writer was still configured.
+            self.assertIn("backend: Backend down.", str(context.exception))
+            self.assertIn("detector: Detector down.", str(context.exception))
+            manager.writer_client.set_parameters.assert_called_once_with(configuration["writer"])
+
+            self.assertFalse(manager.last_config_successful)
+            self.assertIsNone(manager.config_store.load())
+
+    def get_failing_manager(self):
+        manager = get_test_manager()
+        manager._get_acquisition_status = MagicMock(return_value=IntegrationStatus.READY)
+
+        manager.detector_client.stop.side_effect = RuntimeError("Detector down.")
+        manager.writer_client.reset.side_effect = RuntimeError("Writer down.")
+        manager.writer_client.kill.side_effect = RuntimeError("Writer down.")
+
+        return manager
+
+    def test_reset_with_two_failed_components(self):
+        manager = self.get_failing_manager()
+
+        # The errors are logged - the components that work are still reset.
+        with self.assertLogs("audit_trail", level="ERROR") as logs:
+            self.assertEqual(manager.reset(), IntegrationStatus.READY)
+
+        manager.backend_client.reset.assert_called_once_with()
+        self.assertTrue(any("Detector down." in line for line in logs.output))
+        self.assertTrue(any("Writer down." in line for line in logs.output))
+
+    def test_kill_with_two_failed_components(self):
+        manager = self.get_failing_manager()
+
+        with self.assertLogs("audit_trail", level="ERROR"):
+            self.assertEqual(manager.kill(), IntegrationStatus.READY)
+
+        # Once by kill, once by the reset that follows.
+        self.assertEqual(manager.backend_client.reset.call_count, 2)
+        manager.writer_client.kill.assert_called_once_with()
+
+
+class TestConcurrentAccess(unittest.TestCase):
+
+    def test_reads_not_blocked_by_config(self):
+        manager = get_test_manager()
+        manager._get_acquisition_status = MagicMock(return_value=IntegrationStatus.READY)
+
+        config_started = Event()
+        release_config = Event()
+
+        def slow_set_config(parameters):
+            config_started.set()
+            release_config.wait(timeout=5)
+
+        manager.detector_client.set_config.side_effect = slow_set_config
+
+        config_thread = Thread(target=manager.set_acquisition_config, args=(get_valid_config(),))
+        config_thread.start()
+        self.assertTrue(config_started.wait(timeout=5))
+
+        # Read only methods do not wait for the configuration to complete.
+        manager.get_acquisition_config()
+        manager.get_clients_enabled()
+
+        reset_thread = Thread(target=manager.reset)
+        reset_thread.start()
+        reset_thread.join(timeout=0.1)
+        self.assertTrue(reset_thread.is_alive())
+
+        release_config.set()
+        config_thread.join()
+        reset_thread.join()
+
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.config_store = ConfigStore(os.path.join(self.folder.name, "applied_config.json"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def get_manager(self):
+        manager = get_test_manager()
+        manager.config_store = self.config_store
+        manager._get_acquisition_status = MagicMock(return_value=IntegrationStatus.READY)
+        manager.reset = MagicMock(return_value=IntegrationStatus.READY)
+
+        return manager
+
+    def test_resume_skips_applied_config(self):
+        manager = self.get_manager()
+        configuration = get_valid_config()
+        manager._set_acquisition_config(configuration)
+
+        # Restarted DIA, detector still configured.
+        manager = self.get_manager()
+        live_parameters = dict(configuration["detector"])
+        live_parameters["exptime"] = 0.5
+        manager.detector_client.get_config.return_value = live_parameters
+
+        manager.resume()
+        manager.reset.assert_not_called()
+
+        # The backend config is applied again on resume, not with the next config.
+        manager.backend_client.set_config.assert_called_once_with(configuration["backend"])
+        manager.backend_client.open.assert_called_once_with()
+
+        manager._set_acquisition_config(get_valid_config())
+
+        manager.backend_client.set_config.assert_called_once_with(configuration["backend"])
+        manager.detector_client.set_config.assert_called_once_with({"exptime": configuration["detector"]["exptime"]})
+
+    def test_resume_without_record(self):
+        manager = self.get_manager()
+
+        manager.resume()
+        manager.reset.assert_called_once_with()
+
+    def test_resume_with_failed_backend(self):
+        manager = self.get_manager()
+        manager._set_acquisition_config(get_valid_config())
+
+        manager = self.get_manager()
+        manager.backend_client.set_config.side_effect = RuntimeError("Backend not reachable.")
+        manager.detector_client.get_config.return_value = {}
+
+        manager.resume()
+        self.assertFalse(manager.last_config_successful)
+
+        manager.backend_client.set_config.side_effect = None
+        manager.backend_client.set_config.reset_mock()
+        manager._set_acquisition_config(get_valid_config())
+
+        manager.backend_client.set_config.assert_called_once_with(get_valid_config()["backend"])
+
+    def test_unchanged_config_not_saved(self):
+        manager = self.get_manager()
+        manager.config_store = MagicMock(wraps=self.config_store)
+
+        manager._set_acquisition_config(get_valid_config())
+        manager._set_acquisition_config(get_valid_config())
+        self.assertEqual(manager.config_store.save.call_count, 1)
+
+        changed_config = get_valid_config()
+        changed_config["detector"]["exptime"] = 0.5
+        manager._set_acquisition_config(changed_config)
+        self.assertEqual(manager.config_store.save.call_count, 2)
+
+    def test_starting_status_while_verifying(self):
+        manager = self.get_manager()
+
+        verification_started = Event()
+        release_verification = Event()
+
+        def slow_reset():
+            verification_started.set()
+            release_verification.wait(timeout=5)
+            return IntegrationStatus.READY
+
+        manager.reset.side_effect = slow_reset
+
+        completed = Event()
+        manager.verify_in_background(on_complete=completed.set)
+        self.assertTrue(verification_started.wait(timeout=5))
+
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.STARTING)
+
+        release_verification.set()
+        self.assertTrue(completed.wait(timeout=5))
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.READY)
+
+    def test_state_change_waits_for_verification(self):
+        manager = self.get_manager()
+
+        release_verification = Event()
+        manager.reset.side_effect = lambda: release_verification.wait(timeout=5)
+
+        manager.verify_in_background()
+
+        changed = Event()
+        Thread(target=lambda: (manager.set_clients_enabled({"backend": False}), changed.set()), daemon=True).start()
+
+        self.assertFalse(changed.wait(timeout=0.2))
+
+        release_verification.set()
+        self.assertTrue(changed.wait(timeout=5))
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.READY)
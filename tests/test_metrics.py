@@ -0,0 +1,77 @@
+import unittest
+from math import isnan
+from unittest.mock import MagicMock, patch
+
+from csaxs_dia import metrics
+from csaxs_dia.metrics import RingBuffer, MetricsSampler, extract_sample
+from csaxs_dia.validation_eiger9m import get_frame_size
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_wrap_around(self):
+        buffer = RingBuffer(3, ["value"])
+        self.assertEqual(buffer.get_samples(), {"timestamp": [], "value": []})
+
+        for index in range(5):
+            buffer.append(index, {"value": index * 10})
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.get_samples(), {"timestamp": [2, 3, 4], "value": [20, 30, 40]})
+        self.assertEqual(buffer.get_samples(2), {"timestamp": [3, 4], "value": [30, 40]})
+
+
+class TestMetricsSampler(unittest.TestCase):
+
+    def test_rates_and_lag(self):
+        integration_manager = MagicMock()
+        integration_manager.get_acquisition_status.return_value.name = "RUNNING"
+
+        integration_manager.get_acquisition_config.return_value = {"detector": {"dr": 16}}
+
+        sampler = MetricsSampler(integration_manager, history_size=10)
+
+        integration_manager.get_metrics.return_value = {"writer": {"n_written_frames": 100},
+                                                        "backend": {"n_received_frames": 120},
+                                                        "detector": {}}
+        with patch.object(metrics, "time", return_value=10):
+            sampler.sample()
+
+        integration_manager.get_metrics.return_value = {"writer": {"n_written_frames": 150},
+                                                        "backend": {"n_received_frames": 180},
+                                                        "detector": {}}
+        with patch.object(metrics, "time", return_value=12):
+            sampler.sample()
+
+        latest = sampler.get_latest()
+        self.assertEqual(latest["writer_frame_rate"], 25)
+        self.assertEqual(latest["backend_frame_rate"], 30)
+        self.assertEqual(latest["backend_writer_lag"], 30)
+        self.assertTrue(isnan(latest["detector_frame_rate"]))
+        # 25 frames per second at 16 bit.
+        self.assertEqual(latest["bytes_per_second"], 25 * get_frame_size(16))
+
+        history = sampler.get_history()
+        self.assertEqual(history["writer_frame_rate"], [None, 25])
+        self.assertEqual(history["detector_frames"], [None, None])
+
+        prometheus_metrics = sampler.get_prometheus_metrics()
+        self.assertIn('dia_status{status="running"} 1', prometheus_metrics)
+        self.assertIn("dia_writer_frame_rate 25.0", prometheus_metrics)
+        self.assertIn("# TYPE dia_writer_frames_total counter", prometheus_metrics)
+        self.assertIn("dia_writer_frames_total 150.0", prometheus_metrics)
+        self.assertIn("dia_detector_frames_total NaN", prometheus_metrics)
+        self.assertIn("# TYPE dia_bytes_per_second gauge", prometheus_metrics)
+        self.assertIn("dia_bytes_per_second %r" % float(25 * get_frame_size(16)), prometheus_metrics)
+        self.assertEqual(history["bytes_per_second"], [None, 25 * get_frame_size(16)])
+
+    def test_missing_key_logged(self):
+        metrics._logged_missing_keys.clear()
+
+        with self.assertLogs("csaxs_dia.metrics", "WARNING") as logs:
+            sample = extract_sample({"writer": {"written": 10}, "backend": {}, "detector": {}})
+
+        self.assertTrue(isnan(sample["writer_frames"]))
+        self.assertIn("'n_written_frames'", logs.output[0])
+        # Components that do not report metrics are not logged.
+        self.assertFalse(any("backend" in line for line in logs.output))
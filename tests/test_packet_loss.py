@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy
+
+from csaxs_dia.packet_loss import analyze_masks, analyze_files, get_packet_bits
+
+
+class TestPacketLoss(unittest.TestCase):
+
+    def test_packet_bits(self):
+        masks = numpy.array([[1, 2 ** 63], [0, 0b101]], dtype=numpy.uint64)
+
+        bits = get_packet_bits(masks)
+
+        self.assertEqual(bits.shape, (2, 2, 64))
+        self.assertListEqual(numpy.flatnonzero(bits[0, 0]).tolist(), [0])
+        self.assertListEqual(numpy.flatnonzero(bits[0, 1]).tolist(), [63])
+        self.assertListEqual(numpy.flatnonzero(bits[1, 0]).tolist(), [])
+        self.assertListEqual(numpy.flatnonzero(bits[1, 1]).tolist(), [0, 2])
+
+    def test_analyze_masks(self):
+        masks = numpy.zeros((3000, 4), dtype=numpy.uint64)
+        masks[10, 1] = 0b11
+        masks[2000, 1] = 0b10
+        masks[2999, 3] = 2 ** 40
+
+        result = analyze_masks(masks)
+
+        self.assertEqual(result["n_frames"], 3000)
+        self.assertListEqual(result["lost_packets"].tolist(), [0, 3, 0, 1])
+        self.assertListEqual(result["frames_with_loss"].tolist(), [0, 2, 0, 1])
+        self.assertEqual(result["packet_histogram"][1, 0], 1)
+        self.assertEqual(result["packet_histogram"][1, 1], 2)
+        self.assertEqual(result["packet_histogram"][3, 40], 1)
+
+    def test_analyze_files(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filenames = []
+
+            for file_index in range(2):
+                filename = os.path.join(folder, "test_%d.h5" % file_index)
+                filenames.append(filename)
+
+                masks = numpy.zeros((5, 4), dtype=numpy.uint64)
+                masks[0, file_index] = 0b1
+
+                with h5py.File(filename, "w") as output_file:
+                    output_file["data/missing_packets_1"] = masks
+                    output_file["data/missing_packets_2"] = numpy.zeros((5, 4), dtype=numpy.uint64)
+
+            summary, per_file, errors = analyze_files(filenames, n_processes=2)
+
+            self.assertDictEqual(errors, {})
+            self.assertDictEqual(per_file, {filenames[0]: 1, filenames[1]: 1})
+
+            self.assertEqual(summary["missing_packets_1"]["n_frames"], 10)
+            self.assertListEqual(summary["missing_packets_1"]["lost_packets"], [1, 1, 0, 0])
+            self.assertListEqual(summary["missing_packets_1"]["half_modules_with_loss"], [0, 1])
+            self.assertEqual(summary["missing_packets_2"]["total_lost_packets"], 0)
+
+            # The summary must be JSON serializable.
+            json.dumps(summary)
@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from csaxs_dia.packet_monitor import PacketLossMonitor
+
+
+class FakeFrame(object):
+    def __init__(self, data):
+        self.bytes = data
+
+
+def get_message(frame_number, missing_packets_1, missing_packets_2):
+    header = {"frame": frame_number,
+              "missing_packets_1": missing_packets_1,
+              "missing_packets_2": missing_packets_2}
+
+    return [FakeFrame(json.dumps(header).encode()), FakeFrame(b"image data")]
+
+
+class TestPacketLossMonitor(unittest.TestCase):
+
+    def test_counters(self):
+        monitor = PacketLossMonitor("tcp://127.0.0.1:40000")
+
+        monitor.process_message(get_message(0, [0, 0, 0], [0, 0, 0]))
+        monitor.process_message(get_message(1, [0b11, 0, 0], [0, 0, 2 ** 63]))
+        monitor.process_message(get_message(4, [0b1, 0, 0], [0, 0, 0]))
+
+        metrics = monitor.get_metrics()
+
+        self.assertEqual(metrics["monitored_frames"], 3)
+        self.assertEqual(metrics["frames_with_lost_packets"], 2)
+        self.assertEqual(metrics["unmonitored_frames"], 2)
+        self.assertEqual(metrics["lost_packets"], 4)
+        self.assertListEqual(metrics["lost_packets_per_half_module"], [3, 0, 1])
+        self.assertListEqual(metrics["frames_with_lost_packets_per_half_module"], [2, 0, 1])
+        self.assertListEqual(metrics["half_modules_with_lost_packets"], [0, 2])
+
+        monitor.reset()
+
+        metrics = monitor.get_metrics()
+        self.assertEqual(metrics["monitored_frames"], 0)
+        self.assertEqual(metrics["lost_packets"], 0)
+        self.assertListEqual(metrics["lost_packets_per_half_module"], [])
+
+    def test_invalid_socket_type(self):
+        with self.assertRaisesRegex(ValueError, "socket type"):
+            PacketLossMonitor("tcp://127.0.0.1:40000", socket_type="push")
@@ -0,0 +1,67 @@
+import io
+import json
+import unittest
+
+import numpy
+
+from csaxs_dia.preview import PreviewBuffer, get_preview, parse_roi
+
+
+class FakeFrame(object):
+    def __init__(self, data):
+        self.bytes = data
+        self.buffer = memoryview(data)
+
+
+def get_message(image):
+    header = {"frame": 1, "shape": list(image.shape), "type": str(image.dtype)}
+
+    return [FakeFrame(json.dumps(header).encode()), FakeFrame(image.tobytes())]
+
+
+class TestPreview(unittest.TestCase):
+
+    def test_get_preview(self):
+        image = numpy.arange(24, dtype=numpy.uint16).reshape(4, 6)
+
+        binned = get_preview(image, binning=2)
+        self.assertEqual(binned.shape, (2, 3))
+        self.assertEqual(binned[0, 0], 0 + 1 + 6 + 7)
+
+        cropped = get_preview(image, roi=(1, 2, 3, 4))
+        self.assertListEqual(cropped.tolist(), [[13, 14], [19, 20]])
+
+        self.assertListEqual(get_preview(image, projection="y").tolist(), image.sum(axis=1).tolist())
+        self.assertListEqual(get_preview(image, projection="x").tolist(), image.sum(axis=0).tolist())
+
+        with self.assertRaisesRegex(ValueError, "binning"):
+            get_preview(image, binning=5)
+
+        with self.assertRaisesRegex(ValueError, "outside the image"):
+            get_preview(image, roi=(10, 0, 12, 2))
+
+    def test_parse_roi(self):
+        self.assertEqual(parse_roi("0,10,20,30"), (0, 10, 20, 30))
+
+        for roi in ("1,2,3", "a,b,c,d", "10,0,5,5"):
+            with self.assertRaisesRegex(ValueError, "roi"):
+                parse_roi(roi)
+
+    def test_buffer_cache(self):
+        preview_buffer = PreviewBuffer("tcp://127.0.0.1:40001")
+
+        with self.assertRaisesRegex(ValueError, "No preview frame"):
+            preview_buffer.get_preview()
+
+        preview_buffer.process_message(get_message(numpy.ones((4, 4), dtype=numpy.uint32)))
+        data, metadata = preview_buffer.get_preview(binning=2)
+
+        self.assertEqual(metadata["frame"], 1)
+        self.assertListEqual(numpy.load(io.BytesIO(data)).tolist(), [[4, 4], [4, 4]])
+
+        # Same request on the same frame is served from the cache.
+        self.assertIs(preview_buffer.get_preview(binning=2)[0], data)
+
+        preview_buffer.process_message(get_message(numpy.zeros((4, 4), dtype=numpy.uint32)))
+        data, _ = preview_buffer.get_preview(binning=2)
+        self.assertListEqual(numpy.load(io.BytesIO(data)).tolist(), [[0, 0], [0, 0]])
@@ -0,0 +1,37 @@
+import unittest
+
+from csaxs_dia.progress import ProgressTracker, RateEstimator
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_rate_estimator(self):
+        estimator = RateEstimator(time_constant=1)
+
+        self.assertIsNone(estimator.update(0, 0))
+        self.assertEqual(estimator.update(1, 100), 100)
+
+        # The estimate moves towards the new rate, without jumping to it.
+        rate = estimator.update(2, 300)
+        self.assertGreater(rate, 100)
+        self.assertLess(rate, 200)
+
+        # A counter reset restarts the estimation.
+        estimator.update(3, 10)
+        self.assertIsNone(estimator.rate)
+
+    def test_progress(self):
+        tracker = ProgressTracker()
+
+        tracker.get_progress(0, 1000, 0, 0)
+        progress = tracker.get_progress(2, 1000, 200, 250)
+
+        self.assertEqual(progress["percent_complete"], 20)
+        self.assertEqual(progress["frames_behind"], 50)
+        self.assertEqual(progress["frame_rate"], 100)
+        self.assertEqual(progress["eta"], 8)
+
+        progress = tracker.get_progress(3, None, float("nan"), float("nan"))
+        self.assertIsNone(progress["percent_complete"])
+        self.assertIsNone(progress["frames_behind"])
+        self.assertIsNone(progress["eta"])
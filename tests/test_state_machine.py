@@ -4,6 +4,7 @@ from detector_integration_api.tests.utils import get_test_integration_manager
 
 from csaxs_dia.manager import IntegrationStatus
 from csaxs_dia import manager as csaxs_manager
+from csaxs_dia.validation_eiger9m import interpret_status
 
 
 class TestCsaxsStateMachine(unittest.TestCase):
@@ -53,4 +54,27 @@ class TestCsaxsStateMachine(unittest.TestCase):
         manager.writer_client.status = "stopped"
         manager.detector_client.status = "idle"
         manager.backend_client.status = "OPEN"
-        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.FINISHED)
\ No newline at end of file
+        self.assertEqual(manager.get_acquisition_status(), IntegrationStatus.FINISHED)
+
+
+class TestArmedStateMachine(unittest.TestCase):
+
+    def get_status(self, writer_status, armed=False, arming=False):
+        statuses = {"writer": writer_status, "backend": "OPEN", "detector": "idle"}
+        return interpret_status(statuses, armed=armed, arming=arming)
+
+    def test_armed_states(self):
+        self.assertEqual(self.get_status("stopped"), IntegrationStatus.READY)
+
+        # The writer process is starting - not an error yet.
+        self.assertEqual(self.get_status("stopped", armed=True, arming=True), IntegrationStatus.ARMING)
+        self.assertEqual(self.get_status("receiving", armed=True, arming=True), IntegrationStatus.ARMED)
+        self.assertEqual(self.get_status("receiving", armed=True), IntegrationStatus.ARMED)
+        self.assertEqual(self.get_status("writing", armed=True), IntegrationStatus.ARMED)
+
+        # Once armed, a writer that stopped before the detector was started is an error.
+        self.assertEqual(self.get_status("stopped", armed=True), IntegrationStatus.ERROR)
+        self.assertEqual(self.get_status("error", armed=True, arming=True), IntegrationStatus.ERROR)
+
+        # Fired - the writer receives the frames.
+        self.assertEqual(self.get_status("receiving"), IntegrationStatus.RUNNING)
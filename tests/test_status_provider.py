@@ -0,0 +1,166 @@
+import unittest
+from threading import Event, Thread, current_thread
+from time import sleep
+from unittest.mock import MagicMock
+
+from detector_integration_api.utils import ClientDisableWrapper
+
+from csaxs_dia.status_provider import StatusProvider
+from csaxs_dia.validation_eiger9m import IntegrationStatus
+
+
+def get_client(status):
+    client = MagicMock()
+    client.is_client_enabled.return_value = True
+    client.get_status.return_value = status
+
+    return client
+
+
+class TestQuickStatus(unittest.TestCase):
+
+    def get_provider(self, writer_client, max_status_age=10):
+        return StatusProvider(backend_client=get_client("OPEN"),
+                              writer_client=writer_client,
+                              detector_client=get_client("idle"),
+                              max_status_age=max_status_age)
+
+    def test_cached_within_max_age(self):
+        writer_client = get_client("receiving")
+        provider = self.get_provider(writer_client)
+
+        self.assertEqual(provider.get_quick_status_details()["writer"], "receiving")
+
+        writer_client.get_status.return_value = "stopped"
+        self.assertEqual(provider.get_quick_status_details()["writer"], "receiving")
+        self.assertEqual(writer_client.get_status.call_count, 1)
+
+    def test_refreshed_after_max_age(self):
+        writer_client = get_client("receiving")
+        provider = self.get_provider(writer_client, max_status_age=0.05)
+
+        provider.get_quick_status_details()
+        writer_client.get_status.return_value = "stopped"
+        sleep(0.1)
+
+        self.assertEqual(provider.get_quick_status_details()["writer"], "stopped")
+        self.assertEqual(writer_client.get_status.call_count, 2)
+
+    def test_refreshed_after_invalidate(self):
+        writer_client = get_client("stopped")
+        provider = self.get_provider(writer_client)
+
+        provider.get_quick_status_details()
+        writer_client.get_status.return_value = "receiving"
+        provider.invalidate()
+
+        self.assertEqual(provider.get_quick_status_details()["writer"], "receiving")
+
+    def test_slow_read_does_not_overwrite_newer_status(self):
+        slow_read_started = Event()
+        release_slow_read = Event()
+
+        def get_status():
+            if current_thread().name == "slow_poll":
+                slow_read_started.set()
+                release_slow_read.wait(timeout=5)
+                # Read before the state change.
+                return "stopped"
+
+            return "receiving"
+
+        writer_client = get_client(None)
+        writer_client.get_status.side_effect = get_status
+        provider = self.get_provider(writer_client)
+
+        # A background poll started before the writer was started.
+        slow_read = Thread(target=provider._read_quick_status, name="slow_poll")
+        slow_read.start()
+        self.assertTrue(slow_read_started.wait(timeout=5))
+
+        provider.invalidate()
+        self.assertEqual(provider.get_quick_status_details()["writer"], "receiving")
+
+        release_slow_read.set()
+        slow_read.join()
+
+        # The older read is not cached over the newer one.
+        self.assertEqual(provider.get_quick_status_details()["writer"], "receiving")
+        self.assertEqual(writer_client.get_status.call_count, 2)
+
+
+class TestCompleteStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = {"writer": get_client("receiving"),
+                        "backend": get_client("OPEN"),
+                        "detector": get_client("running")}
+
+        self.release_requests = Event()
+        self.addCleanup(self.release_requests.set)
+
+    def get_provider(self, **kwargs):
+        return StatusProvider(backend_client=self.clients["backend"],
+                              writer_client=self.clients["writer"],
+                              detector_client=self.clients["detector"],
+                              **kwargs)
+
+    def delay_status(self, component_name, delay):
+        status = self.clients[component_name].get_status.return_value
+
+        def get_status():
+            self.release_requests.wait(timeout=delay)
+            return status
+
+        self.clients[component_name].get_status.side_effect = get_status
+
+    def test_default_timeouts(self):
+        self.assertEqual(self.get_provider().component_status_timeouts,
+                         {"writer": 1.0, "backend": 2.0, "detector": 1.0})
+
+    def test_component_deadlines(self):
+        provider = self.get_provider(component_status_timeouts={"detector": 0.1})
+
+        # The backend answers within its (longer) deadline, the detector does not.
+        self.delay_status("backend", 0.2)
+        self.delay_status("detector", 5)
+
+        status_details = provider.get_complete_status_details()
+
+        self.assertEqual(status_details["writer"], "receiving")
+        self.assertEqual(status_details["backend"], "OPEN")
+        self.assertEqual(status_details["detector"], IntegrationStatus.COMPONENT_NOT_RESPONDING.value)
+
+        latency = status_details["latency"]
+        self.assertIsInstance(latency["writer"], float)
+        self.assertGreaterEqual(latency["backend"], 0.2)
+        self.assertIsNone(latency["detector"])
+
+    def test_failed_component(self):
+        self.clients["writer"].get_status.side_effect = RuntimeError("Writer not reachable.")
+        self.clients["detector"].is_client_enabled.return_value = False
+
+        status_details = self.get_provider().get_complete_status_details()
+
+        self.assertEqual(status_details["writer"], IntegrationStatus.COMPONENT_NOT_RESPONDING.value)
+        self.assertEqual(status_details["backend"], "OPEN")
+        self.assertEqual(status_details["detector"], ClientDisableWrapper.STATUS_DISABLED)
+        self.clients["detector"].get_status.assert_not_called()
+
+    def test_pending_request_reused(self):
+        provider = self.get_provider(component_status_timeouts={"detector": 0.05})
+        self.delay_status("detector", 5)
+
+        for _ in range(3):
+            status_details = provider.get_complete_status_details()
+            self.assertEqual(status_details["detector"], IntegrationStatus.COMPONENT_NOT_RESPONDING.value)
+
+        # The detector is not asked again while it did not answer the first request.
+        self.assertEqual(self.clients["detector"].get_status.call_count, 1)
+        self.assertEqual(self.clients["writer"].get_status.call_count, 3)
+
+        self.release_requests.set()
+        provider._pending_status_requests["detector"].result(timeout=5)
+
+        self.assertEqual(provider.get_complete_status_details()["detector"], "running")
+        self.assertEqual(self.clients["detector"].get_status.call_count, 2)
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import MagicMock
+
+from csaxs_dia.status_stream import StatusBroadcaster
+
+
+class TestStatusBroadcaster(unittest.TestCase):
+
+    def setUp(self):
+        self.integration_manager = MagicMock()
+        self.integration_manager.get_acquisition_status.return_value = "IntegrationStatus.READY"
+        self.integration_manager.get_metrics.return_value = {"writer": {}, "backend": {}, "detector": {}}
+
+        self.broadcaster = StatusBroadcaster(self.integration_manager, status_check_interval=0.01,
+                                             metrics_interval=1000)
+        self.broadcaster.start()
+
+    def tearDown(self):
+        self.broadcaster.stop()
+
+    def test_status_transitions(self):
+        events = self.broadcaster.subscribe()
+
+        event_name, data = events.get(timeout=1)
+        self.assertEqual(event_name, "status")
+        self.assertEqual(data["status"], "IntegrationStatus.READY")
+
+        self.integration_manager.get_acquisition_status.return_value = "IntegrationStatus.RUNNING"
+        self.broadcaster.notify()
+
+        event_name, data = events.get(timeout=1)
+        self.assertEqual(data["status"], "IntegrationStatus.RUNNING")
+
+        self.broadcaster.unsubscribe(events)
+        self.assertEqual(self.broadcaster.get_n_subscribers(), 0)
+
+    def test_slow_subscriber(self):
+        # Wait for the initial status to be broadcast.
+        self.broadcaster.subscribe().get(timeout=1)
+
+        self.broadcaster.queue_size = 2
+        events = self.broadcaster.subscribe()
+
+        for index in range(5):
+            self.broadcaster.publish("status", {"index": index})
+
+        self.assertEqual([events.get_nowait()[1]["index"] for _ in range(events.qsize())], [3, 4])
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from time import monotonic
+
+from csaxs_dia.timing import LatencyRecorder, StartupTimer, get_percentile
+
+
+class TestLatencyRecorder(unittest.TestCase):
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 99), 99)
+        self.assertIsNone(get_percentile([], 50))
+
+    def test_statistics(self):
+        recorder = LatencyRecorder(max_samples=10)
+
+        for duration in range(20):
+            recorder.record("reset.backend_client.reset", duration)
+
+        with recorder.span("start_acquisition"):
+            pass
+
+        statistics = recorder.get_statistics()
+
+        self.assertEqual(statistics["reset.backend_client.reset"]["count"], 10)
+        self.assertEqual(statistics["reset.backend_client.reset"]["max"], 19)
+        self.assertEqual(statistics["reset.backend_client.reset"]["p50"], 14)
+        self.assertEqual(statistics["start_acquisition"]["count"], 1)
+
+    def test_trace_dump(self):
+        with tempfile.TemporaryDirectory() as trace_folder:
+            recorder = LatencyRecorder(trace_folder=trace_folder)
+
+            recorder.record("before_trace", 1)
+
+            recorder.start_trace()
+            recorder.timed("start_acquisition.writer_client.start", lambda: None)()
+            trace = recorder.end_trace("/tmp/output.h5")
+
+            self.assertEqual([step["name"] for step in trace], ["start_acquisition.writer_client.start"])
+
+            filenames = os.listdir(trace_folder)
+            self.assertEqual(len(filenames), 1)
+            self.assertTrue(filenames[0].endswith("_output.h5.json"))
+
+            with open(os.path.join(trace_folder, filenames[0])) as input_file:
+                self.assertEqual(json.load(input_file)["steps"], trace)
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_report(self):
+        timer = StartupTimer()
+
+        with timer.phase("imports"):
+            pass
+        timer.mark("port_bound")
+
+        report = timer.get_report()
+
+        self.assertEqual([phase["name"] for phase in report["phases"]], ["imports"])
+        self.assertGreaterEqual(report["phases"][0]["duration"], 0)
+        self.assertLessEqual(report["milestones"]["port_bound"], report["elapsed"])
+
+    def test_phase_timed_outside(self):
+        start_time = monotonic()
+        timer = StartupTimer(start_time=start_time - 1)
+
+        timer.add_phase("module_imports", start_time - 1, start_time)
+
+        phase = timer.get_report()["phases"][0]
+        self.assertEqual(phase["name"], "module_imports")
+        self.assertEqual(phase["start"], 0)
+        self.assertAlmostEqual(phase["duration"], 1)
+        self.assertGreaterEqual(timer.elapsed(), 1)
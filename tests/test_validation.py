@@ -1,6 +1,9 @@
 import unittest
 
-from csaxs_dia.validation_eiger9m import validate_writer_config
+from copy import deepcopy
+
+from csaxs_dia.validation_eiger9m import validate_writer_config, validate_configs_dependencies, \
+    validate_configurations
 from tests.utils import get_valid_config
 
 
@@ -31,3 +34,62 @@ class TestValidation(unittest.TestCase):
 
         writer_config["unexpected"] = "jup"
         validate_writer_config(writer_config)
+
+    def test_dependencies_error_message(self):
+        configuration = get_valid_config()
+        configuration["detector"]["frames"] = 10
+
+        with self.assertRaisesRegex(ValueError, "Detector 'frames' set to '10'"):
+            validate_configs_dependencies(configuration["writer"], configuration["backend"], configuration["detector"])
+
+    def test_batch_validation(self):
+        valid_config = get_valid_config()
+
+        invalid_config = get_valid_config()
+        invalid_config["writer"]["user_id"] = 1
+        invalid_config["backend"]["bit_depth"] = 32
+        del invalid_config["detector"]["exptime"]
+
+        configurations = [valid_config, invalid_config]
+        original_configurations = deepcopy(configurations)
+
+        results = validate_configurations(configurations)
+
+        self.assertTrue(results[0]["valid"])
+        self.assertEqual(results[0]["errors"], [])
+
+        self.assertFalse(results[1]["valid"])
+        self.assertEqual(len(results[1]["errors"]), 3)
+
+        # Validation does not modify the configurations.
+        self.assertEqual(configurations, original_configurations)
+
+        results = validate_configurations([invalid_config], validate_writer=False)
+        self.assertEqual(len(results[0]["errors"]), 2)
+
+    def test_data_rate(self):
+        configuration = get_valid_config()
+        configuration["backend"]["bit_depth"] = 32
+        configuration["detector"]["dr"] = 32
+        configuration["detector"]["period"] = 0.02
+
+        with self.assertRaisesRegex(ValueError, "frames would be lost. Use a 'period' of at least 0.0400"):
+            validate_configs_dependencies(configuration["writer"], configuration["backend"], configuration["detector"])
+
+        result = validate_configurations([configuration])[0]
+        self.assertFalse(result["valid"])
+
+        # Close to the limit is valid, with a warning.
+        configuration["detector"]["period"] = 0.042
+        result = validate_configurations([configuration])[0]
+        self.assertTrue(result["valid"])
+        self.assertEqual(len(result["warnings"]), 1)
+
+        # The limit is configurable.
+        result = validate_configurations([configuration], max_data_rate=1e9)[0]
+        self.assertEqual(result["warnings"], [])
+
+        # With one frame per trigger, the rate is given by the trigger.
+        configuration["detector"].update({"period": 0.001, "timing": "trigger", "frames": 1, "cycles": 100})
+        configuration["writer"]["n_frames"] = 100
+        self.assertTrue(validate_configurations([configuration])[0]["valid"])
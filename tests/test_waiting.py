@@ -0,0 +1,60 @@
+import unittest
+from threading import Thread
+from time import monotonic, sleep
+
+from csaxs_dia.waiting import StatusWaiter, get_check_interval, get_expected_duration
+
+
+class FakeStatusProvider(object):
+    def __init__(self):
+        self.listeners = []
+
+    def add_status_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_status_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def notify(self):
+        for listener in list(self.listeners):
+            listener({})
+
+
+class TestWaiting(unittest.TestCase):
+
+    def test_expected_duration(self):
+        self.assertEqual(get_expected_duration({"timing": "auto", "frames": 100, "period": 0.01, "cycles": 2}), 2)
+        self.assertIsNone(get_expected_duration({"timing": "trigger", "frames": 1, "period": 0.01, "cycles": 100}))
+        self.assertIsNone(get_expected_duration({}))
+
+    def test_check_interval(self):
+        # Tight polling around the expected transitions, longer in between.
+        self.assertEqual(get_check_interval(0, [0, 10]), 0.005)
+        self.assertEqual(get_check_interval(5, [0, 10]), 0.5)
+        self.assertAlmostEqual(get_check_interval(9.9, [0, 10]), 0.025)
+
+    def test_wakeup_on_status_change(self):
+        status_provider = FakeStatusProvider()
+        waiter = StatusWaiter(status_provider, min_interval=10, max_interval=10)
+        status = ["running"]
+
+        def finish():
+            sleep(0.05)
+            status[0] = "ready"
+            status_provider.notify()
+
+        Thread(target=finish).start()
+
+        start_time = monotonic()
+        self.assertEqual(waiter.wait_for_status(lambda: status[0], "ready"), "ready")
+        self.assertLess(monotonic() - start_time, 5)
+        self.assertEqual(status_provider.listeners, [])
+
+    def test_timeout_and_unexpected_status(self):
+        waiter = StatusWaiter(timeout=0.05)
+
+        with self.assertRaisesRegex(ValueError, "Timeout while waiting for status"):
+            waiter.wait_for_status(lambda: "running", "ready")
+
+        with self.assertRaisesRegex(ValueError, "Expecting status"):
+            waiter.wait_for_status(lambda: "error", "ready", allowed_status=("running",))
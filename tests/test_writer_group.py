@@ -0,0 +1,243 @@
+import os
+import socket
+import tempfile
+import unittest
+from threading import Event
+from unittest.mock import patch
+
+try:
+    import h5py
+    import numpy
+except ImportError:
+    h5py = None
+
+from csaxs_dia import writer_group
+from csaxs_dia.writer_group import RemoteWriterClient, WriterGroup, get_group_status, get_shard_n_frames, \
+    get_interleaved_n_frames, get_writer_shards_errors, write_master_file
+
+
+class FakeWriterClient(object):
+    def __init__(self, index):
+        self.url = "http://127.0.0.1:%d" % (10001 + index)
+        self.parameters = None
+        self.status = "stopped"
+        self.statistics = {}
+        self.fail_start = False
+
+    def set_parameters(self, parameters):
+        self.parameters = parameters
+
+    def start(self):
+        if self.fail_start:
+            raise RuntimeError("Writer did not start.")
+        self.status = "receiving"
+
+    def get_status(self):
+        return self.status
+
+    def get_statistics(self):
+        return self.statistics
+
+    def stop(self):
+        self.status = "stopped"
+
+    def kill(self):
+        self.status = "stopped"
+
+    def reset(self):
+        self.parameters = None
+        self.status = "stopped"
+
+
+class TestWriterGroup(unittest.TestCase):
+
+    def test_shard_frames_and_status(self):
+        self.assertEqual([get_shard_n_frames(10, 3, index) for index in range(3)], [4, 3, 3])
+        self.assertEqual([get_shard_n_frames(1, 3, index) for index in range(3)], [1, 0, 0])
+
+        # The group is busy as long as one shard is, errors win.
+        self.assertEqual(get_group_status(["stopped", "writing", "receiving"]), "writing")
+        self.assertEqual(get_group_status(["stopped", "stopped"]), "stopped")
+        self.assertEqual(get_group_status(["writing", "error"]), "error")
+
+    def test_group(self):
+        clients = [FakeWriterClient(index) for index in range(3)]
+        group = WriterGroup(clients, write_master_file=False)
+
+        self.assertEqual(group.url, "http://127.0.0.1:10001,http://127.0.0.1:10002,http://127.0.0.1:10003")
+
+        with self.assertRaisesRegex(ValueError, "Writer parameters not set"):
+            group.start()
+
+        group.set_parameters({"output_file": "/data/scan_00001.h5", "n_frames": 2, "user_id": 10000})
+
+        self.assertEqual(clients[0].parameters["output_file"], "/data/scan_00001_part000.h5")
+        self.assertEqual(clients[1].parameters["n_frames"], 1)
+        # Not enough frames for the last shard.
+        self.assertIsNone(clients[2].parameters)
+        self.assertEqual(group.get_part_files(), ["/data/scan_00001_part000.h5", "/data/scan_00001_part001.h5", None])
+
+        group.start()
+        self.assertEqual([client.status for client in clients], ["receiving", "receiving", "stopped"])
+        self.assertEqual(group.get_status(), "receiving")
+
+        clients[0].statistics = {"n_written_frames": 1, "user_id": 10000}
+        clients[1].statistics = {"n_written_frames": 1}
+        statistics = group.get_statistics()
+        self.assertEqual(statistics["n_written_frames"], 2)
+        self.assertEqual(statistics["n_shards"], 3)
+        self.assertNotIn("user_id", statistics)
+
+        group.stop()
+        self.assertEqual(group.get_status(), "stopped")
+
+    def test_failed_start_kills_group(self):
+        clients = [FakeWriterClient(index) for index in range(2)]
+        clients[1].fail_start = True
+
+        group = WriterGroup(clients, write_master_file=False)
+        group.set_parameters({"output_file": "/data/scan_00001.h5", "n_frames": 10, "user_id": 10000})
+
+        with self.assertRaisesRegex(RuntimeError, "Writer did not start"):
+            group.start()
+
+        self.assertEqual(group.get_status(), "stopped")
+
+    def test_master_file_in_background(self):
+        clients = [FakeWriterClient(index) for index in range(2)]
+        group = WriterGroup(clients)
+        self.addCleanup(group.close)
+
+        release_master_file = Event()
+
+        def slow_write_master_file(output_file, part_files, n_frames):
+            release_master_file.wait(timeout=5)
+            raise ValueError("Part file has 4 frames, but 5 are expected.")
+
+        group.set_parameters({"output_file": "/data/scan_00001.h5", "n_frames": 10, "user_id": 10000})
+        group.start()
+        self.assertEqual(group.get_statistics()["master_file_status"], "pending")
+
+        with patch.object(writer_group, "write_master_file", slow_write_master_file):
+            group.stop()
+
+            # The status request does not wait for the master file - the group is writing until it is done.
+            self.assertEqual(group.get_status(), "writing")
+            self.assertEqual(group.get_statistics()["master_file_status"], "writing")
+
+            release_master_file.set()
+            group._master_file_executor.submit(lambda: None).result(timeout=5)
+
+        self.assertEqual(group.get_status(), "stopped")
+
+        statistics = group.get_statistics()
+        self.assertEqual(statistics["master_file_status"], "error")
+        self.assertIn("5 are expected", statistics["master_file_error"])
+
+        group.reset()
+        self.assertNotIn("master_file_status", group.get_statistics())
+
+    def test_master_file_after_reset(self):
+        clients = [FakeWriterClient(index) for index in range(2)]
+        group = WriterGroup(clients)
+        self.addCleanup(group.close)
+
+        written_master_files = []
+
+        def record_write_master_file(output_file, part_files, n_frames):
+            written_master_files.append((output_file, part_files, n_frames))
+            return 4
+
+        group.set_parameters({"output_file": "/data/scan_00001.h5", "n_frames": 10, "user_id": 10000})
+        group.start()
+
+        with patch.object(writer_group, "write_master_file", record_write_master_file):
+            # Reset right after the stop, before the status was read - the master file is still written.
+            group.stop()
+            group.reset()
+            group._master_file_executor.submit(lambda: None).result(timeout=5)
+
+        self.assertEqual(written_master_files, [("/data/scan_00001.h5", ["/data/scan_00001_part000.h5",
+                                                                          "/data/scan_00001_part001.h5"], 10)])
+        self.assertEqual(group.get_status(), "stopped")
+
+        statistics = group.get_statistics()
+        self.assertEqual(statistics["master_file_status"], "written")
+        self.assertEqual(statistics["master_file_n_frames"], 4)
+
+        # A killed acquisition gets no master file.
+        group.set_parameters({"output_file": "/data/scan_00002.h5", "n_frames": 10, "user_id": 10000})
+        group.start()
+        group.kill()
+        group.reset()
+
+        self.assertNotIn("master_file_status", group.get_statistics())
+        self.assertEqual(len(written_master_files), 1)
+
+    def test_shards_validation(self):
+        self.assertEqual(get_writer_shards_errors(["tcp://127.0.0.1:40000", "http://xbl-daq-30:10001"]), [])
+
+        self.assertEqual(len(get_writer_shards_errors(["tcp://127.0.0.1:40000"])), 1)
+        self.assertEqual(len(get_writer_shards_errors(["tcp://127.0.0.1:40000", "tcp://127.0.0.1:40000"])), 1)
+        self.assertEqual(len(get_writer_shards_errors(["tcp://127.0.0.1:40000", "xbl-daq-30:10001"])), 1)
+
+    def test_unreachable_remote_writer(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        # Nothing listens on the port - the writer is in error, not stopped.
+        client = RemoteWriterClient("http://127.0.0.1:%d" % port)
+        self.assertEqual(client.get_status(), "error")
+        self.assertEqual(get_group_status(["stopped", client.get_status()]), "error")
+
+    @unittest.skipIf(h5py is None, "h5py is not installed.")
+    def test_master_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            output_file = os.path.join(folder, "scan_00001.h5")
+            part_files = [os.path.join(folder, "scan_00001_part%03d.h5" % index) for index in range(2)]
+
+            frames = numpy.arange(5 * 2 * 2, dtype="uint32").reshape(5, 2, 2)
+
+            for index, part_file in enumerate(part_files):
+                with h5py.File(part_file, "w") as file:
+                    file["entry/data/data"] = frames[index::2]
+                    file["entry/instrument/name"] = "Eiger 9M"
+
+            write_master_file(output_file, part_files, 5)
+
+            with h5py.File(output_file, "r") as file:
+                numpy.testing.assert_array_equal(file["entry/data/data"][:], frames)
+                self.assertEqual(file["entry/instrument/name"][()], b"Eiger 9M")
+
+            # A frame lost by a shard - the frames cannot be interleaved.
+            with h5py.File(part_files[1], "w") as file:
+                file["entry/data/data"] = frames[1:3:2]
+
+            with self.assertRaisesRegex(ValueError, r"\[3, 1\] frames"):
+                write_master_file(output_file, part_files, 5)
+
+    @unittest.skipIf(h5py is None, "h5py is not installed.")
+    def test_master_file_of_stopped_acquisition(self):
+        with tempfile.TemporaryDirectory() as folder:
+            output_file = os.path.join(folder, "scan_00001.h5")
+            part_files = [os.path.join(folder, "scan_00001_part%03d.h5" % index) for index in range(2)]
+
+            # Stopped after 3 of the 10 frames.
+            frames = numpy.arange(3 * 2 * 2, dtype="uint32").reshape(3, 2, 2)
+
+            for index, part_file in enumerate(part_files):
+                with h5py.File(part_file, "w") as file:
+                    file["entry/data/data"] = frames[index::2]
+
+            self.assertEqual(write_master_file(output_file, part_files, 10), 3)
+
+            with h5py.File(output_file, "r") as file:
+                numpy.testing.assert_array_equal(file["entry/data/data"][:], frames)
+
+    def test_interleaved_n_frames(self):
+        self.assertEqual(get_interleaved_n_frames([5, 5]), 10)
+        self.assertEqual(get_interleaved_n_frames([2, 1, 1]), 4)
+        self.assertEqual(get_interleaved_n_frames([1, 0, 0]), 1)
+        self.assertIsNone(get_interleaved_n_frames([1, 2]))
+        self.assertIsNone(get_interleaved_n_frames([3, 1]))
@@ -0,0 +1,161 @@
+import signal
+import socket
+import tempfile
+import unittest
+from functools import partial
+from threading import Thread
+from time import monotonic, sleep
+from unittest.mock import patch
+
+from csaxs_dia import writer_pool
+from csaxs_dia.writer_pool import WriterPool
+from tests.fake_writer import create_writer_executable
+
+USER_ID = 10000
+PORT_COUNT = 4
+
+
+def get_free_port_range(port_count):
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            first_port = probe.getsockname()[1]
+
+        if first_port + port_count > 65535:
+            continue
+
+        try:
+            for port in range(first_port, first_port + port_count):
+                with socket.socket() as probe:
+                    probe.bind(("127.0.0.1", port))
+        except OSError:
+            continue
+
+        return first_port
+
+
+def wait_until(condition, timeout=10):
+    start_time = monotonic()
+
+    while not condition():
+        if monotonic() - start_time > timeout:
+            raise AssertionError("Condition not met in %s seconds." % timeout)
+        sleep(0.01)
+
+
+class TestWriterPool(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+        self.writer_executable = create_writer_executable(self.folder.name)
+
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.close()
+
+        self.folder.cleanup()
+
+    def get_pool(self, **kwargs):
+        pool = WriterPool(stream_url="tcp://127.0.0.1:40000",
+                          writer_executable=self.writer_executable,
+                          writer_port=get_free_port_range(PORT_COUNT),
+                          port_count=PORT_COUNT,
+                          **kwargs)
+        self.pools.append(pool)
+
+        return pool
+
+    def get_idle_writers(self, pool):
+        with pool._lock:
+            return list(pool._idle_writers.get(USER_ID, []))
+
+    def test_spawn_take_and_replenish(self):
+        pool = self.get_pool(pool_size=1)
+
+        pool.prestart(USER_ID)
+        wait_until(lambda: len(self.get_idle_writers(pool)) == 1)
+        idle_writer = self.get_idle_writers(pool)[0]
+
+        pool.set_parameters({"output_file": "/tmp/test.h5", "n_frames": 10, "user_id": USER_ID})
+        pool.start()
+
+        # The idle writer is taken and a new one is started in its place.
+        self.assertIs(pool._active_writer, idle_writer)
+        self.assertEqual(pool.get_status(), "receiving")
+        wait_until(lambda: len(self.get_idle_writers(pool)) == 1)
+        self.assertIsNot(self.get_idle_writers(pool)[0], idle_writer)
+
+        pool.stop()
+        self.assertEqual(pool.get_status(), "stopped")
+
+        pool.reset()
+        # The writer is terminated, not killed.
+        self.assertEqual(idle_writer.process.returncode, -signal.SIGTERM)
+        self.assertIsNone(pool._active_writer)
+        self.assertEqual(len(pool._free_ports), PORT_COUNT - 1)
+
+    def test_concurrent_replenish(self):
+        pool = self.get_pool(pool_size=2)
+
+        threads = [Thread(target=pool._replenish, args=(USER_ID,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.get_idle_writers(pool)), 2)
+        self.assertEqual(len(pool._free_ports), PORT_COUNT - 2)
+        self.assertEqual(pool._n_starting_writers[USER_ID], 0)
+
+    def test_reap_idle_writers(self):
+        with patch.object(writer_pool, "REAP_INTERVAL", 0.05):
+            pool = self.get_pool(pool_size=1, idle_timeout=0.2)
+
+        pool.prestart(USER_ID)
+        wait_until(lambda: len(self.get_idle_writers(pool)) == 1)
+        idle_writer = self.get_idle_writers(pool)[0]
+
+        wait_until(lambda: not self.get_idle_writers(pool))
+
+        # The expired writer exited and was collected - no zombie is left behind.
+        wait_until(lambda: len(pool._free_ports) == PORT_COUNT)
+        self.assertIsNotNone(idle_writer.process.returncode)
+
+    def test_status_and_kill_release_port_once(self):
+        pool = self.get_pool(pool_size=0)
+
+        pool.set_parameters({"output_file": "/tmp/test.h5", "n_frames": 10, "user_id": USER_ID})
+        pool.start()
+        writer = pool._active_writer
+
+        # The writer dies while the status is polled and the pool is killed.
+        writer.process.kill()
+        writer.process.wait()
+
+        threads = [Thread(target=pool._get_active_writer) for _ in range(4)] + [Thread(target=pool.kill)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(pool._free_ports), sorted(set(pool._free_ports)))
+        self.assertEqual(len(pool._free_ports), PORT_COUNT)
+
+    def test_reset_kills_writer_not_exiting(self):
+        pool = self.get_pool(pool_size=0)
+
+        pool.set_parameters({"output_file": "/tmp/test.h5", "n_frames": 10, "user_id": USER_ID})
+        pool.start()
+        writer = pool._active_writer
+
+        # The writer ignores the termination.
+        with patch.object(writer.process, "terminate") as terminate, \
+                patch.object(writer, "terminate", partial(writer.terminate, timeout=0.1)):
+            pool.reset()
+
+        terminate.assert_called_once_with()
+        self.assertEqual(writer.process.returncode, -signal.SIGKILL)
+        self.assertEqual(len(pool._free_ports), PORT_COUNT)